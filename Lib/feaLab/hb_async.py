@@ -0,0 +1,289 @@
+"""hb_async.py
+
+hb_async.AsyncHarfBuzzRenderer class
+
+asyncio counterparts of the hb_render.HarfBuzzRenderer methods: the
+`hb-shape` and `hb-view` tools run as asyncio subprocesses, and the
+in-process backends run in an executor, so the event loop never blocks
+
+"""
+
+import asyncio
+import copy
+import json
+import os.path
+import warnings
+
+from feaLab.hb_render import HbShapeBackend, HarfBuzzRenderer, hbToolPath
+
+__version__ = "0.1"
+
+
+def commandLine(command, **kwargs):
+    """Build the argument list of a HarfBuzz tool from `sh`-style kwargs,
+    where option_name=value translates to `--option-name=value`, True to
+    `--option-name` and False omits the option. Keys starting with '_'
+    are ignored.
+
+    Args:
+        command (str): the tool name, e.g. 'hb-shape'
+
+    Returns:
+        list: argument list, starting with the path of the tool
+    """
+    args = [hbToolPath(command) or command]
+    for name, value in kwargs.items():
+        if name.startswith("_") or value is False:
+            continue
+        option = "--" + name.replace("_", "-")
+        if value is True:
+            args.append(option)
+        else:
+            args.append("%s=%s" % (option, value))
+    return args
+
+
+class AsyncHarfBuzzRenderer(HarfBuzzRenderer):
+    """HarfBuzzRenderer with asyncio methods. Each call works on a snapshot
+    of the settings taken when it is made, so the settings can be changed
+    while calls are in flight.
+
+    Attributes:
+        concurrency (int):
+            max. number of shaping or rendering calls running at once,
+            further calls wait, default: 16
+        executor (concurrent.futures.Executor):
+            executor for the in-process backends, default: None (the
+            default executor of the event loop)
+
+    Example:
+        hb = AsyncHarfBuzzRenderer('font.otf')
+        glyphs = await hb.atoJson('Hello')
+    """
+
+    def __init__(self, font_file=None, face_index=0, text=""):
+        super().__init__(font_file=font_file, face_index=face_index, text=text)
+        self.concurrency = 16
+        self.executor = None
+        self._semaphores = {}
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphores = {loop: semaphore}
+        return semaphore
+
+    def _snapshot(self):
+        renderer = copy.copy(self)
+        renderer.features = list(self.features)
+        return renderer
+
+    async def _inExecutor(self, func, *args):
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _run(self, args, stdin):
+        """Run a tool as an asyncio subprocess, killed if the call is cancelled
+
+        Returns:
+            tuple: (stdout, stderr) bytes
+        """
+        async with self._semaphore():
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                return await process.communicate(stdin)
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+
+    async def atoJson(self, text=None):
+        """Async version of self.toJson()
+
+        Args:
+            text (unicode, optional): optional text, otherwise uses self.text
+
+        Returns:
+            None: if an error occurred
+            list[dict, ...]: parsed JSON structure in `hb-shape` output format
+        """
+        text = text if text else self.text
+        self.text = text
+        renderer = self._snapshot()
+        if not isinstance(renderer._getBackend(), HbShapeBackend) or renderer.cache:
+            return await self._inExecutor(renderer.toJson, text)
+        instrument = renderer.instrument
+        if instrument is None:
+            return await self._ashape(renderer, text)
+        with instrument.span("toJson"):
+            glyphs = await self._ashape(renderer, text)
+        instrument.countResult(glyphs)
+        return glyphs
+
+    async def _ahbShape(self, renderer, kwargs):
+        """Run `hb-shape` as an asyncio subprocess, recorded with
+        renderer.instrument as in HarfBuzzRenderer._runTool()
+
+        Returns:
+            tuple: (stdout, stderr) bytes
+        """
+        args = commandLine("hb-shape", **kwargs)
+        instrument = renderer.instrument
+        if instrument is None:
+            return await self._run(args, kwargs["_in"])
+        instrument.count("bytes.in", len(kwargs["_in"]))
+        with instrument.span("hb-shape"):
+            stdout, stderr = await self._run(args, kwargs["_in"])
+        instrument.count("bytes.out", len(stdout))
+        if stderr:
+            instrument.count("errors.hb-shape")
+        return stdout, stderr
+
+    def _readOutput(self, renderer, lines):
+        """Parse `hb-shape` output lines, in the text output format with
+        renderer.use_glyph_indexes, as HbShapeBackend does
+
+        Raises:
+            ValueError: if a line cannot be read
+        """
+        if renderer.use_glyph_indexes:
+            return [renderer._decodeText(line).toJson() for line in lines]
+        return renderer._loadJson("[%s]" % (",".join(lines)))
+
+    async def _ashape(self, renderer, text):
+        # an empty text has no glyphs, and hb-shape no output line for it
+        if not text:
+            return []
+        output_format = "text" if renderer.use_glyph_indexes else "json"
+        kwargs = renderer._hbShapeArgs(text, output_format)
+        stdout, stderr = await self._ahbShape(renderer, kwargs)
+        if stderr:
+            warnings.warn("`hb-shape` returned an error: %s" % (stderr))
+            return None
+        try:
+            return self._readOutput(renderer, [stdout.decode("utf-8")])[0]
+        except ValueError as e:
+            warnings.warn("Cannot read the `hb-shape` output: %s" % (e))
+            return None
+
+    async def ashapeMany(self, texts, batch_size=1000):
+        """Async version of self.shapeMany(). With the 'hb-shape' backend,
+        each batch of texts is sent as lines through one `hb-shape` subprocess,
+        with use_glyph_indexes and instrument honoured as in self.shapeMany().
+
+        Args:
+            texts (iterable): the texts to shape
+            batch_size (int, optional): max. number of texts per `hb-shape` run
+
+        Returns:
+            list: one result per text as in self.shapeMany(), in order
+        """
+        renderer = self._snapshot()
+        texts = list(texts)
+        if not isinstance(renderer._getBackend(), HbShapeBackend) or renderer.cache:
+            return await self._inExecutor(
+                lambda: list(renderer.shapeMany(texts, batch_size=batch_size))
+            )
+        instrument = renderer.instrument
+        if instrument is None:
+            return await self._ashapeMany(renderer, texts, batch_size)
+        with instrument.span("shapeMany"):
+            results = await self._ashapeMany(renderer, texts, batch_size)
+        for glyphs in results:
+            instrument.countResult(glyphs)
+        return results
+
+    async def _ashapeMany(self, renderer, texts, batch_size):
+        output_format = "text" if renderer.use_glyph_indexes else "json"
+        results = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start : start + batch_size]
+            # an empty line has no glyphs, and no output line to match
+            lines = [text for text in batch if text and "\n" not in text]
+            output = []
+            if lines:
+                kwargs = renderer._hbShapeArgs("\n".join(lines), output_format)
+                stdout, stderr = await self._ahbShape(renderer, kwargs)
+                output = stdout.decode("utf-8").splitlines()
+                if stderr or len(output) != len(lines):
+                    output = None
+                else:
+                    try:
+                        output = self._readOutput(renderer, output)
+                    except ValueError:
+                        output = None
+                if output is None:
+                    # shape the texts of the batch one by one
+                    output = [await self._ashape(renderer, line) for line in lines]
+            output = iter(output)
+            for i, text in enumerate(batch):
+                if not text:
+                    results.append([])
+                elif "\n" in text:
+                    warnings.warn("Text %d contains a line break" % (start + i))
+                    results.append(None)
+                else:
+                    results.append(next(output))
+        return results
+
+    async def _atoImage(self, text, output_format, font_size, output_file):
+        text = text if text else self.text
+        self.text = text
+        if font_size is not None:
+            self.font_size = font_size
+        renderer = self._snapshot()
+        font_size = "upem" if renderer.font_size == 0 else renderer.font_size
+        kwargs = renderer._hbViewArgs(text, output_format, font_size, output_file)
+        stdout, stderr = await self._run(commandLine("hb-view", **kwargs), kwargs["_in"])
+        if stderr:
+            warnings.warn("`hb-view` returned an error: %s" % (stderr))
+            return None
+        if output_file:
+            output_path = os.path.realpath(output_file)
+            if os.path.exists(output_path):
+                return output_path
+            warnings.warn("`hb-view` did not create file: %s" % (output_path))
+            return None
+        return stdout
+
+    async def atoSVG(self, text=None, font_size=None, output_file=""):
+        """Async version of self.toSVG(), uses an `hb-view` subprocess, or
+        self.renderSVG() in the executor if `hb-view` is not available
+
+        Returns:
+            str: empty string if an error occurred, SVG (UTF-8) content,
+                or the output file path if output_file was provided
+        """
+        if not hbToolPath("hb-view"):
+            if font_size is not None:
+                self.font_size = font_size
+            text = text if text else self.text
+            self.text = text
+            data = await self._inExecutor(
+                self._snapshot().renderSVG, text, None, output_file
+            )
+        else:
+            data = await self._atoImage(text, "svg", font_size, output_file)
+        return data if data else ""
+
+    async def atoPNG(self, text=None, font_size=None, output_file=""):
+        """Async version of self.toPNG(), uses an `hb-view` subprocess
+
+        Returns:
+            str: empty string if an error occurred, PNG buffer,
+                or the output file path if output_file was provided
+        """
+        if not hbToolPath("hb-view"):
+            warnings.warn("`hb-view` not available")
+            return ""
+        data = await self._atoImage(text, "png", font_size, output_file)
+        return data if data else ""
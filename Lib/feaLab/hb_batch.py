@@ -0,0 +1,225 @@
+"""hb_batch.py
+
+renders many proof images with hb_render.HarfBuzzRenderer in a process pool
+
+A job is a dict with the keys:
+    font_file (str): path to the font file
+    text (unicode): the text to render
+    font_size (int): the font size, 0 means 'upem'
+    output_file (str): path to the image file
+    output_format (str, optional): 'svg' | 'png' | 'pdf' | ...
+        default: the extension of output_file
+and optionally any other HarfBuzzRenderer attribute, e.g. face_index,
+features, margin or foreground.
+
+Usage:
+    hb_render batch jobs.json [--workers N] [--manifest manifest.json] [--force]
+
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os.path
+import time
+import warnings
+
+from feaLab.hb_render import HarfBuzzRenderer
+
+__version__ = "0.1"
+
+JOB_KEYS = ("font_file", "text", "font_size", "output_file", "output_format")
+REQUIRED_JOB_KEYS = ("font_file", "text", "output_file")
+
+
+def jobKey(job):
+    """Returns:
+    str: hex digest of the job parameters
+    """
+    return hashlib.sha1(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def checkJob(job):
+    """Check that a job is a dict with the required keys
+
+    Args:
+        job (dict):
+
+    Returns:
+        None: if the job is valid
+        str: the error message
+    """
+    if not isinstance(job, dict):
+        return "Job is not a dict: %r" % (job,)
+    missing = [name for name in REQUIRED_JOB_KEYS if name not in job]
+    if missing:
+        return "Job has no %s" % (", ".join(missing))
+    return None
+
+
+def isUpToDate(job, previous=None):
+    """Check if the output file of a job is newer than its font file,
+    and, if a previous manifest entry is given, if it was rendered, or
+    skipped as up to date, with the same job parameters
+
+    Args:
+        job (dict):
+        previous (dict, optional): manifest entry of the previous run
+
+    Returns:
+        bool:
+    """
+    output_file = job["output_file"]
+    if not os.path.exists(output_file) or not os.path.exists(job["font_file"]):
+        return False
+    if os.path.getmtime(output_file) < os.path.getmtime(job["font_file"]):
+        return False
+    if previous is not None:
+        if previous.get("status") not in ("rendered", "skipped"):
+            return False
+        if previous.get("key") != jobKey(job):
+            return False
+    return True
+
+
+def renderJob(job):
+    """Render one job with a new HarfBuzzRenderer
+
+    Args:
+        job (dict):
+
+    Returns:
+        dict: manifest entry with the output_file, key, status
+            ('rendered' | 'failed') and seconds
+    """
+    start = time.time()
+    hb = HarfBuzzRenderer()
+    for name, value in job.items():
+        if name not in JOB_KEYS:
+            setattr(hb, name, value)
+    output_format = job.get("output_format")
+    if not output_format:
+        output_format = os.path.splitext(job["output_file"])[1][1:].lower()
+    folder = os.path.dirname(os.path.realpath(job["output_file"]))
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        hb.openFont(job["font_file"], face_index=job.get("face_index", 0))
+        output_path = None
+        if hb.font_file:
+            output_path = hb._toImage(
+                text=job["text"],
+                output_format=output_format,
+                font_size=job.get("font_size", 0),
+                output_file=job["output_file"],
+            )
+    entry = {
+        "output_file": job["output_file"],
+        "key": jobKey(job),
+        "status": "rendered" if output_path else "failed",
+        "seconds": time.time() - start,
+    }
+    if caught:
+        entry["warnings"] = [str(w.message) for w in caught]
+    return entry
+
+
+def renderBatch(jobs, workers=None, manifest_file=None, force=False):
+    """Render the jobs in a process pool, skipping the jobs whose output
+    is up to date, and write a manifest with the timing of each job.
+    A job without the required keys is not rendered, its entry has the
+    status 'failed' and the error in 'warnings'.
+
+    Args:
+        jobs (list[dict, ...]): the jobs
+        workers (int, optional): number of processes, default: os.cpu_count()
+        manifest_file (str, optional): path of the JSON manifest; the previous
+            manifest at this path is used to detect changed jobs
+        force (bool, optional): render all jobs, even if up to date
+
+    Returns:
+        dict: the manifest, {'jobs': [entry, ...], 'seconds': total time}
+            with one entry per job, in the order of jobs
+    """
+    start = time.time()
+    previous = {}
+    if manifest_file and os.path.exists(manifest_file):
+        with open(manifest_file, encoding="utf-8") as f:
+            previous = {
+                e.get("output_file"): e for e in json.load(f).get("jobs", []) if e
+            }
+    entries = [None] * len(jobs)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for i, job in enumerate(jobs):
+            error = checkJob(job)
+            if error:
+                output_file = job.get("output_file") if isinstance(job, dict) else None
+                entries[i] = {
+                    "output_file": output_file,
+                    "key": jobKey(job),
+                    "status": "failed",
+                    "seconds": 0.0,
+                    "warnings": [error],
+                }
+            elif not force and isUpToDate(job, previous.get(job["output_file"])):
+                entries[i] = {
+                    "output_file": job["output_file"],
+                    "key": jobKey(job),
+                    "status": "skipped",
+                    "seconds": 0.0,
+                }
+            else:
+                futures[executor.submit(renderJob, job)] = i
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            try:
+                entries[i] = future.result()
+            except Exception as e:
+                entries[i] = {
+                    "output_file": jobs[i]["output_file"],
+                    "key": jobKey(jobs[i]),
+                    "status": "failed",
+                    "seconds": 0.0,
+                    "warnings": [repr(e)],
+                }
+    manifest = {"jobs": entries, "seconds": time.time() - start}
+    if manifest_file:
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="hb_render batch", description="Render proof images in parallel"
+    )
+    parser.add_argument("jobs", help="JSON file with a list of jobs")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--manifest", default=None, help="default: <jobs>.manifest.json"
+    )
+    parser.add_argument("--force", action="store_true", help="render all jobs")
+    options = parser.parse_args(args)
+    with open(options.jobs, encoding="utf-8") as f:
+        jobs = json.load(f)
+    manifest_file = options.manifest
+    if not manifest_file:
+        manifest_file = os.path.splitext(options.jobs)[0] + ".manifest.json"
+    manifest = renderBatch(
+        jobs, workers=options.workers, manifest_file=manifest_file, force=options.force
+    )
+    counts = {}
+    for entry in manifest["jobs"]:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    print(
+        "%s in %.2fs, manifest: %s"
+        % (
+            ", ".join("%d %s" % (n, status) for status, n in sorted(counts.items())),
+            manifest["seconds"],
+            manifest_file,
+        )
+    )
+    return 1 if counts.get("failed") else 0
@@ -0,0 +1,244 @@
+"""hb_cache.py
+
+hb_cache.ShapingCache class
+
+content-addressed cache of hb_render.HarfBuzzRenderer.toJson() results,
+with a bounded in-memory LRU and an optional persistent SQLite store
+
+"""
+
+import atexit
+import collections
+import hashlib
+import json
+import os.path
+import sqlite3
+import threading
+import weakref
+
+__version__ = "0.1"
+
+GLYPH_KEYS = ("g", "cl", "dx", "dy", "ax", "ay")
+
+FONT_HASHES_MAXSIZE = 256
+"""Max. number of font file hashes kept by fontHash()"""
+
+_font_hashes = collections.OrderedDict()
+_font_hashes_lock = threading.Lock()
+_caches = weakref.WeakSet()
+
+
+def fontHash(font_file):
+    """Get the SHA-1 hash of the font file contents. The hash is memoized
+    per path, inode, modification and change time and size, so an edited
+    or replaced font gets a new hash. Up to FONT_HASHES_MAXSIZE hashes are
+    kept, the least recently used are dropped.
+
+    Args:
+        font_file (str): path to the font file
+
+    Returns:
+        None: if font_file is None
+        str: hex digest
+    """
+    if font_file is None:
+        return None
+    path = os.path.realpath(font_file)
+    stat = os.stat(path)
+    stamp = (path, stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size)
+    with _font_hashes_lock:
+        digest = _font_hashes.get(stamp)
+        if digest is not None:
+            _font_hashes.move_to_end(stamp)
+            return digest
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    digest = sha1.hexdigest()
+    with _font_hashes_lock:
+        _font_hashes[stamp] = digest
+        while len(_font_hashes) > FONT_HASHES_MAXSIZE:
+            _font_hashes.popitem(last=False)
+    return digest
+
+
+@atexit.register
+def _flushCaches():
+    """Commit the pending writes of all open ShapingCache databases"""
+    for cache in list(_caches):
+        cache.flush()
+
+
+class ShapingCache:
+    """Cache of shaping results, used by HarfBuzzRenderer.toJson() and
+    HarfBuzzRenderer.shapeMany() when assigned to HarfBuzzRenderer.cache
+
+    The key covers the hash of the font file contents, and all shaping
+    attributes of the renderer (see hb_render.SHAPING_ATTRIBUTES) except
+    the font file path.
+
+    Attributes:
+        maxsize (int):
+            max. number of results in memory, default: 10000
+        path (str):
+            path to an SQLite database to persist the results, or None
+        hits (int):
+            number of results found in memory or in the database
+        disk_hits (int):
+            number of hits that were found in the database
+        misses (int):
+            number of results not found in the cache
+        evictions (int):
+            number of results dropped from memory to stay within maxsize
+
+    Writes to the database are committed every 1000 results, by flush()
+    and close(), at the end of a `with` block, and at interpreter exit.
+
+    Example:
+        with ShapingCache(maxsize=50000, path='shaping.sqlite') as cache:
+            hb.cache = cache
+            hb.toJson('Hello')
+    """
+
+    def __init__(self, maxsize=10000, path=None):
+        """Initialize the ShapingCache() object
+
+        Args:
+            maxsize (int, optional): max. number of results in memory
+            path (str, optional): path to an SQLite database
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS shapes (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self._db.commit()
+            _caches.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self._items)
+
+    def key(self, renderer, text):
+        """Build the cache key for shaping text with the renderer
+
+        Args:
+            renderer (HarfBuzzRenderer): provides the shaping attributes
+            text (unicode): the text to shape
+
+        Returns:
+            str: hex digest
+        """
+        settings = renderer.getSettings()
+        del settings["backend"]
+        settings["font_file"] = fontHash(renderer.font_file)
+        data = json.dumps([settings, text], sort_keys=True)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get a cached result
+
+        Args:
+            key (str): from self.key()
+
+        Returns:
+            None: if the result is not in the cache
+            list[dict, ...]: glyph records in `hb-shape` JSON output format
+        """
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM shapes WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    value = tuple(tuple(glyph) for glyph in json.loads(row[0]))
+                    self._store(key, value)
+                    self.disk_hits += 1
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return [dict(zip(GLYPH_KEYS, glyph)) for glyph in value]
+
+    def set(self, key, glyphs):
+        """Store a result
+
+        Args:
+            key (str): from self.key()
+            glyphs (list[dict, ...]): glyph records in `hb-shape` JSON output format
+        """
+        value = tuple(tuple(glyph[k] for k in GLYPH_KEYS) for glyph in glyphs)
+        with self._lock:
+            self._store(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO shapes (key, value) VALUES (?, ?)",
+                    (key, json.dumps(value)),
+                )
+                self._pending += 1
+                if self._pending >= 1000:
+                    self._db.commit()
+                    self._pending = 0
+
+    def _store(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all results from memory and from the database"""
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM shapes")
+                self._db.commit()
+
+    def flush(self):
+        """Commit the pending writes to the database"""
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._pending = 0
+
+    def close(self):
+        """Commit the pending writes and close the database"""
+        if self._db is not None:
+            self.flush()
+            with self._lock:
+                self._db.close()
+                self._db = None
+            _caches.discard(self)
+
+    def stats(self):
+        """Returns:
+        dict: the hit, miss and eviction counters and the number of results in memory
+        """
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._items),
+        }
@@ -0,0 +1,566 @@
+"""hb_compile.py
+
+hb_compile.IncrementalCompiler class
+
+compiles FEA code into the GSUB, GPOS and GDEF tables of an in-memory
+font, and shapes with the result via hb_render.HarfBuzzRenderer without
+saving the font. After an edit, the FEA code is parsed again only if a
+top-level block changed, and only the tables that the changed blocks
+affect are rebuilt. The work is saved per table: a table that is rebuilt
+is built whole by fontTools.feaLib, from all blocks that affect it.
+
+Usage:
+    with IncrementalCompiler('MyFont.otf') as compiler:
+        hb = compiler.renderer()
+        compiler.compileFile('features.fea')
+        print(hb.toJson('Hello'))
+        # edit features.fea
+        compiler.compileFile('features.fea')
+        print(hb.toJson('Hello'))
+
+"""
+
+import bisect
+import hashlib
+import io
+import os
+import re
+import time
+import warnings
+
+from feaLab.hb_render import HarfBuzzRenderer, UharfbuzzBackend
+
+__version__ = "0.1"
+
+LAYOUT_TABLES = ("GSUB", "GPOS", "GDEF")
+"""Tables built from the FEA code, the other tables are kept as they are"""
+
+_TOKEN_RE = re.compile(r'#[^\n]*|"[^"]*"|[{};]')
+
+# FEA statements that are built into GDEF, or whose lookups infer GDEF classes
+_GDEF_STATEMENTS = (
+    "MarkClassDefinition",
+    "MarkBasePosStatement",
+    "MarkLigPosStatement",
+    "MarkMarkPosStatement",
+)
+# FEA statements that do not build anything by themselves
+_NEUTRAL_STATEMENTS = (
+    "Comment",
+    "GlyphClassDefinition",
+    "AnchorDefinition",
+    "ValueRecordDefinition",
+    "LanguageSystemStatement",
+    "ScriptStatement",
+    "LanguageStatement",
+    "LookupFlagStatement",
+    "SubtableStatement",
+)
+
+
+def splitBlocks(text):
+    """Split FEA code into top-level blocks. Each statement with braces
+    (feature, lookup, table blocks, ...) is one block, consecutive other
+    statements (glyph class definitions, markClass, languagesystem, ...)
+    are grouped into one block. Comments belong to the following block.
+
+    Args:
+        text (str): FEA code
+
+    Returns:
+        list: (line number, text) tuples, the texts add up to the input
+    """
+    blocks = []
+    depth = 0
+    start = 0
+    groupStart = None
+    braced = False
+    line = 1
+    counted = 0
+
+    def append(begin, end):
+        nonlocal line, counted
+        line += text.count("\n", counted, begin)
+        counted = begin
+        blocks.append((line, text[begin:end]))
+
+    for m in _TOKEN_RE.finditer(text):
+        token = m.group()
+        if token == "{":
+            depth += 1
+            braced = True
+        elif token == "}":
+            depth = max(depth - 1, 0)
+        elif token == ";" and depth == 0:
+            if not braced:
+                if groupStart is None:
+                    groupStart = start
+            else:
+                if groupStart is not None:
+                    append(groupStart, start)
+                    groupStart = None
+                append(start, m.end())
+            start = m.end()
+            braced = False
+    if groupStart is not None:
+        append(groupStart, start)
+    if text[start:].strip():
+        append(start, len(text))
+    elif blocks:
+        blocks[-1] = (blocks[-1][0], blocks[-1][1] + text[start:])
+    return blocks
+
+
+class FeaBlock:
+    """Parsed top-level block of FEA code, with what it defines and which
+    layout tables it affects
+
+    Attributes:
+        text (str): the FEA code of the block
+        statements (list): the feaLib AST statements
+        tables (set): 'GSUB' and/or 'GPOS' if the block has rules for them
+        gdef (bool): True if the block can change GDEF
+        usesSets (bool): True if a lookupflag uses mark attachment classes
+            or mark filtering sets, which are numbered across both tables
+        lookupTables (dict): {lookup name: set of tables} of the lookups
+            defined in the block
+        references (set): names of the lookups the block refers to
+        defines (bool): True if the block defines glyph classes, mark
+            classes, anchors or value records, which the following blocks
+            can use
+    """
+
+    def __init__(self, text, statements):
+        from fontTools.feaLib import ast
+
+        self.text = text
+        self.statements = statements
+        self.tables = set()
+        self.gdef = False
+        self.usesSets = False
+        self.lookupTables = {}
+        self.references = set()
+        self.defines = False
+        self.common = any(
+            not isinstance(statement, (ast.Block, ast.Comment))
+            for statement in statements
+        )
+        for statement in statements:
+            if isinstance(
+                statement, (ast.AnchorDefinition, ast.ValueRecordDefinition)
+            ):
+                self.defines = True
+            self.tables |= self._scan(statement, ast)
+
+    def _scan(self, statement, ast):
+        """Collect the definitions of a statement and return its tables"""
+        name = type(statement).__name__
+        tables = set()
+        if isinstance(statement, ast.TableBlock):
+            if statement.name == "GDEF":
+                self.gdef = True
+            return tables
+        if isinstance(statement, ast.Block):
+            for child in statement.statements:
+                tables |= self._scan(child, ast)
+            if isinstance(statement, ast.LookupBlock):
+                self.lookupTables[statement.name] = tables
+            return tables
+        if isinstance(statement, (ast.GlyphClassDefinition, ast.MarkClassDefinition)):
+            self.defines = True
+        elif isinstance(statement, ast.LookupReferenceStatement):
+            self.references.add(statement.lookup.name)
+        elif isinstance(statement, ast.LookupFlagStatement):
+            if statement.markAttachment or statement.markFilteringSet:
+                self.usesSets = self.gdef = True
+        if name in _GDEF_STATEMENTS:
+            self.gdef = True
+        if "Subst" in name or isinstance(statement, ast.FeatureReferenceStatement):
+            tables.add("GSUB")
+        elif "Pos" in name or name in _GDEF_STATEMENTS:
+            tables.add("GPOS")
+        elif name not in _NEUTRAL_STATEMENTS and not isinstance(
+            statement, ast.LookupReferenceStatement
+        ):
+            # feature parameters, names, ...: could be in either table
+            tables |= {"GSUB", "GPOS"}
+        return tables
+
+    def updatePrefix(self, prefix):
+        """Returns:
+        bytes: the digest of the definitions before the next block
+        """
+        if self.defines:
+            prefix = hashlib.sha1(prefix + self.text.encode("utf-8")).digest()
+        if self.lookupTables:
+            names = "\n".join(sorted(self.lookupTables)).encode("utf-8")
+            prefix = hashlib.sha1(prefix + b"lookup\n" + names).digest()
+        return prefix
+
+
+class CompiledFontBackend(UharfbuzzBackend):
+    """Shaping backend that shapes with the in-memory font of an
+    IncrementalCompiler, for the renderers whose font_file is the source
+    font of the compiler, and like UharfbuzzBackend otherwise."""
+
+    name = "compiled"
+
+    def __init__(self, compiler):
+        super().__init__()
+        self.compiler = compiler
+
+    def getFont(self, font_file, face_index=0, font_size=0):
+        if (
+            font_file == self.compiler.font_file
+            and face_index == self.compiler.face_index
+        ):
+            return self.compiler.getHbFont(font_size)
+        return super().getFont(font_file, face_index, font_size)
+
+
+class IncrementalCompiler:
+    """Compiles FEA code into the layout tables of an in-memory font.
+
+    The FEA code is split into top-level blocks (see splitBlocks()). It is
+    parsed again with fontTools.feaLib, as a whole, only if a block
+    changed: its text, or the glyph class, mark class, anchor and value
+    record definitions before it. The GSUB and
+    GPOS tables are rebuilt with fontTools.feaLib only if a block with
+    rules for them changed; a table is then built whole, from all the
+    blocks that affect it, so an edit of one rule rebuilds the lookups of
+    the whole table. GSUB, GPOS and GDEF are rebuilt together if GDEF can
+    change (mark classes, mark attachment, lookupflag mark sets, table
+    GDEF). If a build fails, the tables are restored, so the font keeps
+    the result of the last successful compile. The other tables of the
+    font are never decompiled, HarfBuzz reads them from the font file.
+
+    Attributes:
+        font_file (str): path to the source font
+        face_index (int): face index in a TTC file
+        font (fontTools.ttLib.TTFont): the font with the compiled tables
+        stats (dict): the number of blocks, the number of blocks parsed,
+            the rebuilt tables and the time of the last compile()
+        backend (CompiledFontBackend): shaping backend for the compiled font
+
+    The source font is opened lazily and stays open for the tables that
+    HarfBuzz reads from it, until close().
+
+    Example:
+        with IncrementalCompiler('MyFont.otf') as compiler:
+            hb = compiler.renderer()
+            compiler.compile(fea)
+            hb.toJson('Hello')
+    """
+
+    def __init__(self, font_file, face_index=0):
+        """Initialize the IncrementalCompiler() object
+
+        Args:
+            font_file (str): path to the source font
+            face_index (int, optional): the face index in a TTC file
+        """
+        from fontTools.ttLib import TTFont
+
+        self.font_file = font_file
+        self.face_index = face_index
+        self.font = TTFont(font_file, fontNumber=face_index, lazy=True)
+        self.stats = {}
+        self.backend = CompiledFontBackend(self)
+        self.fea_name = "<features>"
+        self._glyphNames = self.font.getGlyphOrder()
+        self._blocks = {}
+        self._markClasses = {}
+        self._fingerprints = {}
+        self._tableData = {}
+        self._rawTables = {}
+        self._tableFunc = self._getTable
+        self._face = None
+        self._hbFonts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the source font. The compiled font cannot shape after this."""
+        self._face = None
+        self._hbFonts = {}
+        self._rawTables = {}
+        self.font.close()
+
+    def renderer(self):
+        """Returns:
+        HarfBuzzRenderer: renderer for the source font that shapes with
+            the compiled font. It must not use a ShapingCache, whose key
+            is the font file contents.
+        """
+        hb = HarfBuzzRenderer(self.font_file, self.face_index)
+        hb.backend = self.backend
+        return hb
+
+    def _keys(self, blocks):
+        """Get the keys of the blocks: the hash of their text and of the
+        glyph class, mark class, anchor, value record and lookup
+        definitions before them
+
+        Args:
+            blocks (list): texts, or FeaBlock objects whose definitions are
+                known
+
+        Yields:
+            str: the key of each block, while they are known
+        """
+        prefix = b""
+        for block in blocks:
+            text = block if isinstance(block, str) else block.text
+            key = hashlib.sha1(prefix + text.encode("utf-8")).hexdigest()
+            yield key
+            if isinstance(block, str):
+                block = self._blocks.get(key)
+                if block is None:
+                    return
+            prefix = block.updatePrefix(prefix)
+
+    def _parse(self, fea, splits):
+        """Parse the FEA code with fontTools.feaLib, and split the
+        statements into the blocks that they start in
+
+        Args:
+            fea (str): FEA code
+            splits (list): (line number, text) tuples from splitBlocks()
+
+        Returns:
+            tuple: ([FeaBlock, ...], mark classes of the parsed file)
+        """
+        from fontTools.feaLib.parser import Parser
+
+        featurefile = io.StringIO(fea)
+        featurefile.name = self.fea_name
+        doc = Parser(featurefile, self._glyphNames, followIncludes=False).parse()
+        lineStarts = [0] + [m.end() for m in re.finditer("\n", fea)]
+        blockStarts = []
+        offset = 0
+        for line, text in splits:
+            blockStarts.append(offset)
+            offset += len(text)
+        statements = [[] for text in splits]
+        for statement in doc.statements:
+            location = statement.location
+            offset = lineStarts[location.line - 1] + location.column - 1
+            statements[bisect.bisect(blockStarts, offset) - 1].append(statement)
+        blocks = [
+            FeaBlock(text, blockStatements)
+            for (line, text), blockStatements in zip(splits, statements)
+        ]
+        return (blocks, doc.markClasses)
+
+    def compile(self, fea):
+        """Compile FEA code into the font, incrementally: the code is parsed
+        again if a block changed, and the GSUB, GPOS and GDEF tables that
+        the changed blocks affect are built again, each one whole
+
+        Args:
+            fea (str): FEA code, include statements are not followed,
+                use compileFile()
+
+        Returns:
+            None: if the FEA code has errors, the font is then unchanged
+            dict: self.stats
+        """
+        from fontTools.feaLib import ast
+        from fontTools.feaLib.builder import Builder
+        from fontTools.feaLib.error import FeatureLibError
+
+        start = time.time()
+        splits = splitBlocks(fea)
+        keys = list(self._keys([text for line, text in splits]))
+        parsed = 0
+        if len(keys) == len(splits) and set(keys) == set(self._blocks):
+            # the same blocks, maybe in another order
+            blocks = [(key, self._blocks[key]) for key in keys]
+            markClasses = self._markClasses
+        else:
+            try:
+                parsedBlocks, markClasses = self._parse(fea, splits)
+            except FeatureLibError as e:
+                warnings.warn("Cannot parse the FEA code: %s" % (e))
+                return None
+            blocks = list(zip(self._keys(parsedBlocks), parsedBlocks))
+            parsed = len(blocks)
+        parseTime = time.time() - start
+        self._blocks = dict(blocks)
+        self._markClasses = markClasses
+
+        lookupTables = {}
+        for key, block in blocks:
+            lookupTables.update(block.lookupTables)
+        scopes = []
+        fingerprints = {tag: hashlib.sha1() for tag in LAYOUT_TABLES}
+        for key, block in blocks:
+            scope = set(block.tables)
+            for name in block.references:
+                scope |= lookupTables.get(name, {"GSUB", "GPOS"})
+            if block.common or not scope:
+                scope = set(LAYOUT_TABLES)
+            elif block.gdef:
+                scope.add("GDEF")
+            scopes.append(scope)
+            for tag in scope:
+                fingerprints[tag].update(key.encode("ascii"))
+        fingerprints = {tag: f.hexdigest() for tag, f in fingerprints.items()}
+        changed = [
+            tag
+            for tag in LAYOUT_TABLES
+            if fingerprints[tag] != self._fingerprints.get(tag)
+        ]
+        if "GDEF" in changed or not self._fingerprints:
+            changed = list(LAYOUT_TABLES)
+
+        statements = None
+        if changed in (["GSUB"], ["GPOS"]):
+            statements = self._tableStatements(changed[0], blocks, scopes)
+        if statements is None:
+            statements = [s for key, block in blocks for s in block.statements]
+        if changed:
+            doc = ast.FeatureFile()
+            doc.statements = statements
+            doc.markClasses = markClasses
+            saved = self._saveTables()
+            try:
+                Builder(self.font, doc).build(tables=changed)
+                tableData = {
+                    tag: self.font[tag].compile(self.font) if tag in self.font else None
+                    for tag in changed
+                }
+            except FeatureLibError as e:
+                self._restoreTables(saved)
+                warnings.warn("Cannot build the FEA code: %s" % (e))
+                return None
+            except Exception:
+                self._restoreTables(saved)
+                raise
+            self._tableData.update(tableData)
+            self._face = None
+            self._hbFonts = {}
+        self._fingerprints = fingerprints
+        self.stats = {
+            "blocks": len(blocks),
+            "parsed": parsed,
+            "tables": changed,
+            "parse_seconds": parseTime,
+            "seconds": time.time() - start,
+        }
+        return self.stats
+
+    def _saveTables(self):
+        """Returns:
+        dict: the table objects and the directory entries of the tables
+            that Builder.build() replaces, deletes or changes, for
+            _restoreTables()
+        """
+        font = self.font
+        saved = {}
+        for tag in LAYOUT_TABLES + ("OS/2",):
+            entry = font.reader.tables.get(tag) if font.reader else None
+            saved[tag] = (font.tables.get(tag), entry)
+        if font.isLoaded("OS/2"):
+            saved["usMaxContext"] = font["OS/2"].usMaxContext
+        return saved
+
+    def _restoreTables(self, saved):
+        """Undo a failed Builder.build(), see _saveTables()"""
+        font = self.font
+        saved = dict(saved)
+        maxContext = saved.pop("usMaxContext", None)
+        for tag, (table, entry) in saved.items():
+            if table is None:
+                # not loaded before, read again from the font file
+                font.tables.pop(tag, None)
+            else:
+                font.tables[tag] = table
+            if entry is not None:
+                font.reader.tables[tag] = entry
+        if maxContext is not None:
+            font["OS/2"].usMaxContext = maxContext
+
+    def _tableStatements(self, tag, blocks, scopes):
+        """Returns:
+        list: the statements of the blocks that affect the table, or None
+            if the other blocks number mark sets before them or define
+            lookups that they refer to, then the table needs all blocks
+        """
+        included = [block for (k, block), scope in zip(blocks, scopes) if tag in scope]
+        excluded = [
+            block for (k, block), scope in zip(blocks, scopes) if tag not in scope
+        ]
+        if any(b.usesSets for b in included) and any(b.usesSets for b in excluded):
+            return None
+        references = set()
+        for block in included:
+            references |= block.references
+        for block in excluded:
+            if references & set(block.lookupTables):
+                return None
+        return [s for block in included for s in block.statements]
+
+    def compileFile(self, fea_file, includeDir=None):
+        """Compile a FEA file into the font, incrementally
+
+        Args:
+            fea_file (str): path to the FEA file
+            includeDir (str, optional): folder to resolve relative include
+                paths in, default: the folder of fea_file, as in feaLib
+
+        Returns:
+            None: if the FEA code has errors, the font is then unchanged
+            dict: self.stats
+        """
+        from feaLab.hb_scripts3 import _flatFeaLines
+
+        if includeDir is None:
+            includeDir = os.path.dirname(os.path.abspath(fea_file))
+        lines = _flatFeaLines(fea_file, includeDir, languageSystems=True)
+        self.fea_name = fea_file
+        return self.compile("\n".join(lines) + "\n")
+
+    def _getTable(self, face, tag, user_data):
+        # HarfBuzz does not copy the data, the bytes must stay alive
+        data = self._tableData.get(tag)
+        if data is None:
+            data = self._rawTables.get(tag)
+            if data is None:
+                data = self.font.reader[tag] if tag in self.font.reader else b""
+                self._rawTables[tag] = data
+            if tag in self._tableData:
+                data = b""
+        return data
+
+    def getHbFont(self, font_size=0):
+        """Return a `uharfbuzz.Font` of the compiled font
+
+        Args:
+            font_size (int, optional): the font size, 0 means 'upem'
+
+        Returns:
+            uharfbuzz.Font:
+        """
+        font = self._hbFonts.get(font_size)
+        if font is None:
+            hb = self.backend.hb
+            if self._face is None:
+                self._face = hb.Face.create_for_tables(self._tableFunc, None)
+            font = hb.Font(self._face)
+            if font_size:
+                font.scale = (font_size, font_size)
+            self._hbFonts[font_size] = font
+        return font
+
+    def save(self, output_file):
+        """Save the compiled font, e.g. to keep a proofed state
+
+        Args:
+            output_file (str): path to the font file to write
+        """
+        self.font.save(output_file)
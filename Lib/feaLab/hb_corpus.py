@@ -0,0 +1,241 @@
+"""hb_corpus.py
+
+shapes a text corpus of any size, one text per line, into a JSON Lines
+file with hb_render.HarfBuzzRenderer, reading the input lazily so that
+memory use does not grow with the size of the corpus
+
+Each output line is a JSON object with the keys:
+    offset (int): byte offset of the input line
+    end (int): byte offset after the input line, including the line break
+    text (unicode): the input line, without the line break
+    glyphs (list): glyph records in `hb-shape` JSON output format,
+        [] for an empty line, null if shaping failed
+    ms (float): shaping time in milliseconds, averaged over the texts
+        shaped in the same chunk
+
+Usage:
+    hb_render shape-corpus font.otf corpus.txt output.jsonl [--workers N]
+        [--chunk-size N] [--unordered] [--offset N] [--resume]
+        [--features liga,-kern] [--script Latn] [--language en]
+
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+import warnings
+
+from feaLab.hb_pool import ShapingPool, shapeChunk
+from feaLab.hb_render import HarfBuzzRenderer
+
+__version__ = "0.1"
+
+
+def readLines(input_file, offset=0):
+    """Generator to read a text file line by line from a byte offset
+
+    Args:
+        input_file (str): path to the UTF-8 text file
+        offset (int, optional): byte offset to start at, must be at the
+            start of a line
+
+    Yields:
+        tuple: (offset, end, text) per line, where text has no line break
+            and invalid UTF-8 is replaced
+    """
+    with open(input_file, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            end = offset + len(line)
+            yield (offset, end, line.rstrip(b"\r\n").decode("utf-8", "replace"))
+            offset = end
+
+
+def resumeState(output_file, offset=0):
+    """Find where to resume an interrupted run from its output file.
+    A partly written last line is removed from the file.
+
+    Args:
+        output_file (str): path to the JSON Lines output
+        offset (int, optional): byte offset of the input at which the
+            interrupted run was started
+
+    Returns:
+        tuple: (offset, done) where offset is the byte offset of the input
+            up to which all lines were written, and done is the set of the
+            offsets of input lines after it that were already written
+            (with unordered output)
+    """
+    if not os.path.exists(output_file):
+        return (offset, set())
+    ahead = {}
+    with open(output_file, "rb+") as f:
+        good = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            good += len(line)
+            record = json.loads(line.decode("utf-8"))
+            ahead[record["offset"]] = record["end"]
+            while offset in ahead:
+                offset = ahead.pop(offset)
+        f.truncate(good)
+    return (offset, set(ahead))
+
+
+def _records(lines, chunks, done):
+    """Join the shaping results of the chunks with the input lines"""
+    for start, results, seconds in chunks:
+        ms = 1000.0 * seconds / len(results) if results else 0.0
+        for i, glyphs in enumerate(results):
+            offset, end, text = lines.pop(start + i)
+            if offset in done:
+                continue
+            yield {
+                "offset": offset,
+                "end": end,
+                "text": text,
+                "glyphs": glyphs,
+                "ms": ms,
+            }
+
+
+def _shapeInProcess(renderer, texts, chunk_size):
+    """Shape the texts in chunks in this process. A text that cannot be
+    shaped gets None and a warning, the rest of its chunk is kept.
+
+    Yields:
+        tuple: (index of the first text, results, seconds) per chunk
+    """
+    index = 0
+    texts = iter(texts)
+    while True:
+        chunk = list(itertools.islice(texts, chunk_size))
+        if not chunk:
+            break
+        start = time.time()
+        results, errors = shapeChunk(renderer, chunk, chunk_size)
+        for i, error in errors:
+            warnings.warn(
+                "Cannot shape text %d %r: %s" % (index + i, chunk[i], error)
+            )
+        yield (index, results, time.time() - start)
+        index += len(chunk)
+
+
+def shapeCorpus(
+    renderer,
+    input_file,
+    output_file,
+    workers=0,
+    chunk_size=1000,
+    ordered=True,
+    offset=0,
+    resume=False,
+):
+    """Shape each line of a text file and write one JSON line per input line
+
+    Args:
+        renderer (HarfBuzzRenderer): provides the font and shaping settings
+        input_file (str): path to the UTF-8 text file
+        output_file (str): path to the JSON Lines output
+        workers (int, optional): number of worker processes
+            (hb_pool.ShapingPool), 0 shapes in this process
+        chunk_size (int, optional): number of texts per chunk
+        ordered (bool, optional): write the output in the order of the input
+        offset (int, optional): byte offset of the input to start at
+        resume (bool, optional): continue an interrupted run that was
+            started at offset, appending to output_file
+
+    Returns:
+        dict: {'texts': number of texts shaped, 'failed': number of texts
+            that could not be shaped, 'seconds': total time}
+    """
+    start = time.time()
+    done = set()
+    mode = "w"
+    if resume:
+        offset, done = resumeState(output_file, offset)
+        mode = "a"
+    lines = {}
+
+    def texts():
+        for i, line in enumerate(readLines(input_file, offset)):
+            lines[i] = line
+            yield line[2]
+
+    stats = {"texts": 0, "failed": 0}
+    pool = None
+    if workers:
+        pool = ShapingPool(renderer, workers=workers, chunk_size=chunk_size)
+        chunks = pool.shapeChunks(texts(), ordered=ordered)
+    else:
+        chunks = _shapeInProcess(renderer, texts(), chunk_size)
+    try:
+        with open(output_file, mode, encoding="utf-8") as f:
+            for record in _records(lines, chunks, done):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                stats["texts"] += 1
+                if record["glyphs"] is None:
+                    stats["failed"] += 1
+    finally:
+        if pool is not None:
+            pool.close()
+    stats["seconds"] = time.time() - start
+    return stats
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="hb_render shape-corpus",
+        description="Shape each line of a text file into JSON Lines",
+    )
+    parser.add_argument("font_file")
+    parser.add_argument("input_file", help="UTF-8 text file, one text per line")
+    parser.add_argument("output_file", help="JSON Lines output file")
+    parser.add_argument("--face-index", type=int, default=0)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="worker processes, 0: in-process"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--unordered", action="store_true", help="write results as they are done"
+    )
+    parser.add_argument("--offset", type=int, default=0, help="input byte offset")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue an interrupted run started at --offset",
+    )
+    parser.add_argument("--features", default="", help="e.g. liga,-kern")
+    parser.add_argument("--script", default="auto")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--direction", default="auto")
+    options = parser.parse_args(args)
+    hb = HarfBuzzRenderer()
+    hb.openFont(options.font_file, face_index=options.face_index)
+    if not hb.font_file:
+        return 1
+    hb.features = [f for f in options.features.split(",") if f]
+    hb.script = options.script
+    hb.language = options.language
+    hb.direction = options.direction
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        stats = shapeCorpus(
+            hb,
+            options.input_file,
+            options.output_file,
+            workers=options.workers,
+            chunk_size=options.chunk_size,
+            ordered=not options.unordered,
+            offset=options.offset,
+            resume=options.resume,
+        )
+    print(
+        "%d texts (%d failed) in %.2fs"
+        % (stats["texts"], stats["failed"], stats["seconds"])
+    )
+    return 1 if stats["failed"] else 0
@@ -0,0 +1,256 @@
+"""hb_diff.py
+
+shapes a corpus with two builds of a font (A and B) using
+hb_render.HarfBuzzRenderer and reports the texts that shape differently,
+grouped by the kind of difference
+
+Kinds of differences:
+    substitution: the glyphs differ
+    positioning: the advances or offsets differ
+    cluster: the cluster values differ
+    error: the text could not be shaped with one of the fonts
+
+Usage:
+    hb_render diff-fonts a.otf b.otf corpus.txt [--output diffs.jsonl]
+        [--svg-dir dir] [--max-svgs N] [--workers N] [--cache a.sqlite]
+        [--features liga,-kern] [--script Latn] [--language en]
+
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import os
+import re
+import time
+import warnings
+
+from feaLab.hb_glyphrun import GlyphNameTable, GlyphRun
+from feaLab.hb_render import HarfBuzzRenderer
+
+__version__ = "0.1"
+
+DIFF_KINDS = {
+    "glyphs": "substitution",
+    "positions": "positioning",
+    "clusters": "cluster",
+}
+"""Report group for each kind returned by GlyphRun.diff()"""
+
+_SIZE_RE = re.compile(r'width="([\d.]+)" height="([\d.]+)"')
+
+
+def compareRuns(a, b, names=None):
+    """Compare the shaping results of a text with font A and font B
+
+    Args:
+        a, b (list[dict, ...]): glyph records in `hb-shape` JSON output
+            format, or None if shaping failed
+        names (GlyphNameTable, optional): table to intern the glyph names
+
+    Returns:
+        list: report groups of the differences, empty if equal
+    """
+    if a is None or b is None:
+        return [] if a is b else ["error"]
+    if a == b:
+        return []
+    names = names if names is not None else GlyphNameTable()
+    kinds = GlyphRun.fromJson(a, names).diff(GlyphRun.fromJson(b, names))
+    return [DIFF_KINDS[kind] for kind in kinds]
+
+
+def _shapeStream(renderer, texts, workers, chunk_size):
+    """Shape the texts with a ShapingPool, or in-process if workers is 0
+    or the renderer has a cache, so that cached results are not reshaped
+    """
+    if not workers or renderer.cache is not None:
+        for result in renderer.shapeMany(texts, batch_size=chunk_size):
+            yield result
+        return
+    from feaLab.hb_pool import ShapingPool
+
+    with ShapingPool(renderer, workers=workers, chunk_size=chunk_size) as pool:
+        for result in pool.shapeMany(texts):
+            yield result
+
+
+def _sideBySide(svg_a, svg_b):
+    """Place two SVG documents next to each other in one SVG document"""
+    width_a, height_a = (float(v) for v in _SIZE_RE.search(svg_a).groups())
+    width_b, height_b = (float(v) for v in _SIZE_RE.search(svg_b).groups())
+    width = width_a + width_b
+    height = max(height_a, height_b)
+    return "\n".join(
+        [
+            '<svg xmlns="http://www.w3.org/2000/svg" width="%g" height="%g" '
+            'viewBox="0 0 %g %g">' % (width, height, width, height),
+            svg_a.replace("<svg ", '<svg x="0" ', 1).strip(),
+            svg_b.replace("<svg ", '<svg x="%g" ' % (width_a), 1).strip(),
+            "</svg>",
+        ]
+    ) + "\n"
+
+
+def _writeSVG(renderer_a, renderer_b, text, output_file, font_size):
+    # renderSVG() sets font_size and text, render from copies so that the
+    # renderers still shaping the corpus keep their settings
+    svg_a = copy.copy(renderer_a).renderSVG(text, font_size=font_size)
+    svg_b = copy.copy(renderer_b).renderSVG(text, font_size=font_size)
+    if not svg_a or not svg_b:
+        return None
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(_sideBySide(svg_a, svg_b))
+    return output_file
+
+
+def compareCorpus(
+    renderer_a,
+    renderer_b,
+    texts,
+    output_file=None,
+    workers=0,
+    chunk_size=1000,
+    svg_dir=None,
+    max_svgs=10,
+    font_size=48,
+):
+    """Shape the texts with font A and font B and report the differences.
+    Both fonts are shaped at the same time, with a ShapingPool each if
+    workers is given. If renderer_a has a cache (hb_cache.ShapingCache),
+    font A is shaped in-process from the cache, so only font B is reshaped.
+
+    Args:
+        renderer_a (HarfBuzzRenderer): font A and the shaping settings
+        renderer_b (HarfBuzzRenderer): font B and the shaping settings
+        texts (iterable): the texts to compare, consumed lazily
+        output_file (str, optional): JSON Lines file to write the differing
+            texts to, as {'index', 'text', 'kinds', 'a', 'b'} records
+        workers (int, optional): number of worker processes per font,
+            0 shapes in this process
+        chunk_size (int, optional): number of texts per chunk
+        svg_dir (str, optional): folder for side-by-side SVGs (A left,
+            B right) of the first differing texts of each group
+        max_svgs (int, optional): max. number of SVGs per group
+        font_size (int, optional): font size of the SVGs
+
+    Returns:
+        dict: {'texts': number of texts compared, 'differing': number of
+            differing texts, 'groups': {group: number of texts},
+            'svgs': {group: [paths]}, 'seconds': total time}
+    """
+    start = time.time()
+    texts_a, texts_b, texts = itertools.tee(texts, 3)
+    names = GlyphNameTable()
+    report = {"texts": 0, "differing": 0, "groups": {}, "svgs": {}}
+    if svg_dir and not os.path.isdir(svg_dir):
+        os.makedirs(svg_dir)
+    f = open(output_file, "w", encoding="utf-8") if output_file else None
+    try:
+        results = zip(
+            texts,
+            _shapeStream(renderer_a, texts_a, workers, chunk_size),
+            _shapeStream(renderer_b, texts_b, workers, chunk_size),
+        )
+        for index, (text, a, b) in enumerate(results):
+            report["texts"] += 1
+            kinds = compareRuns(a, b, names)
+            if not kinds:
+                continue
+            report["differing"] += 1
+            for kind in kinds:
+                report["groups"][kind] = report["groups"].get(kind, 0) + 1
+                svgs = report["svgs"].setdefault(kind, [])
+                if svg_dir and kind != "error" and len(svgs) < max_svgs:
+                    path = _writeSVG(
+                        renderer_a,
+                        renderer_b,
+                        text,
+                        os.path.join(svg_dir, "%s-%d.svg" % (kind, index)),
+                        font_size,
+                    )
+                    if path:
+                        svgs.append(path)
+            if f is not None:
+                record = {
+                    "index": index,
+                    "text": text,
+                    "kinds": kinds,
+                    "a": a,
+                    "b": b,
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if f is not None:
+            f.close()
+    report["seconds"] = time.time() - start
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="hb_render diff-fonts",
+        description="Report the texts that shape differently with two font builds",
+    )
+    parser.add_argument("font_a", help="previous font build")
+    parser.add_argument("font_b", help="new font build")
+    parser.add_argument("input_file", help="UTF-8 text file, one text per line")
+    parser.add_argument("--output", default=None, help="JSON Lines file of diffs")
+    parser.add_argument("--svg-dir", default=None, help="folder for SVG proofs")
+    parser.add_argument("--max-svgs", type=int, default=10, help="SVGs per group")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="worker processes per font"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--cache", default=None, help="SQLite file to cache the font A results"
+    )
+    parser.add_argument("--features", default="", help="e.g. liga,-kern")
+    parser.add_argument("--script", default="auto")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--direction", default="auto")
+    options = parser.parse_args(args)
+    renderers = []
+    for font_file in (options.font_a, options.font_b):
+        hb = HarfBuzzRenderer()
+        hb.openFont(font_file)
+        if not hb.font_file:
+            return 1
+        hb.features = [f for f in options.features.split(",") if f]
+        hb.script = options.script
+        hb.language = options.language
+        hb.direction = options.direction
+        renderers.append(hb)
+    cache = None
+    if options.cache:
+        from feaLab.hb_cache import ShapingCache
+
+        cache = ShapingCache(path=options.cache)
+        renderers[0].cache = cache
+    from feaLab.hb_corpus import readLines
+
+    texts = (text for offset, end, text in readLines(options.input_file))
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            report = compareCorpus(
+                renderers[0],
+                renderers[1],
+                texts,
+                output_file=options.output,
+                workers=options.workers,
+                chunk_size=options.chunk_size,
+                svg_dir=options.svg_dir,
+                max_svgs=options.max_svgs,
+            )
+    finally:
+        if cache is not None:
+            cache.close()
+    print(
+        "%d of %d texts differ in %.2fs"
+        % (report["differing"], report["texts"], report["seconds"])
+    )
+    for kind, count in sorted(report["groups"].items()):
+        print("  %s: %d" % (kind, count))
+    return 1 if report["differing"] else 0
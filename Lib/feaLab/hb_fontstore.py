@@ -0,0 +1,241 @@
+"""hb_fontstore.py
+
+hb_fontstore.FontStore class
+
+process-wide store of the uharfbuzz blobs, faces and fonts of font files,
+used by the 'uharfbuzz' shaping backend: each file is memory-mapped once,
+read-only, and its blob is shared by all faces of a TTC, all renderers
+and, if loaded before the workers are forked, all worker processes
+
+"""
+
+import os.path
+import time
+
+__version__ = "0.1"
+
+
+class _FontFile:
+    """The blob of a font file, and its faces, fonts and glyph names"""
+
+    def __init__(self, path, stamp, blob):
+        self.path = path
+        self.stamp = stamp
+        self.blob = blob
+        self.faces = {}
+        self.fonts = {}
+        self.names = {}
+
+
+class FontStore:
+    """Store of the uharfbuzz blobs, faces and fonts of font files
+
+    HarfBuzz memory-maps the file of each blob read-only, so the pages of
+    a font are read from disk on first use, are shared with every other
+    process that maps the file, and are not copied into each process. The
+    faces of a TTC share the blob of the file. Blobs, faces and fonts
+    created before a fork, e.g. by preload() before starting a
+    hb_pool.ShapingPool, are inherited by the workers together with the
+    tables HarfBuzz has already checked and indexed.
+
+    A font file is looked up by the path as given, and checked for changes
+    by its inode, modification time and size, with one os.stat() call. It
+    is reloaded if it changed. With check_interval, the check only runs
+    every check_interval seconds, which saves the os.stat() call but may
+    shape with the previous version of a font for that long.
+
+    Attributes:
+        check_interval (float):
+            seconds between the checks of a font file for changes, 0 to
+            check on every call, default: 0
+        loads (int):
+            number of font files loaded
+        checks (int):
+            number of checks of font files for changes
+
+    Example:
+        store = getFontStore()
+        store.preload('NotoSansCJK.ttc')
+        font = store.getFont('NotoSansCJK.ttc', face_index=2)
+    """
+
+    def __init__(self, check_interval=0):
+        """Initialize the FontStore() object
+
+        Args:
+            check_interval (float, optional): seconds between the checks of
+                a font file for changes
+        """
+        from feaLab.hb_render import _loadUharfbuzz
+
+        self.hb = _loadUharfbuzz()
+        self.check_interval = check_interval
+        self.loads = 0
+        self.checks = 0
+        self._files = {}
+        self._paths = {}
+
+    def _file(self, font_file):
+        """Returns:
+        _FontFile: the loaded font file, reloaded if it changed on disk
+        """
+        entry = self._paths.get(font_file)
+        if entry is not None and self.check_interval:
+            now = time.monotonic()
+            if now - entry[0] < self.check_interval:
+                return entry[1]
+        self.checks += 1
+        stat = os.stat(font_file)
+        stamp = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if entry is not None and entry[1].stamp == stamp:
+            fontFile = entry[1]
+        else:
+            # the path is resolved only when the file is new or changed,
+            # so that symlinks and relative paths share one blob
+            path = os.path.realpath(font_file)
+            fontFile = self._files.get(path)
+            if fontFile is None or fontFile.stamp != stamp:
+                blob = self.hb.Blob.from_file_path(path)
+                fontFile = _FontFile(path, stamp, blob)
+                self._files[path] = fontFile
+                self.loads += 1
+        self._paths[font_file] = (
+            time.monotonic() if self.check_interval else 0,
+            fontFile,
+        )
+        return fontFile
+
+    def getBlob(self, font_file):
+        """Args:
+            font_file (str): path to the font file
+
+        Returns:
+            uharfbuzz.Blob: the memory-mapped file
+        """
+        return self._file(font_file).blob
+
+    def getFace(self, font_file, face_index=0):
+        """Args:
+            font_file (str): path to the font file
+            face_index (int, optional): the face index in a TTC file
+
+        Returns:
+            uharfbuzz.Face:
+        """
+        fontFile = self._file(font_file)
+        face = fontFile.faces.get(face_index)
+        if face is None:
+            face = fontFile.faces[face_index] = self.hb.Face(fontFile.blob, face_index)
+        return face
+
+    def getFont(self, font_file, face_index=0, font_size=0):
+        """Args:
+            font_file (str): path to the font file
+            face_index (int, optional): the face index in a TTC file
+            font_size (int, optional): the font size, 0 means 'upem'
+
+        Returns:
+            uharfbuzz.Font:
+        """
+        fontFile = self._file(font_file)
+        key = (face_index, font_size)
+        font = fontFile.fonts.get(key)
+        if font is None:
+            font = self.hb.Font(self.getFace(font_file, face_index))
+            if font_size:
+                font.scale = (font_size, font_size)
+            fontFile.fonts[key] = font
+        return font
+
+    def getGlyphNames(self, font_file, face_index=0):
+        """Args:
+            font_file (str): path to the font file
+            face_index (int, optional): the face index in a TTC file
+
+        Returns:
+            hb_glyphrun.GlyphNameTable: the glyph names of the face by glyph
+                id, as HarfBuzz names them, built once per face
+        """
+        fontFile = self._file(font_file)
+        names = fontFile.names.get(face_index)
+        if names is None:
+            from feaLab.hb_glyphrun import GlyphNameTable
+
+            font = self.getFont(font_file, face_index)
+            names = GlyphNameTable.fromGlyphOrder(
+                font.glyph_to_string(gid) for gid in range(font.face.glyph_count)
+            )
+            fontFile.names[face_index] = names
+        return names
+
+    def faceCount(self, font_file):
+        """Returns:
+        int: the number of faces in the font file, more than 1 for a TTC
+        """
+        return self.hb.Face(self.getBlob(font_file)).count
+
+    def preload(self, font_file, face_indexes=None, font_sizes=(0,), text=" "):
+        """Load the faces of a font file and shape a text with each, so that
+        HarfBuzz checks and indexes the cmap and layout tables now, e.g.
+        before forking worker processes that then share them
+
+        Args:
+            font_file (str): path to the font file
+            face_indexes (list, optional): the faces, default: all faces
+            font_sizes (list, optional): the font sizes to create fonts for
+            text (str, optional): the text to shape
+        """
+        if face_indexes is None:
+            face_indexes = range(self.faceCount(font_file))
+        for face_index in face_indexes:
+            for font_size in font_sizes:
+                font = self.getFont(font_file, face_index, font_size)
+                buf = self.hb.Buffer()
+                buf.add_str(text)
+                buf.guess_segment_properties()
+                self.hb.shape(font, buf, {})
+
+    def invalidate(self, font_file=None):
+        """Drop a font file, or all font files, from the store, so that they
+        are loaded again on the next call
+
+        Args:
+            font_file (str, optional): path to the font file
+        """
+        if font_file is None:
+            self._files.clear()
+            self._paths.clear()
+            return
+        path = os.path.realpath(font_file)
+        self._files.pop(path, None)
+        self._paths = {
+            name: entry for name, entry in self._paths.items() if entry[1].path != path
+        }
+
+    def stats(self):
+        """Returns:
+        dict: the numbers of files, faces and fonts in the store, the bytes
+            mapped, and the loads and checks counters
+        """
+        files = list(self._files.values())
+        return {
+            "files": len(files),
+            "faces": sum(len(f.faces) for f in files),
+            "fonts": sum(len(f.fonts) for f in files),
+            "bytes": sum(len(f.blob) for f in files),
+            "loads": self.loads,
+            "checks": self.checks,
+        }
+
+
+_store = None
+
+
+def getFontStore():
+    """Returns:
+    FontStore: the store shared by all shaping backends of the process
+    """
+    global _store
+    if _store is None:
+        _store = FontStore()
+    return _store
@@ -0,0 +1,384 @@
+"""hb_glyphrun.py
+
+hb_glyphrun.GlyphRun class
+
+compact, array-backed representation of a shaped glyph run, as an
+alternative to the list of per-glyph dicts returned by
+hb_render.HarfBuzzRenderer.toJson(), and a decoder of the `hb-shape`
+text output format
+
+"""
+
+import array
+import json
+import re
+
+__version__ = "0.1"
+
+
+class GlyphNameTable:
+    """Table of interned glyph names, shared by many GlyphRun objects.
+
+    A GlyphRun that uses the table stores the index of each glyph name
+    in the table instead of the name. If the table is built from the glyph
+    order of a font, the indices are the glyph ids of the font.
+
+    Attributes:
+        names (list): the glyph names, by index
+    """
+
+    def __init__(self, names=()):
+        """Initialize the GlyphNameTable() object
+
+        Args:
+            names (iterable, optional): initial glyph names, e.g. the glyph order
+        """
+        self.names = []
+        self._ids = {}
+        for name in names:
+            self.intern(name)
+
+    @classmethod
+    def fromGlyphOrder(cls, glyph_order):
+        """Build the table of the glyph names of a font, so that the index of
+        each name is its glyph id, also if the font has duplicate names
+
+        Args:
+            glyph_order (iterable): the glyph names by glyph id
+
+        Returns:
+            GlyphNameTable:
+        """
+        table = cls()
+        table.names = list(glyph_order)
+        for i, name in enumerate(table.names):
+            table._ids.setdefault(name, i)
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Get the index of a glyph name, adding it to the table if needed
+
+        Args:
+            name (str): glyph name
+
+        Returns:
+            int: index of the name in the table
+        """
+        i = self._ids.get(name)
+        if i is None:
+            i = len(self.names)
+            self.names.append(name)
+            self._ids[name] = i
+        return i
+
+    def name(self, i):
+        """Args:
+            i (int): index of the name in the table
+
+        Returns:
+            str: glyph name
+        """
+        return self.names[i]
+
+
+GLYPH_NAMES = GlyphNameTable()
+"""Default GlyphNameTable shared by all GlyphRun objects"""
+
+_TEXT_NUMBERS = str.maketrans("=@+|", ",,,,")
+"""Turns `hb-shape` text output with glyph ids into a JSON list of numbers"""
+
+_TEXT_SEPARATORS = str.maketrans("", "", "-0123456789[]")
+"""Keeps the separators of `hb-shape` text output, e.g. '=@,+' per glyph"""
+
+_TEXT_EXTRAS = re.compile(r"@-?\d+,-?\d+|,-?\d+")
+"""Offsets and y advances in `hb-shape` text output"""
+
+_TEXT_OFFSETS = re.compile(r"@(-?\d+),(-?\d+)")
+_TEXT_Y_ADVANCES = re.compile(r"\+-?\d+,(-?\d+)")
+
+
+def _unsigned(values):
+    """Returns:
+    array.array: the 'i' array values as an 'I' array
+    """
+    result = array.array("I")
+    result.frombytes(values.tobytes())
+    return result
+
+
+class GlyphRun:
+    """Shaped glyph run stored as parallel typed arrays.
+
+    Attributes:
+        glyphs (array.array):
+            glyph ids, or indices in self.names if self.names is not None
+        clusters (array.array):
+            cluster values
+        x_advances, y_advances (array.array):
+            glyph advances
+        x_offsets, y_offsets (array.array):
+            glyph offsets
+        names (GlyphNameTable):
+            table of glyph names, or None if self.glyphs are plain glyph ids
+
+    Runs are equal if diff() finds no differences. They are not hashable,
+    since the arrays can be changed in place.
+    """
+
+    __slots__ = (
+        "glyphs",
+        "clusters",
+        "x_advances",
+        "y_advances",
+        "x_offsets",
+        "y_offsets",
+        "names",
+    )
+
+    def __init__(
+        self,
+        glyphs=(),
+        clusters=(),
+        x_advances=(),
+        y_advances=(),
+        x_offsets=(),
+        y_offsets=(),
+        names=None,
+    ):
+        """Initialize the GlyphRun() object
+
+        Args:
+            glyphs (iterable): glyph ids, or indices in names
+            clusters (iterable): cluster values
+            x_advances, y_advances (iterable): glyph advances
+            x_offsets, y_offsets (iterable): glyph offsets
+            names (GlyphNameTable, optional): table of glyph names
+        """
+        self.glyphs = array.array("I", glyphs)
+        self.clusters = array.array("I", clusters)
+        self.x_advances = array.array("i", x_advances)
+        self.y_advances = array.array("i", y_advances)
+        self.x_offsets = array.array("i", x_offsets)
+        self.y_offsets = array.array("i", y_offsets)
+        self.names = names
+
+    @classmethod
+    def fromArrays(
+        cls, glyphs, clusters, x_advances, y_advances, x_offsets, y_offsets, names
+    ):
+        """Build a GlyphRun that uses the given arrays without copying them
+
+        Args:
+            glyphs, clusters (array.array): 'I' arrays
+            x_advances, y_advances, x_offsets, y_offsets (array.array): 'i' arrays
+            names (GlyphNameTable or None): table of glyph names
+
+        Returns:
+            GlyphRun:
+        """
+        run = cls.__new__(cls)
+        run.glyphs = glyphs
+        run.clusters = clusters
+        run.x_advances = x_advances
+        run.y_advances = y_advances
+        run.x_offsets = x_offsets
+        run.y_offsets = y_offsets
+        run.names = names
+        return run
+
+    @classmethod
+    def fromText(cls, data, names=None):
+        """Build a GlyphRun from one line of `hb-shape` text output with
+        glyph ids, as written with --no-glyph-names, e.g.
+        '[41=0+810|1=5+200|2998=6@-12,480+0]', where the offsets and the
+        y advance are left out if they are 0.
+
+        The numbers are parsed with one json.loads() call into a flat list,
+        which is sliced into the arrays. If only some glyphs have offsets or
+        a y advance, e.g. marks, those are parsed separately and set by
+        glyph index, so only these glyphs cost Python operations.
+
+        Args:
+            data (str): the output line
+            names (GlyphNameTable, optional): the glyph names of the font by
+                glyph id, see GlyphNameTable.fromGlyphOrder()
+
+        Returns:
+            GlyphRun:
+
+        Raises:
+            ValueError: if data is not in that format
+        """
+        data = data.strip()
+        count = data.count("|") + 1 if len(data) > 2 else 0
+        with_offsets = data.count("@")
+        with_y_advance = data.count(",") - with_offsets
+
+        def zeros():
+            return array.array("i", bytes(4 * count))
+
+        if with_offsets in (0, count) and with_y_advance in (0, count):
+            # the same fields for all glyphs: slice one flat list of numbers
+            size = 3 + (2 if with_offsets else 0) + (1 if with_y_advance else 0)
+            values = array.array("i", json.loads(data.translate(_TEXT_NUMBERS)))
+            if len(values) != size * count:
+                raise ValueError("Not `hb-shape` text output with glyph ids")
+            x_advance = size - 2 if with_y_advance else size - 1
+            return cls.fromArrays(
+                _unsigned(values[0::size]),
+                _unsigned(values[1::size]),
+                values[x_advance::size],
+                values[size - 1 :: size] if with_y_advance else zeros(),
+                values[2::size] if with_offsets else zeros(),
+                values[3::size] if with_offsets else zeros(),
+                names,
+            )
+        # some glyphs have offsets or a y advance: read the other fields
+        # without them, then set them by glyph index
+        extras = _TEXT_EXTRAS if with_y_advance else _TEXT_OFFSETS
+        values = array.array(
+            "i", json.loads(extras.sub("", data).translate(_TEXT_NUMBERS))
+        )
+        if len(values) != 3 * count:
+            raise ValueError("Not `hb-shape` text output with glyph ids")
+        x_offsets, y_offsets, y_advances = zeros(), zeros(), zeros()
+        separators = data.translate(_TEXT_SEPARATORS).split("|")
+        if with_offsets:
+            indexes = [i for i, glyph in enumerate(separators) if "@" in glyph]
+            for i, (x, y) in zip(indexes, _TEXT_OFFSETS.findall(data)):
+                x_offsets[i] = int(x)
+                y_offsets[i] = int(y)
+        if with_y_advance:
+            indexes = [i for i, glyph in enumerate(separators) if glyph[-1:] == ","]
+            for i, y in zip(indexes, _TEXT_Y_ADVANCES.findall(data)):
+                y_advances[i] = int(y)
+        return cls.fromArrays(
+            _unsigned(values[0::3]),
+            _unsigned(values[1::3]),
+            values[2::3],
+            y_advances,
+            x_offsets,
+            y_offsets,
+            names,
+        )
+
+    @classmethod
+    def fromJson(cls, glyphs, names=None):
+        """Build a GlyphRun from glyph records in `hb-shape` JSON output format
+
+        Args:
+            glyphs (list[dict, ...]): e.g. the output of HarfBuzzRenderer.toJson()
+            names (GlyphNameTable, optional): table to intern the glyph names,
+                default: GLYPH_NAMES. Not used if the records have glyph ids.
+
+        Returns:
+            GlyphRun:
+        """
+        if glyphs and not isinstance(glyphs[0]["g"], int):
+            names = names if names is not None else GLYPH_NAMES
+            ids = [names.intern(glyph["g"]) for glyph in glyphs]
+        else:
+            names = None
+            ids = [glyph["g"] for glyph in glyphs]
+        return cls(
+            ids,
+            [glyph["cl"] for glyph in glyphs],
+            [glyph["ax"] for glyph in glyphs],
+            [glyph["ay"] for glyph in glyphs],
+            [glyph["dx"] for glyph in glyphs],
+            [glyph["dy"] for glyph in glyphs],
+            names,
+        )
+
+    def toJson(self):
+        """Returns:
+        list[dict, ...]: glyph records in `hb-shape` JSON output format
+        """
+        return [
+            {"g": g, "cl": cl, "dx": dx, "dy": dy, "ax": ax, "ay": ay}
+            for g, cl, dx, dy, ax, ay in zip(
+                self.glyphNames() if self.names is not None else self.glyphs,
+                self.clusters,
+                self.x_offsets,
+                self.y_offsets,
+                self.x_advances,
+                self.y_advances,
+            )
+        ]
+
+    def __len__(self):
+        return len(self.glyphs)
+
+    def __repr__(self):
+        return "<GlyphRun %s>" % (" ".join(str(g) for g in self.glyphNames()))
+
+    def __eq__(self, other):
+        if not isinstance(other, GlyphRun):
+            return NotImplemented
+        return not self.diff(other)
+
+    # the arrays are mutable, so runs compare by value but are unhashable;
+    # use tuple(run.glyphs) etc. as dict keys
+    __hash__ = None
+
+    def glyphNames(self):
+        """Returns:
+        list: glyph names, or glyph ids if self.names is None
+        """
+        if self.names is None:
+            return list(self.glyphs)
+        names = self.names.names
+        return [names[i] for i in self.glyphs]
+
+    def totalAdvance(self):
+        """Returns:
+        tuple: (x, y) sum of the glyph advances
+        """
+        return (sum(self.x_advances), sum(self.y_advances))
+
+    def clusterMap(self):
+        """Map each cluster to its glyphs
+
+        Returns:
+            dict: {cluster: (start, end)} where start and end are
+                glyph indices, for clusters with contiguous glyphs
+        """
+        clusters = {}
+        start = 0
+        for i in range(1, len(self.clusters) + 1):
+            if i == len(self.clusters) or self.clusters[i] != self.clusters[start]:
+                clusters[self.clusters[start]] = (start, i)
+                start = i
+        return clusters
+
+    def diff(self, other):
+        """Compare with another GlyphRun
+
+        Args:
+            other (GlyphRun):
+
+        Returns:
+            list: kinds of differences, empty if the runs are equal:
+                'glyphs' if the glyphs differ (substitution change),
+                'clusters' if the cluster values differ,
+                'positions' if the advances or offsets differ
+        """
+        kinds = []
+        if self.names is other.names:
+            if self.glyphs != other.glyphs:
+                kinds.append("glyphs")
+        elif self.glyphNames() != other.glyphNames():
+            kinds.append("glyphs")
+        if self.clusters != other.clusters:
+            kinds.append("clusters")
+        if (
+            self.x_advances != other.x_advances
+            or self.y_advances != other.y_advances
+            or self.x_offsets != other.x_offsets
+            or self.y_offsets != other.y_offsets
+        ):
+            kinds.append("positions")
+        return kinds
@@ -0,0 +1,211 @@
+"""hb_instrument.py
+
+hb_instrument.Instrumentation class
+
+timing spans, counters and hooks for the calls of
+hb_render.HarfBuzzRenderer, with a summary report per session
+
+"""
+
+import threading
+import time
+
+__version__ = "0.1"
+
+
+class _Span:
+    """Context manager that records the time spent in its block"""
+
+    __slots__ = ("instrument", "name", "start")
+
+    def __init__(self, instrument, name):
+        self.instrument = instrument
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instrument.record(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.instrument.count("errors." + self.name)
+        return False
+
+
+class Instrumentation:
+    """Timing spans and counters of HarfBuzzRenderer, collected when
+    assigned to HarfBuzzRenderer.instrument. With the default None, the
+    renderer only tests that attribute, so there is no other cost.
+
+    Spans, in seconds:
+        toJson, shapeMany: one per call, including the cache lookup, but
+            not the time the caller spends between the shapeMany() results
+        hb-shape, hb-view: one per tool run, from process spawn to exit
+        toGlyphRun: one per call that shapes through the backend
+        json.loads: parsing the `hb-shape` JSON output
+        decodeText: parsing the `hb-shape` text output, with glyph ids
+        getFont: getting the font from the uharfbuzz backend, loading it
+            if it is not open yet
+        uharfbuzz.shape: in-process shaping, including the buffer setup
+        renderSVG: in-process SVG rendering, without the shaping
+        file.write: writing an output file
+
+    Counters:
+        texts, glyphs: texts shaped and glyphs returned
+        errors: texts that returned None
+        errors.<span>: spans that ended with an exception, and tool runs
+            that returned an error
+        bytes.in: bytes of text sent to the tools
+        bytes.out: bytes of tool output and of files written
+
+    Each span and counter is also passed to the hooks, as
+    hook(kind, name, value), with kind 'span' and the value in seconds,
+    or kind 'count' and the increment. Hooks run in the calling thread.
+
+    Attributes:
+        spans (dict):
+            {name: [count, total seconds, min seconds, max seconds]}
+        counters (dict):
+            {name: value}
+        hooks (list):
+            callables, see addHook()
+        started (float):
+            time.time() at creation or at the last reset()
+
+    Example:
+        hb.instrument = Instrumentation()
+        hb.instrument.addHook(lambda kind, name, value: print(kind, name, value))
+        hb.toJson('Hello')
+        print(hb.instrument.report())
+    """
+
+    def __init__(self):
+        """Initialize the Instrumentation() object"""
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start a new session: clear the spans and counters, keep the hooks"""
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def addHook(self, hook):
+        """Args:
+        hook (callable): called as hook(kind, name, value) for each span
+            ('span', seconds) and counter ('count', increment)
+        """
+        self.hooks.append(hook)
+
+    def removeHook(self, hook):
+        """Args:
+        hook (callable): a hook added with addHook()
+        """
+        self.hooks.remove(hook)
+
+    def span(self, name):
+        """Returns:
+        context manager that records the time spent in its block as span name
+        """
+        return _Span(self, name)
+
+    def record(self, name, seconds):
+        """Record a span measured by the caller
+
+        Args:
+            name (str): span name
+            seconds (float): duration
+        """
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                if seconds < stats[2]:
+                    stats[2] = seconds
+                if seconds > stats[3]:
+                    stats[3] = seconds
+        for hook in self.hooks:
+            hook("span", name, seconds)
+
+    def count(self, name, value=1):
+        """Add to a counter
+
+        Args:
+            name (str): counter name
+            value (int, optional): increment
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for hook in self.hooks:
+            hook("count", name, value)
+
+    def countResult(self, glyphs):
+        """Count a shaping result of HarfBuzzRenderer.toJson()
+
+        Args:
+            glyphs (list or None): the glyph records, None for an error
+        """
+        self.count("texts")
+        if glyphs is None:
+            self.count("errors")
+        else:
+            self.count("glyphs", len(glyphs))
+
+    def summary(self):
+        """Returns:
+        dict: 'seconds' since the session started, 'spans' as
+            {name: {'count', 'total', 'mean', 'min', 'max'}} and 'counters'
+        """
+        with self._lock:
+            spans = {
+                name: {
+                    "count": count,
+                    "total": total,
+                    "mean": total / count,
+                    "min": low,
+                    "max": high,
+                }
+                for name, (count, total, low, high) in self.spans.items()
+            }
+            counters = dict(self.counters)
+        return {
+            "seconds": time.time() - self.started,
+            "spans": spans,
+            "counters": counters,
+        }
+
+    def report(self):
+        """Returns:
+        str: the summary() as text, spans sorted by total time
+        """
+        summary = self.summary()
+        lines = [
+            "session: %.3fs" % (summary["seconds"]),
+            "%-20s %8s %12s %12s %12s %12s"
+            % ("span", "count", "total s", "mean ms", "min ms", "max ms"),
+        ]
+        for name, stats in sorted(
+            summary["spans"].items(), key=lambda item: -item[1]["total"]
+        ):
+            lines.append(
+                "%-20s %8d %12.6f %12.3f %12.3f %12.3f"
+                % (
+                    name,
+                    stats["count"],
+                    stats["total"],
+                    stats["mean"] * 1000,
+                    stats["min"] * 1000,
+                    stats["max"] * 1000,
+                )
+            )
+        if summary["counters"]:
+            lines.append("%-20s %8s" % ("counter", "value"))
+            for name, value in sorted(summary["counters"].items()):
+                lines.append("%-20s %8d" % (name, value))
+        return "\n".join(lines)
@@ -0,0 +1,373 @@
+"""hb_pool.py
+
+hb_pool.ShapingPool class
+
+keeps a pool of long-lived worker processes that shape text with
+hb_render.HarfBuzzRenderer, so that a multi-core machine can shape
+many texts in parallel without paying for a process start per call
+
+"""
+
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+import warnings
+
+from feaLab.hb_render import HarfBuzzRenderer, UharfbuzzBackend
+
+__version__ = "0.1"
+
+
+def shapeChunk(renderer, texts, batch_size=1000):
+    """Shape a chunk of texts with renderer.shapeMany(). If that raises an
+    exception, the texts are shaped one by one, so that a text that cannot
+    be shaped fails alone and the rest of the chunk is kept.
+
+    Args:
+        renderer (HarfBuzzRenderer): provides the font and shaping settings
+        texts (list): the texts to shape
+        batch_size (int, optional): max. number of texts per batch
+
+    Returns:
+        tuple: (results as in renderer.shapeMany(), errors) where errors is
+            a list of (index of the text in texts, error message)
+    """
+    try:
+        return (list(renderer.shapeMany(texts, batch_size=batch_size)), [])
+    except Exception:
+        pass
+    results = []
+    errors = []
+    for i, text in enumerate(texts):
+        try:
+            results.append(next(iter(renderer.shapeMany([text]))))
+        except Exception as e:
+            results.append(None)
+            errors.append((i, "%s: %s" % (type(e).__name__, e)))
+    return (results, errors)
+
+
+def _worker(conn):
+    """Worker process loop: receives (job_id, settings, texts) jobs from
+    the pipe and sends back (job_id, results, seconds, errors), see
+    shapeChunk(). The renderer and its shaping backend stay alive between
+    jobs, so the fonts stay open.
+
+    Args:
+        conn (multiprocessing.connection.Connection): worker end of the pipe
+    """
+    renderer = HarfBuzzRenderer()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        job_id, settings, texts = job
+        renderer.setSettings(settings)
+        start = time.time()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            results, errors = shapeChunk(renderer, texts, len(texts))
+        conn.send((job_id, results, time.time() - start, errors))
+    conn.close()
+
+
+def _chunks(texts, size):
+    texts = iter(texts)
+    while True:
+        chunk = list(itertools.islice(texts, size))
+        if not chunk:
+            break
+        yield chunk
+
+
+class _Worker:
+    """A worker process and the pool end of its pipe."""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker, args=(child_conn,))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.job = None
+
+    def stop(self, timeout=1):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+class ShapingPool:
+    """Pool of worker processes that shape texts with HarfBuzzRenderer.
+
+    Jobs are chunks of texts, sent through a pipe to the next idle worker.
+    A worker that crashes is restarted, and its chunk is sent again. A
+    chunk that keeps crashing workers is split into single texts, so that
+    only the texts that crash a worker get None as their result.
+    With the 'uharfbuzz' backend and the 'fork' start method, the font of
+    the renderer is loaded before the workers start, so they share it.
+
+    Attributes:
+        renderer (HarfBuzzRenderer):
+            provides the default shaping settings
+        workers (int):
+            number of worker processes, default: os.cpu_count()
+        chunk_size (int):
+            number of texts per job, default: 100
+        max_retries (int):
+            how often a chunk, and then each of its texts, is retried
+            after a worker crash, default: 2
+
+    Example:
+        hb = HarfBuzzRenderer('font.otf')
+        with ShapingPool(hb, workers=4) as pool:
+            for glyphs in pool.shapeMany(texts):
+                print(glyphs)
+    """
+
+    def __init__(self, renderer=None, workers=None, chunk_size=100, max_retries=2):
+        """Initialize the ShapingPool() object
+
+        Args:
+            renderer (HarfBuzzRenderer, optional): default shaping settings
+            workers (int, optional): number of worker processes
+            chunk_size (int, optional): number of texts per job
+            max_retries (int, optional): retries of a chunk after a crash
+        """
+        self.renderer = renderer if renderer else HarfBuzzRenderer()
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.restarts = 0
+        self._context = multiprocessing.get_context()
+        self._workers = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """Start the worker processes, if not running yet."""
+        if len(self._workers) < self.workers:
+            self._preload()
+        while len(self._workers) < self.workers:
+            self._workers.append(_Worker(self._context))
+
+    def _preload(self):
+        """Load the font of the renderer into the font store before forking
+        the workers, so that they share its faces instead of each loading
+        them again"""
+        if self._context.get_start_method() != "fork":
+            return
+        renderer = self.renderer
+        if not renderer.font_file:
+            return
+        backend = renderer._getBackend()
+        if not isinstance(backend, UharfbuzzBackend):
+            return
+        try:
+            backend.store.preload(renderer.font_file, [renderer.face_index])
+        except (OSError, RuntimeError, ValueError) as e:
+            warnings.warn("Cannot preload %s: %s" % (renderer.font_file, e))
+
+    def close(self):
+        """Stop the worker processes."""
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    def _restart(self, worker):
+        worker.stop(timeout=0)
+        new_worker = _Worker(self._context)
+        self._workers[self._workers.index(worker)] = new_worker
+        self.restarts += 1
+        return new_worker
+
+    @staticmethod
+    def _done(pending, chunk_id):
+        pending[chunk_id] -= 1
+        if not pending[chunk_id]:
+            del pending[chunk_id]
+
+    def _run(self, texts, settings, window=None):
+        """Shape the texts in chunks across the workers
+
+        Args:
+            window (int, optional): max. number of chunks between the oldest
+                unfinished chunk and the newest one, which bounds the results
+                that an ordered consumer has to hold back
+
+        Yields:
+            tuple: (start index, results, seconds) per chunk, or per text of
+                a chunk that kept crashing workers, in order of completion
+        """
+        self.start()
+        chunks = enumerate(_chunks(texts, self.chunk_size))
+        start = 0
+        taken = 0
+        # number of unfinished jobs per chunk id
+        pending = {}
+        queue = []
+        retries = {}
+        exhausted = False
+        try:
+            while True:
+                for worker in self._workers:
+                    if worker.job is not None:
+                        continue
+                    if not queue and not exhausted:
+                        if window and pending and taken - min(pending) >= window:
+                            break
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                        else:
+                            queue.append((chunk[0], start, chunk[1]))
+                            start += len(chunk[1])
+                            taken += 1
+                            pending[chunk[0]] = 1
+                    if not queue:
+                        break
+                    job = queue.pop(0)
+                    try:
+                        worker.conn.send((job[0], settings, job[2]))
+                    except OSError:
+                        worker = self._restart(worker)
+                        worker.conn.send((job[0], settings, job[2]))
+                    worker.job = job
+                busy = {w.conn: w for w in self._workers if w.job is not None}
+                if not busy:
+                    break
+                for conn in multiprocessing.connection.wait(list(busy)):
+                    worker = busy[conn]
+                    job = worker.job
+                    try:
+                        job_id, results, seconds, errors = conn.recv()
+                    except (EOFError, OSError):
+                        self._restart(worker)
+                        key = (job[0], job[1])
+                        retries[key] = retries.get(key, 0) + 1
+                        if retries[key] <= self.max_retries:
+                            queue.append(job)
+                        elif len(job[2]) > 1:
+                            # find the texts that crash the worker
+                            pending[job[0]] += len(job[2]) - 1
+                            for i, text in enumerate(job[2]):
+                                queue.append((job[0], job[1] + i, [text]))
+                        else:
+                            warnings.warn(
+                                "Shaping text %d %r crashed a worker"
+                                % (job[1], job[2][0])
+                            )
+                            self._done(pending, job[0])
+                            yield (job[1], [None], 0.0)
+                        continue
+                    worker.job = None
+                    for i, error in errors:
+                        warnings.warn(
+                            "Cannot shape text %d %r: %s"
+                            % (job[1] + i, job[2][i], error)
+                        )
+                    self._done(pending, job[0])
+                    yield (job[1], results, seconds)
+        finally:
+            # an abandoned generator leaves results in the pipes
+            for worker in self._workers:
+                if worker.job is not None:
+                    try:
+                        worker.conn.recv()
+                    except (EOFError, OSError):
+                        self._restart(worker)
+                    worker.job = None
+
+    def shapeChunks(self, texts, renderer=None, ordered=True):
+        """Generator to shape many texts across the workers, chunk by chunk
+
+        Args:
+            texts (iterable): the texts to shape, consumed lazily
+            renderer (HarfBuzzRenderer, optional): shaping settings to use
+                instead of self.renderer
+            ordered (bool, optional): yield the chunks in the order of texts;
+                at most 2 * self.workers chunks are held back for this
+
+        Yields:
+            tuple: (index of the first text, results as in self.shapeMany(),
+                seconds the worker spent shaping the chunk)
+        """
+        settings = (renderer if renderer else self.renderer).getSettings()
+        if not ordered:
+            for chunk in self._run(texts, settings):
+                yield chunk
+            return
+        done = {}
+        index = 0
+        for start, results, seconds in self._run(
+            texts, settings, window=2 * self.workers
+        ):
+            done[start] = (results, seconds)
+            while index in done:
+                results, seconds = done.pop(index)
+                yield (index, results, seconds)
+                index += len(results)
+
+    def shapeMany(self, texts, renderer=None):
+        """Generator to shape many texts across the workers
+
+        Args:
+            texts (iterable): the texts to shape, consumed lazily
+            renderer (HarfBuzzRenderer, optional): shaping settings to use
+                instead of self.renderer
+
+        Yields:
+            None: if an error occurred for this text
+            list[dict, ...]: glyph records in `hb-shape` JSON output format,
+                in the order of texts
+        """
+        for start, results, seconds in self.shapeChunks(texts, renderer):
+            for result in results:
+                yield result
+
+    def shapeUnordered(self, texts, renderer=None):
+        """Generator to shape many texts across the workers, yielding the
+        results as soon as their chunk is done
+
+        Args:
+            texts (iterable): the texts to shape, consumed lazily
+            renderer (HarfBuzzRenderer, optional): shaping settings to use
+                instead of self.renderer
+
+        Yields:
+            tuple: (index of the text, result as in self.shapeMany())
+        """
+        for start, results, seconds in self.shapeChunks(
+            texts, renderer, ordered=False
+        ):
+            for i, result in enumerate(results):
+                yield (start + i, result)
+
+    def shape(self, text, renderer=None):
+        """Shape one text in a worker
+
+        Args:
+            text (unicode): the text to shape
+            renderer (HarfBuzzRenderer, optional): shaping settings to use
+
+        Returns:
+            None: if an error occurred
+            list[dict, ...]: glyph records in `hb-shape` JSON output format
+        """
+        return next(self.shapeMany([text], renderer=renderer))
@@ -0,0 +1,553 @@
+"""hb_profile.py
+
+hb_profile.LookupProfiler class
+
+attributes the shaping time of a corpus to the features and lookups of a
+font, using hb_render.HarfBuzzRenderer:
+* feature toggling: the corpus is shaped `num_iterations` times with all
+  features, and once more with each feature disabled through `features`,
+  with any shaping backend
+* lookup tracing: with the 'uharfbuzz' backend, the HarfBuzz buffer
+  messages ('start lookup', 'end lookup', 'skipped lookup') time each
+  lookup, and a second pass compares the buffer before and after each
+  lookup to count the lookups that changed glyphs or positions
+
+Usage:
+    hb_render profile-lookups font.otf corpus.txt [--top 20]
+        [--iterations 10] [--no-toggle] [--output profile.json]
+        [--features liga,-kern] [--script Deva] [--language hi]
+
+"""
+
+import argparse
+import json
+import re
+import time
+import warnings
+
+from feaLab.hb_render import HarfBuzzRenderer, UharfbuzzBackend
+
+__version__ = "0.1"
+
+LOOKUP_TYPES = {
+    "GSUB": {
+        1: "single",
+        2: "multiple",
+        3: "alternate",
+        4: "ligature",
+        5: "context",
+        6: "chaining context",
+        7: "extension",
+        8: "reverse chaining",
+    },
+    "GPOS": {
+        1: "single",
+        2: "pair",
+        3: "cursive",
+        4: "mark to base",
+        5: "mark to ligature",
+        6: "mark to mark",
+        7: "context",
+        8: "chaining context",
+        9: "extension",
+    },
+}
+"""Names of the OpenType lookup types per table"""
+
+FEALIB_DEBUG_KEY = "com.github.fonttools.feaLib"
+"""Key of the lookup names and FEA locations in the Debg table, written
+by fontTools.feaLib when building with debug=True"""
+
+_LOOKUP_RE = re.compile(r"(\d+) feature '(.{4})'")
+
+
+def lookupInfo(font_file, face_index=0):
+    """Read the type, flags, subtable count and, if the font has a feaLib
+    Debg table, the FEA name and location of each GSUB and GPOS lookup
+
+    Args:
+        font_file (str): path to the font file
+        face_index (int, optional): the face index in a TTC file
+
+    Returns:
+        dict: {(table tag, lookup index): {'type', 'flag', 'subtables',
+            'name', 'location'}}
+    """
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(font_file, fontNumber=face_index, lazy=True)
+    debug = {}
+    if "Debg" in font:
+        debug = font["Debg"].data.get(FEALIB_DEBUG_KEY, {})
+    info = {}
+    for tag in ("GSUB", "GPOS"):
+        if tag not in font or not font[tag].table.LookupList:
+            continue
+        for index, lookup in enumerate(font[tag].table.LookupList.Lookup):
+            lookupType = lookup.LookupType
+            extension = lookupType == (7 if tag == "GSUB" else 9)
+            if extension and lookup.SubTable:
+                lookupType = lookup.SubTable[0].ExtensionLookupType
+            name = location = None
+            entry = debug.get(tag, {}).get(str(index))
+            if entry:
+                location, name = entry[0], entry[1]
+            info[(tag, index)] = {
+                "type": LOOKUP_TYPES[tag].get(lookupType, str(lookupType))
+                + (" (extension)" if extension else ""),
+                "flag": lookup.LookupFlag,
+                "subtables": lookup.SubTableCount,
+                "name": name,
+                "location": location,
+            }
+    return info
+
+
+def featureTags(font_file, face_index=0):
+    """Returns:
+    list: the sorted feature tags of the GSUB and GPOS tables of the font
+    """
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(font_file, fontNumber=face_index, lazy=True)
+    tags = set()
+    for tag in ("GSUB", "GPOS"):
+        if tag in font and font[tag].table.FeatureList:
+            tags |= {r.FeatureTag for r in font[tag].table.FeatureList.FeatureRecord}
+    return sorted(tags)
+
+
+def _changedGlyphs(before, after):
+    """Number of glyphs that differ, or if the glyph count changed, the
+    number of glyphs between the common start and end of the runs"""
+    if len(before) == len(after):
+        return sum(1 for a, b in zip(before, after) if a != b)
+    size = min(len(before), len(after))
+    start = 0
+    while start < size and before[start] == after[start]:
+        start += 1
+    end = 0
+    while end < size - start and before[-1 - end] == after[-1 - end]:
+        end += 1
+    return max(len(before), len(after)) - start - end
+
+
+class LookupProfiler:
+    """Profiles the shaping of a corpus with the font and settings of a
+    HarfBuzzRenderer, per feature and per lookup
+
+    Feature times are the difference between shaping with all features and
+    with the feature disabled, so they include the effect of the feature on
+    the input of later lookups, and can be negative within the noise.
+
+    Lookup times are measured between the 'start lookup' and 'end lookup'
+    buffer messages, and include the nested lookups of contextual lookups.
+    The messages themselves cost time, so the shortest lookup run is taken
+    as the overhead and subtracted from each run in 'seconds'; 'raw_seconds'
+    is the time as measured.
+
+    Attributes:
+        renderer (HarfBuzzRenderer):
+            provides the font and the shaping settings
+        iterations (int):
+            how often each text is shaped per measurement
+        features (dict):
+            {tag: {'seconds', 'share'}} after profileFeatures()
+        lookups (dict):
+            {(table tag, lookup index): {'features', 'runs', 'skipped',
+            'applied', 'glyphs', 'raw_seconds', 'seconds', 'type', 'flag',
+            'subtables', 'name', 'location'}} after profileLookups(), where
+            'skipped' counts the runs HarfBuzz skipped because no glyph
+            matched the coverage, 'applied' the runs that changed the buffer
+            and 'glyphs' the glyphs they changed
+        texts (int):
+            number of texts profiled
+        shape_seconds (float):
+            time of shaping the corpus `iterations` times with all features
+            and without messages
+        overhead (float):
+            estimated cost of the messages per lookup run
+
+    Example:
+        hb = HarfBuzzRenderer('font.otf')
+        hb.script = 'Deva'
+        profiler = LookupProfiler(hb, iterations=10)
+        profiler.profile(texts)
+        print(profiler.report(top=20))
+    """
+
+    def __init__(self, renderer, iterations=10):
+        """Initialize the LookupProfiler() object
+
+        Args:
+            renderer (HarfBuzzRenderer): the font and shaping settings
+            iterations (int, optional): shaping runs per text and measurement
+        """
+        self.renderer = renderer
+        self.iterations = max(iterations, 1)
+        self.features = {}
+        self.lookups = {}
+        self.texts = 0
+        self.shape_seconds = 0.0
+        self.overhead = 0.0
+
+    def profile(self, texts, toggle=True, trace=True):
+        """Run profileFeatures() and profileLookups() on the texts
+
+        Args:
+            texts (iterable): the corpus
+            toggle (bool, optional): run profileFeatures()
+            trace (bool, optional): run profileLookups()
+
+        Returns:
+            LookupProfiler: self
+        """
+        texts = [text for text in texts if text]
+        tags = None
+        if trace and self.profileLookups(texts) is not None:
+            # features that are off by default have no time to attribute
+            tags = sorted(
+                {tag for stats in self.lookups.values() for tag in stats["features"]}
+            )
+        if toggle:
+            self.profileFeatures(texts, tags=tags)
+        return self
+
+    def _timeCorpus(self, texts, features):
+        hb = self.renderer
+        saved = (hb.features, hb.num_iterations, hb.cache, hb.instrument)
+        hb.features = features
+        hb.num_iterations = self.iterations
+        hb.cache = None
+        hb.instrument = None
+        try:
+            backend = hb._getBackend()
+            if isinstance(backend, UharfbuzzBackend):
+                # only the shaping, not the conversion of the results
+                font = backend.getFont(hb.font_file, hb.face_index, hb.font_size)
+                start = time.perf_counter()
+                for text in texts:
+                    backend._shape(hb, font, text)
+                return time.perf_counter() - start
+            start = time.perf_counter()
+            for glyphs in hb.shapeMany(texts):
+                pass
+            return time.perf_counter() - start
+        finally:
+            hb.features, hb.num_iterations, hb.cache, hb.instrument = saved
+
+    def profileFeatures(self, texts, tags=None, chunk_size=50):
+        """Time the corpus with each feature disabled, with `num_iterations`
+        set to self.iterations. Each chunk of texts is shaped with and
+        without the feature right after each other, so that changes of the
+        machine speed during the run affect both times alike.
+
+        Args:
+            texts (list): the corpus
+            tags (list, optional): the features to disable, default: all
+                features of the font
+            chunk_size (int, optional): texts per paired measurement
+
+        Returns:
+            dict: self.features
+        """
+        hb = self.renderer
+        self.texts = len(texts)
+        features = list(hb.features)
+        if tags is None:
+            tags = featureTags(hb.font_file, hb.face_index)
+        self._timeCorpus(texts[:chunk_size], features)
+        self.features = {}
+        for tag in tags:
+            toggledFeatures = features + ["-" + tag]
+            baseline = toggled = 0.0
+            for k, start in enumerate(range(0, len(texts), chunk_size)):
+                chunk = texts[start : start + chunk_size]
+                if k % 2:
+                    toggled += self._timeCorpus(chunk, toggledFeatures)
+                    baseline += self._timeCorpus(chunk, features)
+                else:
+                    baseline += self._timeCorpus(chunk, features)
+                    toggled += self._timeCorpus(chunk, toggledFeatures)
+            seconds = baseline - toggled
+            self.features[tag] = {
+                "seconds": seconds,
+                "share": seconds / baseline if baseline else 0.0,
+            }
+        return self.features
+
+    def _backend(self):
+        backend = self.renderer._getBackend()
+        if not isinstance(backend, UharfbuzzBackend):
+            warnings.warn(
+                "Lookup tracing needs the uharfbuzz backend, not %s" % (backend.name)
+            )
+            return None
+        if not hasattr(backend.hb.Buffer, "set_message_func"):
+            warnings.warn("uharfbuzz has no Buffer.set_message_func()")
+            return None
+        return backend
+
+    def profileLookups(self, texts):
+        """Time each lookup and count its runs, skips and changes over the
+        corpus, with the HarfBuzz buffer messages
+
+        Args:
+            texts (list): the corpus
+
+        Returns:
+            None: if the renderer does not use the uharfbuzz backend
+            dict: self.lookups
+        """
+        backend = self._backend()
+        if backend is None:
+            return None
+        hb = self.renderer
+        font = backend.getFont(hb.font_file, hb.face_index, hb.font_size)
+        features = backend._features(hb.features)
+        shapers = hb.use_shapers or None
+        self.texts = len(texts)
+
+        start = time.perf_counter()
+        for text in texts:
+            for i in range(self.iterations):
+                buf = backend._buffer(hb, text)
+                backend.hb.shape(font, buf, features, shapers)
+        self.shape_seconds = time.perf_counter() - start
+
+        runs = {}
+        for text in texts:
+            for i in range(self.iterations):
+                buf = backend._buffer(hb, text)
+                buf.set_message_func(self._timingHandler(runs))
+                backend.hb.shape(font, buf, features, shapers)
+        counts = {}
+        for text in texts:
+            buf = backend._buffer(hb, text)
+            buf.set_message_func(self._matchHandler(buf, counts))
+            backend.hb.shape(font, buf, features, shapers)
+
+        self.overhead = min((low for total, n, low in runs.values()), default=0.0)
+        info = lookupInfo(hb.font_file, hb.face_index)
+        self.lookups = {}
+        for (table, message), (total, n, low) in runs.items():
+            match = _LOOKUP_RE.match(message)
+            if match is None:
+                continue
+            key = (table, int(match.group(1)))
+            stats = self.lookups.get(key)
+            if stats is None:
+                stats = self.lookups[key] = {
+                    "features": [],
+                    "runs": 0,
+                    "skipped": 0,
+                    "applied": 0,
+                    "glyphs": 0,
+                    "raw_seconds": 0.0,
+                    "seconds": 0.0,
+                }
+                stats.update(info.get(key, {}))
+            stats["features"].append(match.group(2))
+            stats["runs"] += n
+            stats["raw_seconds"] += total
+            stats["seconds"] += max(total - n * self.overhead, 0.0)
+            skipped, applied, glyphs = counts.get((table, message), (0, 0, 0))
+            stats["skipped"] += skipped * self.iterations
+            stats["applied"] += applied * self.iterations
+            stats["glyphs"] += glyphs * self.iterations
+        return self.lookups
+
+    def _timingHandler(self, runs):
+        """Buffer message function that adds the time of each lookup run
+        to runs[(table, message)] = [total, count, shortest]"""
+        clock = time.perf_counter
+        state = [None, 0.0]
+
+        def handler(message):
+            now = clock()
+            if message.startswith("start lookup "):
+                state[1] = now
+            elif message.startswith("end lookup "):
+                seconds = now - state[1]
+                key = (state[0], message[11:])
+                stats = runs.get(key)
+                if stats is None:
+                    runs[key] = [seconds, 1, seconds]
+                else:
+                    stats[0] += seconds
+                    stats[1] += 1
+                    if seconds < stats[2]:
+                        stats[2] = seconds
+            elif message.startswith("start table "):
+                state[0] = message[12:16]
+            return True
+
+        return handler
+
+    def _matchHandler(self, buf, counts):
+        """Buffer message function that compares the glyphs (GSUB) or the
+        positions (GPOS) before and after each lookup, and adds to
+        counts[(table, message)] = [skipped, applied, glyphs changed]"""
+        state = [None, None]
+
+        def snapshot():
+            if state[0] == "GPOS":
+                return [
+                    (p.x_advance, p.y_advance, p.x_offset, p.y_offset)
+                    for p in buf.glyph_positions
+                ]
+            return [info.codepoint for info in buf.glyph_infos]
+
+        def handler(message):
+            if message.startswith("start lookup "):
+                state[1] = snapshot()
+            elif message.startswith("end lookup "):
+                changed = _changedGlyphs(state[1], snapshot())
+                stats = counts.setdefault((state[0], message[11:]), [0, 0, 0])
+                if changed:
+                    stats[1] += 1
+                    stats[2] += changed
+            elif message.startswith("skipped lookup "):
+                key = (state[0], message[15:].split(" because", 1)[0])
+                counts.setdefault(key, [0, 0, 0])[0] += 1
+            elif message.startswith("start table "):
+                state[0] = message[12:16]
+            return True
+
+        return handler
+
+    def topLookups(self, top=20):
+        """Returns:
+        list: ((table tag, lookup index), stats) of the `top` lookups with
+            the most time
+        """
+        return sorted(self.lookups.items(), key=lambda item: -item[1]["seconds"])[
+            :top
+        ]
+
+    def summary(self):
+        """Returns:
+        dict: the profile, JSON-serializable
+        """
+        return {
+            "font_file": self.renderer.font_file,
+            "face_index": self.renderer.face_index,
+            "texts": self.texts,
+            "iterations": self.iterations,
+            "shape_seconds": self.shape_seconds,
+            "overhead": self.overhead,
+            "features": self.features,
+            "lookups": [
+                dict(stats, table=table, index=index)
+                for (table, index), stats in self.topLookups(len(self.lookups))
+            ],
+        }
+
+    def report(self, top=20):
+        """Returns:
+        str: the feature times, and the `top` lookups by time as text
+        """
+        lines = [
+            "%d texts, %d iterations, shaping %.3fs"
+            % (self.texts, self.iterations, self.shape_seconds)
+        ]
+        if self.features:
+            lines.append("")
+            lines.append("%-8s %10s %8s" % ("feature", "seconds", "share"))
+            for tag, stats in sorted(
+                self.features.items(), key=lambda item: -item[1]["seconds"]
+            ):
+                lines.append(
+                    "%-8s %10.4f %7.1f%%"
+                    % (tag, stats["seconds"], stats["share"] * 100)
+                )
+        if self.lookups:
+            total = sum(stats["seconds"] for stats in self.lookups.values())
+            lines.append("")
+            lines.append(
+                "lookups: %.3fs after %.2fus overhead per run"
+                % (total, self.overhead * 1e6)
+            )
+            lines.append(
+                "%-4s %5s %-9s %-24s %9s %6s %8s %8s %8s %8s  %s"
+                % (
+                    "tbl",
+                    "index",
+                    "features",
+                    "type",
+                    "seconds",
+                    "share",
+                    "runs",
+                    "skipped",
+                    "applied",
+                    "glyphs",
+                    "name",
+                )
+            )
+            for (table, index), stats in self.topLookups(top):
+                name = stats.get("name") or ""
+                if stats.get("location"):
+                    name = "%s (%s)" % (name, stats["location"])
+                lines.append(
+                    "%-4s %5d %-9s %-24s %9.4f %5.1f%% %8d %8d %8d %8d  %s"
+                    % (
+                        table,
+                        index,
+                        ",".join(sorted(set(stats["features"]))),
+                        stats.get("type", ""),
+                        stats["seconds"],
+                        stats["seconds"] / total * 100 if total else 0.0,
+                        stats["runs"],
+                        stats["skipped"],
+                        stats["applied"],
+                        stats["glyphs"],
+                        name,
+                    )
+                )
+        return "\n".join(lines)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="hb_render profile-lookups",
+        description="Attribute the shaping time of a corpus to features and lookups",
+    )
+    parser.add_argument("font_file", help="font to profile")
+    parser.add_argument("input_file", help="UTF-8 text file, one text per line")
+    parser.add_argument("--face-index", type=int, default=0)
+    parser.add_argument("--top", type=int, default=20, help="lookups to report")
+    parser.add_argument(
+        "--iterations", type=int, default=10, help="shaping runs per text"
+    )
+    parser.add_argument(
+        "--no-toggle", action="store_true", help="do not time each feature"
+    )
+    parser.add_argument(
+        "--no-trace", action="store_true", help="do not time each lookup"
+    )
+    parser.add_argument("--output", default=None, help="JSON file of the profile")
+    parser.add_argument("--features", default="", help="e.g. liga,-kern")
+    parser.add_argument("--script", default="auto")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--direction", default="auto")
+    options = parser.parse_args(args)
+    hb = HarfBuzzRenderer()
+    hb.openFont(options.font_file, options.face_index)
+    if not hb.font_file:
+        return 1
+    hb.features = [f for f in options.features.split(",") if f]
+    hb.script = options.script
+    hb.language = options.language
+    hb.direction = options.direction
+    from feaLab.hb_corpus import readLines
+
+    texts = [text for offset, end, text in readLines(options.input_file)]
+    profiler = LookupProfiler(hb, iterations=options.iterations)
+    profiler.profile(
+        texts, toggle=not options.no_toggle, trace=not options.no_trace
+    )
+    print(profiler.report(top=options.top))
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(profiler.summary(), f, indent=2)
+    return 0
@@ -9,28 +9,653 @@ using the Python 'sh' module
 * https://amoffat.github.io/sh/
 * https://pypi.python.org/pypi/sh
 
+shaping can also run in-process through the 'uharfbuzz' bindings
+* https://github.com/harfbuzz/uharfbuzz
+* https://pypi.python.org/pypi/uharfbuzz
+
 """
 
+import array
+import itertools
 import json
 import os.path
+import re
+import shutil
 import sys
+import time
 import warnings
 
-try:
-    from sh import hb_shape
-except ImportError:
-    warnings.warn("Run: brew install harfbuzz")
-    warnings.warn("Run: pip install --user sh")
-try:
-    from sh import hb_view
+__version__ = "0.3"
+
+SHAPERS_CACHE_FILE = os.environ.get("FEALAB_SHAPERS_CACHE") or None
+"""Optional JSON file that persists the `hb-shape --list-shapers` output
+per `hb-shape` binary, e.g. '~/.cache/feaLab/shapers.json'. Taken from the
+FEALAB_SHAPERS_CACHE environment variable, default: None, the list is
+only cached in memory"""
+
+_tools = {}
+_tool_paths = {}
+_modules = {}
+_shapers = {}
+
+
+def hbToolPath(name):
+    """Find a HarfBuzz tool on the PATH, looked up once per process
+
+    Args:
+        name (str): 'hb-shape' or 'hb-view'
+
+    Returns:
+        None: if the tool is not installed
+        str: the real path of the tool
+    """
+    if name not in _tool_paths:
+        path = shutil.which(name)
+        _tool_paths[name] = os.path.realpath(path) if path else None
+    return _tool_paths[name]
+
+
+def getTool(name):
+    """Resolve a HarfBuzz tool as an `sh` command on first use
+
+    Args:
+        name (str): 'hb-shape' or 'hb-view'
 
-    HB_VIEW = True
+    Returns:
+        None: if `sh` or the tool is not installed
+        sh.Command: the tool
     """
+    if name not in _tools:
+        command = None
+        try:
+            import sh
+        except ImportError:
+            sh = None
+        if sh is not None and hbToolPath(name):
+            try:
+                command = sh.Command(name)
+            except sh.CommandNotFound:
+                command = None
+        if command is None and name == "hb-shape":
+            warnings.warn("Run: brew install harfbuzz")
+            warnings.warn("Run: pip install --user sh")
+        _tools[name] = command
+    return _tools[name]
+
+
+def _loadUharfbuzz():
+    """Import the `uharfbuzz` module on first use
+
+    Returns:
+        None: if `uharfbuzz` is not installed
+        module: uharfbuzz
     """
-except ImportError:
-    HB_VIEW = False
+    if "uharfbuzz" not in _modules:
+        try:
+            import uharfbuzz
+        except ImportError:
+            uharfbuzz = None
+        _modules["uharfbuzz"] = uharfbuzz
+    return _modules["uharfbuzz"]
+
+
+def __getattr__(name):
+    # HB_SHAPE, HB_VIEW and HB_PY are resolved lazily on first access
+    if name == "HB_SHAPE":
+        return getTool("hb-shape") is not None
+    if name == "HB_VIEW":
+        return getTool("hb-view") is not None
+    if name == "HB_PY":
+        return _loadUharfbuzz() is not None
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def _readShapersCache():
+    if not SHAPERS_CACHE_FILE:
+        return {}
+    cache_file = os.path.expanduser(SHAPERS_CACHE_FILE)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def listShapers():
+    """Get the shapers listed by `hb-shape --list-shapers`. The list is
+    cached in memory, and in SHAPERS_CACHE_FILE if set, per `hb-shape` binary,
+    identified by its real path, modification time and size, so it is
+    refreshed when HarfBuzz is upgraded.
+
+    Returns:
+        list: the shaper names, empty if `hb-shape` is not available
+    """
+    path = hbToolPath("hb-shape")
+    if not path or getTool("hb-shape") is None:
+        return []
+    stat = os.stat(path)
+    key = "%s|%d|%d" % (path, stat.st_mtime_ns, stat.st_size)
+    shapers = _shapers.get(key)
+    if shapers is None:
+        stored = _readShapersCache()
+        shapers = stored.get(key)
+        if shapers is None:
+            shapers = str(getTool("hb-shape")(list_shapers=True)).splitlines()
+            stored[key] = shapers
+            if SHAPERS_CACHE_FILE:
+                cache_file = os.path.expanduser(SHAPERS_CACHE_FILE)
+                try:
+                    folder = os.path.dirname(cache_file)
+                    if folder and not os.path.isdir(folder):
+                        os.makedirs(folder)
+                    with open(cache_file, "w", encoding="utf-8") as f:
+                        json.dump(stored, f, indent=2)
+                except OSError:
+                    pass
+        _shapers[key] = shapers
+    return list(shapers)
+
+
+HB_FEATURE_GLOBAL_END = 0xFFFFFFFF
+
+_FEATURE_RE = re.compile(
+    r"""^\s*(?P<sign>[+-])?\s*["']?(?P<tag>[A-Za-z0-9 ]{1,4})["']?\s*
+    (?:\[\s*(?P<start>\d*)\s*(?P<colon>:)?\s*(?P<end>\d*)\s*\])?
+    \s*(?:=?\s*(?P<value>\d+|on|off))?\s*$""",
+    re.VERBOSE,
+)
+
+
+def parseFeature(feature):
+    """Parse a feature setting in the `hb-shape --features` syntax
+
+    Args:
+        feature (str): e.g. 'kern', '-liga', 'aalt[3:5]=2', '"kern" off'
+
+    Returns:
+        tuple: (tag, value, start, end) where end is HB_FEATURE_GLOBAL_END
+            if the setting is not limited to a range
+    """
+    m = _FEATURE_RE.match(feature)
+    if not m:
+        raise ValueError("Invalid feature setting: %s" % (feature))
+    tag = m.group("tag").ljust(4)
+    value = 0 if m.group("sign") == "-" else 1
+    if m.group("value") is not None:
+        value = {"on": 1, "off": 0}.get(m.group("value"))
+        if value is None:
+            value = int(m.group("value"))
+    start = int(m.group("start")) if m.group("start") else 0
+    if m.group("end"):
+        end = int(m.group("end"))
+    elif m.group("start") and not m.group("colon"):
+        end = start + 1
+    else:
+        end = HB_FEATURE_GLOBAL_END
+    return (tag, value, start, end)
 
-__version__ = "0.3"
+
+class ShapingBackend:
+    """Base class for the shaping backends used by HarfBuzzRenderer.toJson()
+
+    A backend reads the shaping attributes from the HarfBuzzRenderer object
+    and returns the glyph records in the `hb-shape` JSON output format.
+    Subclasses are registered in SHAPING_BACKENDS by their `name`.
+    """
+
+    name = None
+
+    def isAvailable(self):
+        """Returns:
+        bool: True if the backend can be used in this environment
+        """
+        return False
+
+    def shape(self, renderer, text):
+        """Shape the text with the settings of the renderer
+
+        Args:
+            renderer (HarfBuzzRenderer): provides the shaping attributes
+            text (unicode): the text to shape
+
+        Returns:
+            None: if an error occurred
+            list[dict, ...]: glyph records in `hb-shape` JSON output format
+        """
+        raise NotImplementedError
+
+    def shapeMany(self, renderer, texts, batch_size=1000):
+        """Shape many texts with the settings of the renderer
+
+        Args:
+            renderer (HarfBuzzRenderer): provides the shaping attributes
+            texts (iterable): the texts to shape, consumed lazily
+            batch_size (int, optional): max. number of texts per batch
+
+        Yields:
+            None: if an error occurred for this text
+            list[dict, ...]: glyph records in `hb-shape` JSON output format
+        """
+        for text in texts:
+            yield self.shape(renderer, text)
+
+    def shapeRun(self, renderer, text):
+        """Shape the text with the settings of the renderer into a GlyphRun
+        of glyph ids. Backends override this with a faster path, this
+        builds it from the glyph records of shape().
+
+        Args:
+            renderer (HarfBuzzRenderer): provides the shaping attributes
+            text (unicode): the text to shape
+
+        Returns:
+            None: if an error occurred
+            hb_glyphrun.GlyphRun: with the glyph ids of the font, and
+                renderer.glyphNames() as names
+        """
+        return _glyphRun(renderer, self.shape(renderer, text))
+
+
+class HbShapeBackend(ShapingBackend):
+    """Shaping backend that runs the `hb-shape` tool via the `sh` module,
+    one process per call."""
+
+    name = "hb-shape"
+
+    def isAvailable(self):
+        return getTool("hb-shape") is not None
+
+    def shape(self, renderer, text):
+        """With renderer.use_glyph_indexes, reads the compact text output
+        format, which is faster to parse than the JSON output format."""
+        if renderer.use_glyph_indexes:
+            run = self._shapeText(renderer, text)
+            return None if run is None else run.toJson()
+        hb_out = renderer._hb_shape(**renderer._hbShapeArgs(text))
+        if hb_out.stderr:
+            warnings.warn("`hb-shape` returned an error: %s" % (hb_out.stderr))
+            return None
+        return renderer._loadJson(hb_out.stdout.decode("utf-8"))
+
+    def shapeRun(self, renderer, text):
+        """Reads the compact text output format with glyph ids"""
+        run = self._shapeText(renderer, text)
+        if run is not None:
+            run.names = renderer.glyphNames()
+        return run
+
+    def _shapeText(self, renderer, text):
+        """Returns:
+        None: if an error occurred
+        hb_glyphrun.GlyphRun: glyph ids decoded from the text output format
+        """
+        if not text:
+            return renderer._decodeText("[]")
+        hb_out = renderer._hb_shape(**renderer._hbShapeArgs(text, "text"))
+        if hb_out.stderr:
+            warnings.warn("`hb-shape` returned an error: %s" % (hb_out.stderr))
+            return None
+        try:
+            return renderer._decodeText(hb_out.stdout.decode("utf-8"))
+        except ValueError as e:
+            warnings.warn("Cannot read the `hb-shape` output: %s" % (e))
+            return None
+
+    def shapeMany(self, renderer, texts, batch_size=1000):
+        """Sends each batch of texts as lines through one `hb-shape` run.
+        If the output of a run cannot be matched with its input lines,
+        the texts of that batch are shaped one by one."""
+        texts = iter(texts)
+        index = 0
+        while True:
+            batch = list(itertools.islice(texts, batch_size))
+            if not batch:
+                break
+            # an empty line has no glyphs, and no output line to match
+            lines = [text for text in batch if text and "\n" not in text]
+            results = []
+            if lines:
+                results = self._shapeLines(renderer, lines)
+            results = iter(results)
+            for text in batch:
+                if not text:
+                    yield []
+                elif "\n" in text:
+                    warnings.warn("Text %d contains a line break" % (index))
+                    yield None
+                else:
+                    yield next(results)
+                index += 1
+
+    def _shapeLines(self, renderer, lines):
+        output_format = "text" if renderer.use_glyph_indexes else "json"
+        hb_out = renderer._hb_shape(
+            **renderer._hbShapeArgs("\n".join(lines), output_format)
+        )
+        output = hb_out.stdout.decode("utf-8").splitlines()
+        if hb_out.stderr or len(output) != len(lines):
+            return [self.shape(renderer, line) for line in lines]
+        if output_format == "text":
+            try:
+                return [renderer._decodeText(line).toJson() for line in output]
+            except ValueError:
+                return [self.shape(renderer, line) for line in lines]
+        # one JSON array per line
+        return renderer._loadJson("[%s]" % (",".join(output)))
+
+
+class UharfbuzzBackend(ShapingBackend):
+    """Shaping backend that shapes in-process with the `uharfbuzz` bindings.
+
+    The fonts come from the process-wide hb_fontstore.FontStore, so they
+    stay open between calls and are shared by all renderers, and are
+    reloaded if the file on disk changes.
+    """
+
+    name = "uharfbuzz"
+
+    def __init__(self):
+        self.hb = _loadUharfbuzz()
+        self.store = None
+        if self.hb is not None:
+            from feaLab.hb_fontstore import getFontStore
+
+            self.store = getFontStore()
+
+    def isAvailable(self):
+        return self.hb is not None
+
+    def getFont(self, font_file, face_index=0, font_size=0):
+        """Return a cached `uharfbuzz.Font` for the font file
+
+        Args:
+            font_file (str): path to the font file
+            face_index (int, optional): the face index in a TTC file
+            font_size (int, optional): the font size, 0 means 'upem'
+
+        Returns:
+            uharfbuzz.Font:
+        """
+        return self.store.getFont(font_file, face_index, font_size)
+
+    def _features(self, features):
+        hb_features = {}
+        for feature in features:
+            tag, value, start, end = parseFeature(feature)
+            hb_features.setdefault(tag, []).append((start, end, value))
+        return hb_features
+
+    def _buffer(self, renderer, text):
+        buf = self.hb.Buffer()
+        if renderer.utf8_clusters:
+            add = buf.add_utf8
+            before = renderer.text_before.encode("utf-8")
+            data = text.encode("utf-8")
+            after = renderer.text_after.encode("utf-8")
+        else:
+            add = buf.add_codepoints
+            before = [ord(c) for c in renderer.text_before]
+            data = [ord(c) for c in text]
+            after = [ord(c) for c in renderer.text_after]
+        # same as `hb-shape`: context and text are added separately
+        # so that cluster values start at 0
+        if before:
+            add(before, len(before), 0)
+        add(data, 0, len(data))
+        if after:
+            add(after, 0, 0)
+        if renderer.direction != "auto":
+            buf.direction = renderer.direction
+        if renderer.script != "auto":
+            buf.script = renderer.script
+        if renderer.language:
+            buf.language = renderer.language
+        buf.guess_segment_properties()
+        buf.cluster_level = renderer.cluster_level
+        flags = 0
+        if renderer.bot:
+            flags |= self.hb.BufferFlags.BOT
+        if renderer.eot:
+            flags |= self.hb.BufferFlags.EOT
+        if renderer.preserve_default_ignorables:
+            flags |= self.hb.BufferFlags.PRESERVE_DEFAULT_IGNORABLES
+        buf.flags = flags
+        return buf
+
+    def _shape(self, renderer, font, text):
+        features = self._features(renderer.features)
+        for i in range(max(renderer.num_iterations, 1)):
+            buf = self._buffer(renderer, text)
+            self.hb.shape(font, buf, features, renderer.use_shapers or None)
+        return buf
+
+    def _shapeBuffer(self, renderer, text):
+        """Returns:
+        None: if an error occurred
+        tuple: (uharfbuzz.Font, uharfbuzz.Buffer) the font and shaped buffer
+        """
+        instrument = renderer.instrument
+        try:
+            if instrument is None:
+                font = self.getFont(
+                    renderer.font_file, renderer.face_index, renderer.font_size
+                )
+                buf = self._shape(renderer, font, text)
+            else:
+                with instrument.span("getFont"):
+                    font = self.getFont(
+                        renderer.font_file, renderer.face_index, renderer.font_size
+                    )
+                with instrument.span("uharfbuzz.shape"):
+                    buf = self._shape(renderer, font, text)
+        except (OSError, RuntimeError, ValueError) as e:
+            warnings.warn("`uharfbuzz` returned an error: %s" % (e))
+            return None
+        return font, buf
+
+    def shapeRun(self, renderer, text):
+        """Copies the glyph ids and positions of the buffer straight into
+        the arrays of the GlyphRun"""
+        if renderer.normalize_glyphs:
+            return ShapingBackend.shapeRun(self, renderer, text)
+        shaped = self._shapeBuffer(renderer, text)
+        if shaped is None:
+            return None
+        from feaLab.hb_glyphrun import GlyphRun
+
+        buf = shaped[1]
+        infos = buf.glyph_infos
+        # GlyphPosition.position is (x_offset, y_offset, x_advance, y_advance),
+        # uharfbuzz returns None as the positions of an empty buffer
+        positions = array.array(
+            "i",
+            itertools.chain.from_iterable(
+                [pos.position for pos in buf.glyph_positions or []]
+            ),
+        )
+        return GlyphRun.fromArrays(
+            array.array("I", [info.codepoint for info in infos]),
+            array.array("I", [info.cluster for info in infos]),
+            positions[2::4],
+            positions[3::4],
+            positions[0::4],
+            positions[1::4],
+            self.store.getGlyphNames(renderer.font_file, renderer.face_index),
+        )
+
+    def shape(self, renderer, text):
+        shaped = self._shapeBuffer(renderer, text)
+        if shaped is None:
+            return None
+        font, buf = shaped
+        glyphs = []
+        # uharfbuzz returns None as the positions of an empty buffer
+        for info, pos in zip(buf.glyph_infos, buf.glyph_positions or []):
+            glyphs.append(
+                {
+                    "g": info.codepoint
+                    if renderer.use_glyph_indexes
+                    else font.glyph_to_string(info.codepoint),
+                    "cl": info.cluster,
+                    "dx": pos.x_offset,
+                    "dy": pos.y_offset,
+                    "ax": pos.x_advance,
+                    "ay": pos.y_advance,
+                    "_gid": info.codepoint,
+                }
+            )
+        if renderer.normalize_glyphs:
+            _normalizeGlyphs(glyphs, buf.direction in ("rtl", "btt"))
+        for glyph in glyphs:
+            del glyph["_gid"]
+        return glyphs
+
+
+def _glyphRun(renderer, glyphs):
+    """Args:
+        renderer (HarfBuzzRenderer): provides the font
+        glyphs (list[dict, ...] or None): glyph records with glyph names or ids
+
+    Returns:
+        None: if glyphs is None
+        hb_glyphrun.GlyphRun: with the glyph ids of the font, and
+            renderer.glyphNames() as names
+    """
+    if glyphs is None:
+        return None
+    from feaLab.hb_glyphrun import GlyphRun
+
+    names = renderer.glyphNames()
+    run = GlyphRun.fromJson(glyphs, names=names)
+    run.names = names
+    return run
+
+
+def _normalizeGlyphs(glyphs, backward=False):
+    """Port of hb_buffer_normalize_glyphs(): rearrange the glyphs of each
+    cluster in nominal order, with the cluster advance on one glyph.
+
+    Args:
+        glyphs (list[dict, ...]): glyph records, also holding '_gid'
+        backward (bool): True for 'rtl' and 'btt' runs
+    """
+    start = 0
+    while start < len(glyphs):
+        end = start + 1
+        while end < len(glyphs) and glyphs[end]["cl"] == glyphs[start]["cl"]:
+            end += 1
+        cluster = glyphs[start:end]
+        total_x = sum(g["ax"] for g in cluster)
+        total_y = sum(g["ay"] for g in cluster)
+        x = y = 0
+        for g in cluster:
+            g["dx"] += x
+            g["dy"] += y
+            x += g["ax"]
+            y += g["ay"]
+            g["ax"] = g["ay"] = 0
+        if backward:
+            cluster[-1]["ax"] = total_x
+            cluster[-1]["ay"] = total_y
+            cluster[:-1] = sorted(cluster[:-1], key=lambda g: g["_gid"])
+        else:
+            cluster[0]["ax"] += total_x
+            cluster[0]["ay"] += total_y
+            for g in cluster[1:]:
+                g["dx"] -= total_x
+                g["dy"] -= total_y
+            cluster[1:] = sorted(cluster[1:], key=lambda g: g["_gid"])
+        glyphs[start:end] = cluster
+        start = end
+
+
+SHAPING_BACKENDS = {
+    HbShapeBackend.name: HbShapeBackend,
+    UharfbuzzBackend.name: UharfbuzzBackend,
+}
+"""Shaping backend classes by name, register custom backends here"""
+
+SHAPING_ATTRIBUTES = (
+    "font_file",
+    "face_index",
+    "font_size",
+    "direction",
+    "language",
+    "script",
+    "features",
+    "bot",
+    "eot",
+    "text_before",
+    "text_after",
+    "preserve_default_ignorables",
+    "utf8_clusters",
+    "cluster_level",
+    "normalize_glyphs",
+    "num_iterations",
+    "use_glyph_indexes",
+    "use_shapers",
+)
+"""HarfBuzzRenderer attributes that affect the result of hb.toJson()"""
+
+_backends = {}
+_glyph_names = {}
+
+
+def getGlyphNames(font_file, face_index=0):
+    """Return the glyph names of a font by glyph id, built once per font
+    file and rebuilt if the file changes. The names are those of HarfBuzz,
+    as in the output of hb.toJson(), if uharfbuzz is installed, otherwise
+    the glyph order of fontTools.
+
+    Args:
+        font_file (str): path to the font file
+        face_index (int, optional): the face index in a TTC file
+
+    Returns:
+        hb_glyphrun.GlyphNameTable:
+    """
+    if _loadUharfbuzz() is not None:
+        from feaLab.hb_fontstore import getFontStore
+
+        return getFontStore().getGlyphNames(font_file, face_index)
+    from fontTools.ttLib import TTFont
+
+    from feaLab.hb_glyphrun import GlyphNameTable
+
+    stat = os.stat(font_file)
+    key = (font_file, face_index)
+    stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _glyph_names.get(key)
+    if cached is None or cached[0] != stamp:
+        with TTFont(font_file, fontNumber=face_index, lazy=True) as font:
+            names = GlyphNameTable.fromGlyphOrder(font.getGlyphOrder())
+        cached = _glyph_names[key] = (stamp, names)
+    return cached[1]
+
+
+def getBackend(name="auto"):
+    """Return the shared instance of a shaping backend
+
+    Args:
+        name (str): a key of SHAPING_BACKENDS, or 'auto' to use 'uharfbuzz'
+            if it is installed and 'hb-shape' otherwise
+
+    Returns:
+        ShapingBackend:
+    """
+    if name == "auto":
+        name = (
+            UharfbuzzBackend.name
+            if _loadUharfbuzz() is not None
+            else HbShapeBackend.name
+        )
+    backend = _backends.get(name)
+    if backend is None:
+        backend = SHAPING_BACKENDS[name]()
+        _backends[name] = backend
+    return backend
 
 
 class HarfBuzzRenderer:
@@ -134,8 +759,20 @@ class HarfBuzzRenderer:
         num_iterations (int):
             Run shaper N times (default: 1)
         use_glyph_indexes (bool)
-            Output glyph indices instead of names, like --no_glyph_names in `hb-*`
+            Output glyph indices instead of names, like --no_glyph_names in `hb-*`,
+            the 'hb-shape' backend then reads the faster compact text format
             default: False
+        backend (str or ShapingBackend)
+            Shaping backend used by hb.toJson(), a key of SHAPING_BACKENDS:
+            'uharfbuzz' (in-process) | 'hb-shape' (one process per call),
+            or 'auto' to use 'uharfbuzz' if installed, or a ShapingBackend
+            default: 'auto'
+        cache (hb_cache.ShapingCache)
+            Cache of hb.toJson() and hb.shapeMany() results, or None
+            default: None
+        instrument (hb_instrument.Instrumentation)
+            Collects timing spans and counters of the calls, or None
+            default: None
 
         annotate (bool)
             Annotate output in hb.toImage()
@@ -192,6 +829,9 @@ class HarfBuzzRenderer:
         self.normalize_glyphs = False  #
         self.num_iterations = 1  #
         self.use_glyph_indexes = False  # Output glyph indices instead of names
+        self.backend = "auto"  # Shaping backend for toJson()
+        self.cache = None  # ShapingCache for toJson()
+        self.instrument = None  # Instrumentation for timing and counters
 
         self.annotate = False  # Annotate output toing
         self.background = (
@@ -216,7 +856,11 @@ class HarfBuzzRenderer:
         Returns:
             None:
         """
-        self.all_shapers = str(hb_shape(list_shapers=True)).splitlines()
+        all_shapers = listShapers()
+        if not all_shapers:
+            warnings.warn("`hb-shape` not available")
+            return
+        self.all_shapers = all_shapers
         if sys.platform.startswith("win32"):
             if (
                 "directwrite" in self.all_shapers
@@ -231,6 +875,29 @@ class HarfBuzzRenderer:
         if "ot" not in self.all_shapers:
             self.best_shaper = self.os_shaper
 
+    def getSettings(self):
+        """Get the shaping settings, e.g. to pass them to another process
+
+        Returns:
+            dict: the SHAPING_ATTRIBUTES and the backend name
+        """
+        settings = {name: getattr(self, name) for name in SHAPING_ATTRIBUTES}
+        settings["backend"] = (
+            self.backend.name
+            if isinstance(self.backend, ShapingBackend)
+            else self.backend
+        )
+        return settings
+
+    def setSettings(self, settings):
+        """Apply shaping settings obtained from hb.getSettings()
+
+        Args:
+            settings (dict):
+        """
+        for name, value in settings.items():
+            setattr(self, name, value)
+
     def openFont(self, font_file, face_index=0):
         """Convenience method to load a new font file
 
@@ -258,7 +925,9 @@ class HarfBuzzRenderer:
         Returns:
             sh.RunningCommand:
         """
-        return hb_shape(**kwargs)
+        if self.instrument is None:
+            return getTool("hb-shape")(**kwargs)
+        return self._runTool("hb-shape", kwargs)
 
     def _hb_view(self, **kwargs):
         """Low-level method to call the `hb-view` tool via the
@@ -272,10 +941,40 @@ class HarfBuzzRenderer:
         Returns:
             sh.RunningCommand:
         """
-        return hb_view(**kwargs)
+        if self.instrument is None:
+            return getTool("hb-view")(**kwargs)
+        return self._runTool("hb-view", kwargs)
+
+    def _runTool(self, name, kwargs):
+        """Run a HarfBuzz tool with self.instrument: a span for the run and
+        the bytes sent and received"""
+        instrument = self.instrument
+        instrument.count("bytes.in", len(kwargs.get("_in") or b""))
+        with instrument.span(name):
+            hb_out = getTool(name)(**kwargs)
+        instrument.count("bytes.out", len(hb_out.stdout or b""))
+        if hb_out.stderr:
+            instrument.count("errors." + name)
+        return hb_out
+
+    def _loadJson(self, data):
+        """json.loads(), timed with self.instrument"""
+        if self.instrument is None:
+            return json.loads(data)
+        with self.instrument.span("json.loads"):
+            return json.loads(data)
+
+    def _decodeText(self, data, names=None):
+        """GlyphRun.fromText(), timed with self.instrument"""
+        from feaLab.hb_glyphrun import GlyphRun
+
+        if self.instrument is None:
+            return GlyphRun.fromText(data, names)
+        with self.instrument.span("decodeText"):
+            return GlyphRun.fromText(data, names)
 
     def toJson(self, text=None):
-        """Method to call hb_shape and get back the shaped JSON
+        """Method to shape the text with self.backend and get back the shaped JSON
 
         Args:
             text (unicode, optional): optional text, otherwise uses self.text
@@ -298,10 +997,163 @@ class HarfBuzzRenderer:
         """
         text = text if text else self.text
         self.text = text
-        hb_in = text.encode("utf-8")
-        hb_out = self._hb_shape(
+        instrument = self.instrument
+        if instrument is not None:
+            with instrument.span("toJson"):
+                glyphs = self._toJson(text)
+            instrument.countResult(glyphs)
+            return glyphs
+        return self._toJson(text)
+
+    def _toJson(self, text):
+        if self.cache is None:
+            return self._getBackend().shape(self, text)
+        key = self.cache.key(self, text)
+        glyphs = self.cache.get(key)
+        if glyphs is None:
+            glyphs = self._getBackend().shape(self, text)
+            if glyphs is not None:
+                self.cache.set(key, glyphs)
+        return glyphs
+
+    def toGlyphRun(self, text=None, names=None):
+        """Method to shape the text and get back a compact GlyphRun
+
+        Without names, the backend writes the glyph ids straight into the
+        arrays of the run, from the compact `hb-shape` text output format or
+        from the uharfbuzz buffer, without building per-glyph records. The
+        run refers to the glyph names of the font, hb.glyphNames(), which
+        are only looked up by run.glyphNames() or run.toJson(). With names,
+        or with self.cache, the run is built from hb.toJson().
+
+        Args:
+            text (unicode, optional): optional text, otherwise uses self.text
+            names (hb_glyphrun.GlyphNameTable, optional): table to intern
+                the glyph names, e.g. hb_glyphrun.GLYPH_NAMES to compare runs
+                of different fonts by glyph name index
+
+        Returns:
+            None: if an error occurred
+            hb_glyphrun.GlyphRun: the shaped glyph run
+        """
+        text = text if text else self.text
+        self.text = text
+        if names is not None:
+            from feaLab.hb_glyphrun import GlyphRun
+
+            glyphs = self.toJson(text=text)
+            if glyphs is None:
+                return None
+            return GlyphRun.fromJson(glyphs, names=names)
+        if self.cache is not None:
+            return _glyphRun(self, self.toJson(text=text))
+        instrument = self.instrument
+        if instrument is None:
+            return self._getBackend().shapeRun(self, text)
+        with instrument.span("toGlyphRun"):
+            run = self._getBackend().shapeRun(self, text)
+        instrument.countResult(run)
+        return run
+
+    def glyphNames(self):
+        """Returns:
+        hb_glyphrun.GlyphNameTable: the glyph names of the font by glyph id,
+            see getGlyphNames()
+        """
+        return getGlyphNames(self.font_file, self.face_index)
+
+    def shapeMany(self, texts, batch_size=1000):
+        """Generator to shape many texts with the current settings. With the
+        'hb-shape' backend, each batch of texts is sent as separate lines
+        through one `hb-shape` run.
+
+        Args:
+            texts (iterable): the texts to shape, consumed lazily
+            batch_size (int, optional): max. number of texts per `hb-shape` run
+
+        Yields:
+            None: if an error occurred for this text, or with the 'hb-shape'
+                backend, if it contains a line break
+            list[dict, ...]: parsed JSON structure in `hb-shape` output format,
+                in the order of texts
+
+        Example:
+            for glyphs in hb.shapeMany(['Hello', 'World']):
+                print(glyphs)
+        """
+        if self.cache is None:
+            results = self._getBackend().shapeMany(self, texts, batch_size=batch_size)
+        else:
+            results = self._shapeManyCached(texts, batch_size)
+        if self.instrument is None:
+            return results
+        return self._shapeManyInstrumented(results)
+
+    def _shapeManyInstrumented(self, results):
+        """Yield the results, with the time spent producing them as one
+        shapeMany span, recorded when the results are exhausted or closed"""
+        instrument = self.instrument
+        seconds = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    glyphs = next(results)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                instrument.countResult(glyphs)
+                yield glyphs
+        finally:
+            instrument.record("shapeMany", seconds)
+
+    def _shapeManyCached(self, texts, batch_size):
+        texts = iter(texts)
+        while True:
+            batch = list(itertools.islice(texts, batch_size))
+            if not batch:
+                break
+            keys = [self.cache.key(self, text) for text in batch]
+            results = [self.cache.get(key) for key in keys]
+            misses = [i for i, glyphs in enumerate(results) if glyphs is None]
+            shaped = self._getBackend().shapeMany(
+                self, [batch[i] for i in misses], batch_size=batch_size
+            )
+            for i, glyphs in zip(misses, shaped):
+                if glyphs is not None:
+                    self.cache.set(keys[i], glyphs)
+                results[i] = glyphs
+            for glyphs in results:
+                yield glyphs
+
+    def _getBackend(self):
+        """Returns:
+        ShapingBackend: the backend set in self.backend, falling back
+            to 'hb-shape' if the backend is not available
+        """
+        if isinstance(self.backend, ShapingBackend):
+            return self.backend
+        backend = getBackend(self.backend)
+        if not backend.isAvailable():
+            warnings.warn("Shaping backend %s not available" % (backend.name))
+            backend = getBackend(HbShapeBackend.name)
+        return backend
+
+    def _hbShapeArgs(self, text, output_format="json"):
+        """Build the arguments for self._hb_shape()
+
+        Args:
+            text (unicode): the text to shape
+            output_format (str, optional): 'json', or 'text' for the compact
+                text output format with glyph ids
+
+        Returns:
+            dict: `hb-shape` arguments for the current settings
+        """
+        return dict(
             _encoding="UTF-8",
-            _in=hb_in,
+            _in=text.encode("utf-8"),
             bot=self.bot,
             cluster_level=self.cluster_level,
             direction=self.direction,
@@ -311,10 +1163,10 @@ class HarfBuzzRenderer:
             font_file=self.font_file,
             font_size="upem" if self.font_size == 0 else self.font_size,
             language=self.language,
-            no_glyph_names=self.use_glyph_indexes,
+            no_glyph_names=self.use_glyph_indexes or output_format == "text",
             normalize_glyphs=self.normalize_glyphs,
             num_iterations=self.num_iterations,
-            output_format="json",
+            output_format=output_format,
             preserve_default_ignorables=self.preserve_default_ignorables,
             script=self.script,
             shapers=",".join(self.use_shapers),
@@ -325,10 +1177,6 @@ class HarfBuzzRenderer:
             text_before=self.text_before,
             utf8_clusters=self.utf8_clusters,
         )
-        if hb_out.stderr:
-            warnings.warn("`hb-view` returned an error: %s" % (hb_out.stderr))
-            return None
-        return json.loads(unicode(hb_out.stdout))
 
     def _toImage(
         self, text=None, output_format="svg", font_size=None, output_file=False
@@ -346,7 +1194,7 @@ class HarfBuzzRenderer:
              str: SVG (UTF-8), PNG or PDF buffer
              str: the output file path (UTF-8) if output_file was provided and the file was created
         """
-        if not HB_VIEW:
+        if getTool("hb-view") is None:
             warnings.warn("`hb-view` not available")
             return None
         else:
@@ -360,40 +1208,8 @@ class HarfBuzzRenderer:
                 font_size = self.font_size
             text = text if text else self.text
             self.text = text
-            hb_in = unicode(text).encode("utf-8")
             hb_out = self._hb_view(
-                _encoding="UTF-8",
-                _in=hb_in,
-                annotate=self.annotate,
-                background=self.background,
-                bot=self.bot,
-                cluster_level=self.cluster_level,
-                direction=self.direction,
-                eot=self.eot,
-                face_index=self.face_index,
-                features=",".join(self.features),
-                font_file=self.font_file,
-                font_size=font_size,
-                foreground=self.foreground,
-                language=self.language,
-                line_space=self.line_space,
-                margin=self.margin
-                if type(self.margin) == int
-                else " ".join(str(i) for i in self.margin),
-                no_glyph_names=self.use_glyph_indexes,
-                normalize_glyphs=self.normalize_glyphs,
-                num_iterations=self.num_iterations,
-                output_file=output_file if output_file else False,
-                output_format=output_format,
-                preserve_default_ignorables=self.preserve_default_ignorables,
-                script=self.script,
-                shapers=",".join(self.use_shapers),
-                show_extents=False,
-                show_text=False,
-                show_unicode=False,
-                text_after=self.text_after,
-                text_before=self.text_before,
-                utf8_clusters=self.utf8_clusters,
+                **self._hbViewArgs(text, output_format, font_size, output_file)
             )
             if hb_out.stderr:
                 warnings.warn("`hb-view` returned an error: %s" % (hb_out.stderr))
@@ -401,6 +1217,10 @@ class HarfBuzzRenderer:
             if output_file:
                 output_path = os.path.realpath(output_file)
                 if os.path.exists(output_path):
+                    if self.instrument is not None:
+                        self.instrument.count(
+                            "bytes.out", os.path.getsize(output_path)
+                        )
                     return output_path
                 else:
                     warnings.warn("`hb-view` did not create file: %s" % (output_path))
@@ -408,8 +1228,113 @@ class HarfBuzzRenderer:
             else:
                 return hb_out.stdout
 
-    def toSVG(self, text=None, font_size=None, output_file=""):
+    def _hbViewArgs(self, text, output_format, font_size, output_file):
+        """Build the arguments for self._hb_view()
+
+        Args:
+            text (unicode): the text to render
+            output_format (str): 'svg' | 'png' | 'pdf' | 'ansi' | 'ps' | 'eps'
+            font_size (int or str): the font size, or 'upem'
+            output_file (unicode): path to output_file, or False for stdout
+
+        Returns:
+            dict: `hb-view` arguments for the current settings
+        """
+        return dict(
+            _encoding="UTF-8",
+            _in=text.encode("utf-8"),
+            annotate=self.annotate,
+            background=self.background,
+            bot=self.bot,
+            cluster_level=self.cluster_level,
+            direction=self.direction,
+            eot=self.eot,
+            face_index=self.face_index,
+            features=",".join(self.features),
+            font_file=self.font_file,
+            font_size=font_size,
+            foreground=self.foreground,
+            language=self.language,
+            line_space=self.line_space,
+            margin=self.margin
+            if type(self.margin) == int
+            else " ".join(str(i) for i in self.margin),
+            no_glyph_names=self.use_glyph_indexes,
+            normalize_glyphs=self.normalize_glyphs,
+            num_iterations=self.num_iterations,
+            output_file=output_file if output_file else False,
+            output_format=output_format,
+            preserve_default_ignorables=self.preserve_default_ignorables,
+            script=self.script,
+            shapers=",".join(self.use_shapers),
+            show_extents=False,
+            show_text=False,
+            show_unicode=False,
+            text_after=self.text_after,
+            text_before=self.text_before,
+            utf8_clusters=self.utf8_clusters,
+        )
+
+    def renderSVG(self, text=None, font_size=None, output_file="", use_symbols=False):
+        """Method to render SVG in-process with hb_svg.SVGRenderer, without
+        `hb-view`: shapes each line of the text with self.backend and draws
+        the glyph outlines with fontTools pens
+
+        Args:
+            text (unicode, optional): optional text, otherwise uses self.text
+            font_size (int): the font size to use, 0 means 'upem', use self.font_size if omitted
+            output_file (unicode): path to output_file, or False if the SVG should be returned
+            use_symbols (bool): define each distinct glyph once in <defs> and
+                place it with <use>, for smaller files
+
+        Returns:
+             None: if an error occurs
+             str: SVG (UTF-8)
+             str: the output file path (UTF-8) if output_file was provided and the file was created
         """
+        from feaLab.hb_svg import SVGRenderer
+
+        if font_size is not None:
+            self.font_size = font_size
+        text = text if text else self.text
+        self.text = text
+        font_size = self.font_size
+        self.font_size = 0
+        try:
+            runs = list(self.shapeMany(text.splitlines() or [text]))
+        finally:
+            self.font_size = font_size
+        if None in runs:
+            return None
+        instrument = self.instrument
+        if instrument is not None:
+            start = time.perf_counter()
+        svg = SVGRenderer(
+            self.font_file,
+            face_index=self.face_index,
+            font_size=font_size,
+            margin=self.margin,
+            foreground=self.foreground,
+            background=self.background,
+            line_space=self.line_space,
+            use_symbols=use_symbols,
+        ).render(runs)
+        if instrument is not None:
+            instrument.record("renderSVG", time.perf_counter() - start)
+        if output_file:
+            output_path = os.path.realpath(output_file)
+            if instrument is not None:
+                start = time.perf_counter()
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(svg)
+            if instrument is not None:
+                instrument.record("file.write", time.perf_counter() - start)
+                instrument.count("bytes.out", len(svg.encode("utf-8")))
+            return output_path
+        return svg
+
+    def toSVG(self, text=None, font_size=None, output_file=""):
+        """Uses `hb-view`, or self.renderSVG() if `hb-view` is not available
 
         Args:
             text (str):
@@ -422,6 +1347,11 @@ class HarfBuzzRenderer:
                 * SVG (UTF-8) content
                 * the output file path (UTF-8) if output_file was provided and the file was created
         """
+        if getTool("hb-view") is None:
+            return (
+                self.renderSVG(text=text, font_size=font_size, output_file=output_file)
+                or ""
+            )
         data = self._toImage(
             text=text, font_size=font_size, output_file=output_file, output_format="svg"
         )
@@ -499,14 +1429,39 @@ def test():
 
 
 def main():
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from feaLab import hb_batch
+
+        sys.exit(hb_batch.main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from feaLab import hb_server
+
+        sys.exit(hb_server.main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "shape-corpus":
+        from feaLab import hb_corpus
+
+        sys.exit(hb_corpus.main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "diff-fonts":
+        from feaLab import hb_diff
+
+        sys.exit(hb_diff.main(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "profile-lookups":
+        from feaLab import hb_profile
+
+        sys.exit(hb_profile.main(sys.argv[2:]))
+    elif len(sys.argv) > 1:
         hb = HarfBuzzRenderer()
         hb.openFont(sys.argv[1])
-        hb.text = unicode(sys.argv[2] if len(sys.argv) > 2 else "O")
+        hb.text = sys.argv[2] if len(sys.argv) > 2 else "O"
         hb.font_size = int(sys.argv[3] if len(sys.argv) > 3 else "20")
         print(hb.toSVG())
     else:
         print("hb_render font_file [text] [font_size]")
+        print("hb_render batch jobs.json [--workers N] [--manifest file] [--force]")
+        print("hb_render serve [--host 127.0.0.1] [--port 8765] [--socket path]")
+        print("hb_render shape-corpus font.otf corpus.txt output.jsonl [--workers N] [--resume]")
+        print("hb_render diff-fonts a.otf b.otf corpus.txt [--output diffs.jsonl] [--svg-dir dir]")
+        print("hb_render profile-lookups font.otf corpus.txt [--top 20] [--iterations 10]")
 
 
 if __name__ == "__main__":
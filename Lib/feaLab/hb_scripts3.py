@@ -3,113 +3,322 @@
 Mini-module to convert between Unicode and OpenType
 script tags.
 
-Uses the 'harfpy' ctypes-based Python 3 bindings for HarfBuzz
-https://github.com/ldo/harfpy
+Pure Python, without HarfBuzz bindings:
 
-1. Until https://github.com/ldo/harfpy/pull/12 is merged, use:
-https://github.com/twardoch/harfpy
+1. The ISO 15924 <-> OpenType script tag conversions look up the static
+tables in hb_scripts_data.py, generated by makescriptdata.py from the
+rules of https://github.com/harfbuzz/harfbuzz/blob/master/src/hb-ot-tag.cc
 
-2. On macOS, works with HarfBuzz installed via
-brew install harfbuzz
-
-3. On Windows, should work with the prebuilt binaries from
-https://www.freedesktop.org/software/harfbuzz/release/
-
-4. The actual conversion functions are implemented in:
-https://github.com/harfbuzz/harfbuzz/blob/master/src/hb-ot-tag.cc
+2. The Unicode script of characters comes from a precomputed table
+built once from fontTools.unicodedata
 """
 
-__version__ = "0.0.1"
+__version__ = "0.0.3"
 
+import functools
+import hashlib
+import os
 import re
+import warnings
 
-import fontTools.unicodedata as ud
-import harfbuzz as hb
-from fontTools.misc.py23 import *
+from feaLab.hb_scripts_data import ISO_TO_OT, OT_TO_ISO
 
-hbu = hb.UnicodeFuncs.get_default()
 
-
-def _getTag(s):
-    s = s.ljust(4)[:4].encode()
-    return hb.HB.TAG(s)
+def _tag(s):
+    return s.ljust(4)[:4]
 
 
+@functools.lru_cache(maxsize=None)
 def isoScript(s):
-    tag = _getTag(s)
-    rtag = hb.script_to_iso15924_tag(hb.hb.hb_ot_tag_to_script(tag))
-    if rtag == 0:
+    """Args:
+        s (str): OpenType or ISO 15924 script tag, e.g. 'dev2' or 'Deva'
+
+    Returns:
+        str: ISO 15924 script tag, 'Zyyy' for 'DFLT'
+    """
+    tag = _tag(s)
+    if tag == "DFLT":
         return "Zyyy"
-    else:
-        return hb.tag_to_string(rtag)
+    iso = OT_TO_ISO.get(tag)
+    if iso is None:
+        # same as hb_ot_tag_to_script(): the tag with its first letter uppercased
+        iso = tag[:1].upper() + tag[1:]
+    return iso
+
+
+@functools.lru_cache(maxsize=None)
+def _otScripts(s):
+    iso = isoScript(s)
+    tags = ISO_TO_OT.get(iso)
+    if tags is None:
+        # same as hb_ot_tags_from_script(): the tag with its first letter lowercased
+        tags = (iso[:1].lower() + iso[1:],)
+    return tags
 
 
 def otScripts(s):
-    s = isoScript(s)
-    if s in ("Zinh", "Zyyy", "Zzzz"):
-        return ["DFLT"]
-    else:
-        tag = _getTag(s)
-        scripts = [hb.tag_to_string(tag) for tag in hb.ot_tags_from_script(tag)]
-        if scripts[1] == "DFLT":
-            return scripts[:1]
-        else:
-            return scripts
+    """Args:
+        s (str): OpenType or ISO 15924 script tag
+
+    Returns:
+        list: OpenType script tags, preferred first, ['DFLT'] for the
+            'Zinh', 'Zyyy' and 'Zzzz' scripts
+    """
+    return list(_otScripts(s))
 
 
 def otScript(s):
-    return otScripts(s)[0]
+    return _otScripts(s)[0]
+
+
+_BLOCK_SHIFT = 8
+_BLOCK_MASK = (1 << _BLOCK_SHIFT) - 1
+_scriptTable = None
+_isoToOtScripts = None
+
+
+def getScriptTable():
+    """Two-level table of the Unicode Script property of all 0x110000
+    codepoints, built once from fontTools.unicodedata. The codepoints
+    are split into blocks of 256, and identical blocks are stored once.
+
+    Returns:
+        tuple: (names, index, blocks) where names is the list of ISO 15924
+            script tags by script id, index is an array of block offsets
+            into blocks by (code >> 8), and blocks is a bytes object of
+            script ids, so the script of code is
+            names[blocks[index[code >> 8] + (code & 0xFF)]]
+    """
+    global _scriptTable
+    if _scriptTable is None:
+        import array
+
+        import fontTools.unicodedata as ud
+
+        names = sorted(set(ud.Scripts.VALUES) | {"Zzzz"})
+        ids = {name: i for i, name in enumerate(names)}
+        starts = list(ud.Scripts.RANGES) + [0x110000]
+        table = bytearray(0x110000)
+        for i, name in enumerate(ud.Scripts.VALUES):
+            table[starts[i] : starts[i + 1]] = bytes([ids[name]]) * (
+                starts[i + 1] - starts[i]
+            )
+        size = 1 << _BLOCK_SHIFT
+        offsets = {}
+        blocks = bytearray()
+        index = array.array("I")
+        for start in range(0, 0x110000, size):
+            block = bytes(table[start : start + size])
+            offset = offsets.get(block)
+            if offset is None:
+                offset = offsets[block] = len(blocks)
+                blocks += block
+            index.append(offset)
+        _scriptTable = (names, index, bytes(blocks))
+    return _scriptTable
 
 
 def charScript(char):
-    code = byteord(char)
-    return hb.tag_to_string(hbu.script(code))
+    """Args:
+        char (str or int): a character or codepoint
 
+    Returns:
+        str: ISO 15924 script tag of the Unicode Script property,
+            'Zzzz' for unassigned codepoints
+    """
+    code = ord(char) if isinstance(char, str) else char
+    names, index, blocks = getScriptTable()
+    return names[blocks[index[code >> _BLOCK_SHIFT] + (code & _BLOCK_MASK)]]
 
-def getIsoToOtScriptMap():
-    OTSCRIPTS = {
-        isoScript: otScripts(isoScript) for isoScript in ud.Scripts.NAMES.keys()
+
+def charScripts(unicodes):
+    """Bulk version of charScript(), e.g. for all codepoints of a cmap
+
+    Args:
+        unicodes (iterable): codepoints
+
+    Returns:
+        set: ISO 15924 script tags of the codepoints
+    """
+    names, index, blocks = getScriptTable()
+    ids = {
+        blocks[index[code >> _BLOCK_SHIFT] + (code & _BLOCK_MASK)]
+        for code in unicodes
     }
-    return OTSCRIPTS
+    return {names[i] for i in ids}
+
+
+def getIsoToOtScriptMap():
+    """Returns:
+    dict: {ISO 15924 script tag: [OpenType script tags, ...]} for all
+        Unicode scripts
+    """
+    global _isoToOtScripts
+    if _isoToOtScripts is None:
+        _isoToOtScripts = {iso: list(tags) for iso, tags in ISO_TO_OT.items()}
+    return _isoToOtScripts
+
+
+_LANGSYS_RE = re.compile(r"^.*?languagesystem\s+([A-Za-z]{4})\s+([A-Z]+|dflt)\s*;")
+_INCLUDE_RE = re.compile(r"^\s*include\s*\(\s*([^)]*?)\s*\)\s*;?\s*(#.*)?$")
+_includeScans = {}
+
+
+def _cmapUnicodes(ftFont):
+    tCmap = ftFont["cmap"]
+    cmap = tCmap.getcmap(3, 10)
+    if not cmap:
+        cmap = tCmap.getcmap(3, 1)
+    if not cmap:
+        cmap = tCmap.getcmap(0, 3)
+    if not cmap:
+        cmap = tCmap.getcmap(3, 0)
+    if cmap:
+        return cmap.cmap.keys()
+    return []
+
+
+def _langsysLines(langsyses, unicodes):
+    for script in charScripts(unicodes):
+        langsys = (otScript(script), "dflt")
+        langsyses.append(langsys)
+    langsysesFirst = [("DFLT", "dflt"), ("latn", "dflt")]
+    langsyses = set(langsyses) - set(langsysesFirst)
+    langsyses = langsysesFirst + sorted(list(langsyses))
+    return [f"languagesystem {l[0]} {l[1]};" for l in langsyses]
 
 
 def updateLanguageSystemsInFea(feaText="", ftFont=None, unicodes=[]):
     if ftFont:
-        unicodes = []
-        tCmap = ftFont["cmap"]
-        cmap = tCmap.getcmap(3, 10)
-        if not cmap:
-            cmap = tCmap.getcmap(3, 1)
-        if not cmap:
-            cmap = tCmap.getcmap(0, 3)
-        if not cmap:
-            cmap = tCmap.getcmap(3, 0)
-        if cmap:
-            unicodes = cmap.cmap.keys()
+        unicodes = _cmapUnicodes(ftFont)
 
     feaLines = []
     langsyses = []
     for line in feaText.splitlines():
-        langsys = None
-        for script, lang in re.findall(
-            r"^.*?languagesystem\s+([A-Za-z]{4})\s+([A-Z]+|dflt)\s*;", line
-        ):
-            langsys = (script, lang)
-        if langsys:
-            langsyses.append(langsys)
+        m = _LANGSYS_RE.match(line)
+        if m:
+            langsyses.append(m.groups())
         else:
             feaLines.append(line)
-    for u in unicodes:
-        langsys = (otScript(charScript(u)), "dflt")
-        langsyses.append(langsys)
-    langsysesFirst = [("DFLT", "dflt"), ("latn", "dflt")]
-    langsyses = set(langsyses) - set(langsysesFirst)
-    langsyses = langsysesFirst + sorted(list(langsyses))
-    langsysLines = [f"languagesystem {l[0]} {l[1]};" for l in langsyses]
-    feaText = "\n".join(langsysLines + feaLines)
+    feaText = "\n".join(_langsysLines(langsyses, unicodes) + feaLines)
     return feaText
 
 
+def _includePath(line, includeDir):
+    m = _INCLUDE_RE.match(line)
+    if not m:
+        return None
+    return os.path.join(includeDir, m.group(1))
+
+
+def _scanFeaFile(path, includeDir):
+    """Read one FEA file and find its languagesystem statements and
+    includes. The result is cached per file and reused while the file
+    modification time and size are unchanged, or, if they changed, while
+    the SHA-1 of the content is unchanged, so that an unchanged file is
+    read at most once.
+
+    Returns:
+        tuple: ([(script, language), ...], [include path, ...],
+            [(line, is languagesystem, include path or None), ...]) with the
+            lines split as str.splitlines()
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size, includeDir)
+    cached = _includeScans.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[2]
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    if cached is not None and cached[1] == digest and cached[0][2] == includeDir:
+        _includeScans[path] = (stamp, digest, cached[2])
+        return cached[2]
+    langsyses = []
+    includes = []
+    lines = []
+    for line in data.decode("utf-8").splitlines():
+        m = _LANGSYS_RE.match(line)
+        if m:
+            langsyses.append(m.groups())
+            lines.append((line, True, None))
+            continue
+        include = _includePath(line, includeDir)
+        if include is not None:
+            includes.append(include)
+        lines.append((line, False, include))
+    result = (langsyses, includes, lines)
+    _includeScans[path] = (stamp, digest, result)
+    return result
+
+
+def _flatFeaLines(path, includeDir, stack=(), languageSystems=False):
+    """Generator of the lines of a FEA file without its languagesystem
+    statements, unless languageSystems is True, with the include
+    statements replaced by the lines of the included files. The lines of
+    each file come from _scanFeaFile(), and are only read again if the
+    file has changed."""
+    stack = stack + (os.path.realpath(path),)
+    for line, isLangsys, include in _scanFeaFile(path, includeDir)[2]:
+        if isLangsys and not languageSystems:
+            continue
+        if include is None:
+            yield line
+        elif os.path.realpath(include) in stack:
+            warnings.warn("Recursive include of %s" % (include))
+        elif not os.path.exists(include):
+            warnings.warn("Cannot open include %s" % (include))
+            yield line
+        else:
+            for line in _flatFeaLines(include, includeDir, stack, languageSystems):
+                yield line
+
+
+def updateLanguageSystemsInFeaFile(
+    feaPath, output, ftFont=None, unicodes=[], includeDir=None
+):
+    """Streaming version of updateLanguageSystemsInFea() for FEA files
+    with include() statements. The languagesystem statements of the file
+    and of all included files are collected first, then the merged
+    languagesystem header and the other lines are written, with the
+    include statements replaced by the content of the included files.
+    Each file is read once, and its lines are kept in memory (per path,
+    mtime, size and SHA-1) so that a later call reads only the files
+    that have changed; the output is streamed.
+
+    For a file without includes, the output is the same as
+    updateLanguageSystemsInFea() of its content.
+
+    Args:
+        feaPath (str): path to the FEA file
+        output (io.TextIOBase): stream to write the FEA code to
+        ftFont (fontTools.ttLib.TTFont, optional): font with the cmap to
+            get the scripts from, instead of unicodes
+        unicodes (iterable, optional): codepoints to get the scripts from
+        includeDir (str, optional): folder to resolve relative include
+            paths in, default: the folder of feaPath, as in feaLib
+    """
+    if ftFont:
+        unicodes = _cmapUnicodes(ftFont)
+    if includeDir is None:
+        includeDir = os.path.dirname(os.path.abspath(feaPath))
+    langsyses = []
+    seen = set()
+    pending = [feaPath]
+    while pending:
+        path = pending.pop()
+        if os.path.realpath(path) in seen or not os.path.exists(path):
+            continue
+        seen.add(os.path.realpath(path))
+        fileLangsyses, includes = _scanFeaFile(path, includeDir)[:2]
+        langsyses.extend(fileLangsyses)
+        pending.extend(includes)
+    output.write("\n".join(_langsysLines(langsyses, unicodes)))
+    for line in _flatFeaLines(feaPath, includeDir):
+        output.write("\n")
+        output.write(line)
+
+
 if __name__ == "__main__":
     # print(isoScript('dev2'))
     # print(otScript('DFLT'))
@@ -0,0 +1,392 @@
+"""hb_scripts_data.py
+
+static ISO 15924 <-> OpenType script tag tables for hb_scripts3
+
+Generated by makescriptdata.py, do not edit.
+"""
+
+TABLE_VERSION = 1
+HARFBUZZ_VERSION = "14.6.0"
+FONTTOOLS_VERSION = "4.66.1"
+
+ISO_TO_OT = {
+    "Adlm": ("adlm",),
+    "Aghb": ("aghb",),
+    "Ahom": ("ahom",),
+    "Arab": ("arab",),
+    "Armi": ("armi",),
+    "Armn": ("armn",),
+    "Avst": ("avst",),
+    "Bali": ("bali",),
+    "Bamu": ("bamu",),
+    "Bass": ("bass",),
+    "Batk": ("batk",),
+    "Beng": ("bng2", "beng"),
+    "Berf": ("berf",),
+    "Bhks": ("bhks",),
+    "Bopo": ("bopo",),
+    "Brah": ("brah",),
+    "Brai": ("brai",),
+    "Bugi": ("bugi",),
+    "Buhd": ("buhd",),
+    "Cakm": ("cakm",),
+    "Cans": ("cans",),
+    "Cari": ("cari",),
+    "Cham": ("cham",),
+    "Cher": ("cher",),
+    "Chrs": ("chrs",),
+    "Copt": ("copt",),
+    "Cpmn": ("cpmn",),
+    "Cprt": ("cprt",),
+    "Cyrl": ("cyrl",),
+    "Deva": ("dev2", "deva"),
+    "Diak": ("diak",),
+    "Dogr": ("dogr",),
+    "Dsrt": ("dsrt",),
+    "Dupl": ("dupl",),
+    "Egyp": ("egyp",),
+    "Elba": ("elba",),
+    "Elym": ("elym",),
+    "Ethi": ("ethi",),
+    "Gara": ("gara",),
+    "Geor": ("geor",),
+    "Glag": ("glag",),
+    "Gong": ("gong",),
+    "Gonm": ("gonm",),
+    "Goth": ("goth",),
+    "Gran": ("gran",),
+    "Grek": ("grek",),
+    "Gujr": ("gjr2", "gujr"),
+    "Gukh": ("gukh",),
+    "Guru": ("gur2", "guru"),
+    "Hang": ("hang",),
+    "Hani": ("hani",),
+    "Hano": ("hano",),
+    "Hatr": ("hatr",),
+    "Hebr": ("hebr",),
+    "Hira": ("kana",),
+    "Hluw": ("hluw",),
+    "Hmng": ("hmng",),
+    "Hmnp": ("hmnp",),
+    "Hrkt": ("kana",),
+    "Hung": ("hung",),
+    "Ital": ("ital",),
+    "Java": ("java",),
+    "Jurc": ("jurc",),
+    "Kali": ("kali",),
+    "Kana": ("kana",),
+    "Kawi": ("kawi",),
+    "Khar": ("khar",),
+    "Khmr": ("khmr",),
+    "Khoj": ("khoj",),
+    "Kits": ("kits",),
+    "Knda": ("knd2", "knda"),
+    "Krai": ("krai",),
+    "Kthi": ("kthi",),
+    "Lana": ("lana",),
+    "Laoo": ("lao ",),
+    "Latn": ("latn",),
+    "Lepc": ("lepc",),
+    "Limb": ("limb",),
+    "Lina": ("lina",),
+    "Linb": ("linb",),
+    "Lisu": ("lisu",),
+    "Lyci": ("lyci",),
+    "Lydi": ("lydi",),
+    "Mahj": ("mahj",),
+    "Maka": ("maka",),
+    "Mand": ("mand",),
+    "Mani": ("mani",),
+    "Marc": ("marc",),
+    "Medf": ("medf",),
+    "Mend": ("mend",),
+    "Merc": ("merc",),
+    "Mero": ("mero",),
+    "Mlym": ("mlm2", "mlym"),
+    "Modi": ("modi",),
+    "Mong": ("mong",),
+    "Mroo": ("mroo",),
+    "Mtei": ("mtei",),
+    "Mult": ("mult",),
+    "Mymr": ("mym2", "mymr"),
+    "Nagm": ("nagm",),
+    "Nand": ("nand",),
+    "Narb": ("narb",),
+    "Nbat": ("nbat",),
+    "Newa": ("newa",),
+    "Nkoo": ("nko ",),
+    "Nshu": ("nshu",),
+    "Ogam": ("ogam",),
+    "Olck": ("olck",),
+    "Onao": ("onao",),
+    "Orkh": ("orkh",),
+    "Orya": ("ory2", "orya"),
+    "Osge": ("osge",),
+    "Osma": ("osma",),
+    "Ougr": ("ougr",),
+    "Palm": ("palm",),
+    "Pauc": ("pauc",),
+    "Pcun": ("pcun",),
+    "Perm": ("perm",),
+    "Phag": ("phag",),
+    "Phli": ("phli",),
+    "Phlp": ("phlp",),
+    "Phnx": ("phnx",),
+    "Plrd": ("plrd",),
+    "Prti": ("prti",),
+    "Rjng": ("rjng",),
+    "Rohg": ("rohg",),
+    "Runr": ("runr",),
+    "Samr": ("samr",),
+    "Sarb": ("sarb",),
+    "Saur": ("saur",),
+    "Seal": ("seal",),
+    "Sgnw": ("sgnw",),
+    "Shaw": ("shaw",),
+    "Shrd": ("shrd",),
+    "Sidd": ("sidd",),
+    "Sidt": ("sidt",),
+    "Sind": ("sind",),
+    "Sinh": ("sinh",),
+    "Sogd": ("sogd",),
+    "Sogo": ("sogo",),
+    "Sora": ("sora",),
+    "Soyo": ("soyo",),
+    "Sund": ("sund",),
+    "Sunu": ("sunu",),
+    "Sylo": ("sylo",),
+    "Syrc": ("syrc",),
+    "Tagb": ("tagb",),
+    "Takr": ("takr",),
+    "Tale": ("tale",),
+    "Talu": ("talu",),
+    "Taml": ("tml2", "taml"),
+    "Tang": ("tang",),
+    "Tavt": ("tavt",),
+    "Tayo": ("tayo",),
+    "Telu": ("tel2", "telu"),
+    "Tfng": ("tfng",),
+    "Tglg": ("tglg",),
+    "Thaa": ("thaa",),
+    "Thai": ("thai",),
+    "Tibt": ("tibt",),
+    "Tirh": ("tirh",),
+    "Tnsa": ("tnsa",),
+    "Todr": ("todr",),
+    "Tols": ("tols",),
+    "Toto": ("toto",),
+    "Tutg": ("tutg",),
+    "Ugar": ("ugar",),
+    "Vaii": ("vai ",),
+    "Vith": ("vith",),
+    "Wara": ("wara",),
+    "Wcho": ("wcho",),
+    "Xpeo": ("xpeo",),
+    "Xsux": ("xsux",),
+    "Yezi": ("yezi",),
+    "Yiii": ("yi  ",),
+    "Zanb": ("zanb",),
+    "Zinh": ("DFLT",),
+    "Zyyy": ("DFLT",),
+    "Zzzz": ("DFLT",),
+}
+"""{ISO 15924 script tag: (OpenType script tags, ...)}, preferred first"""
+
+OT_TO_ISO = {
+    "adlm": "Adlm",
+    "aghb": "Aghb",
+    "ahom": "Ahom",
+    "arab": "Arab",
+    "armi": "Armi",
+    "armn": "Armn",
+    "avst": "Avst",
+    "bali": "Bali",
+    "bamu": "Bamu",
+    "bass": "Bass",
+    "batk": "Batk",
+    "beng": "Beng",
+    "berf": "Berf",
+    "bhks": "Bhks",
+    "bng2": "Beng",
+    "bng3": "Beng",
+    "bopo": "Bopo",
+    "brah": "Brah",
+    "brai": "Brai",
+    "bugi": "Bugi",
+    "buhd": "Buhd",
+    "cakm": "Cakm",
+    "cans": "Cans",
+    "cari": "Cari",
+    "cham": "Cham",
+    "cher": "Cher",
+    "chrs": "Chrs",
+    "copt": "Copt",
+    "cpmn": "Cpmn",
+    "cprt": "Cprt",
+    "cyrl": "Cyrl",
+    "dev2": "Deva",
+    "dev3": "Deva",
+    "deva": "Deva",
+    "diak": "Diak",
+    "dogr": "Dogr",
+    "dsrt": "Dsrt",
+    "dupl": "Dupl",
+    "egyp": "Egyp",
+    "elba": "Elba",
+    "elym": "Elym",
+    "ethi": "Ethi",
+    "gara": "Gara",
+    "geor": "Geor",
+    "gjr2": "Gujr",
+    "gjr3": "Gujr",
+    "glag": "Glag",
+    "gong": "Gong",
+    "gonm": "Gonm",
+    "goth": "Goth",
+    "gran": "Gran",
+    "grek": "Grek",
+    "gujr": "Gujr",
+    "gukh": "Gukh",
+    "gur2": "Guru",
+    "gur3": "Guru",
+    "guru": "Guru",
+    "hang": "Hang",
+    "hani": "Hani",
+    "hano": "Hano",
+    "hatr": "Hatr",
+    "hebr": "Hebr",
+    "hluw": "Hluw",
+    "hmng": "Hmng",
+    "hmnp": "Hmnp",
+    "hung": "Hung",
+    "ital": "Ital",
+    "jamo": "Jamo",
+    "java": "Java",
+    "jurc": "Jurc",
+    "kali": "Kali",
+    "kana": "Kana",
+    "kawi": "Kawi",
+    "khar": "Khar",
+    "khmr": "Khmr",
+    "khoj": "Khoj",
+    "kits": "Kits",
+    "knd2": "Knda",
+    "knd3": "Knda",
+    "knda": "Knda",
+    "krai": "Krai",
+    "kthi": "Kthi",
+    "lana": "Lana",
+    "lao ": "Laoo",
+    "latn": "Latn",
+    "lepc": "Lepc",
+    "limb": "Limb",
+    "lina": "Lina",
+    "linb": "Linb",
+    "lisu": "Lisu",
+    "lyci": "Lyci",
+    "lydi": "Lydi",
+    "mahj": "Mahj",
+    "maka": "Maka",
+    "mand": "Mand",
+    "mani": "Mani",
+    "marc": "Marc",
+    "math": "Zmth",
+    "medf": "Medf",
+    "mend": "Mend",
+    "merc": "Merc",
+    "mero": "Mero",
+    "mlm2": "Mlym",
+    "mlm3": "Mlym",
+    "mlym": "Mlym",
+    "modi": "Modi",
+    "mong": "Mong",
+    "mroo": "Mroo",
+    "mtei": "Mtei",
+    "mult": "Mult",
+    "mym2": "Mymr",
+    "mymr": "Mymr",
+    "nagm": "Nagm",
+    "nand": "Nand",
+    "narb": "Narb",
+    "nbat": "Nbat",
+    "newa": "Newa",
+    "nko ": "Nkoo",
+    "nshu": "Nshu",
+    "ogam": "Ogam",
+    "olck": "Olck",
+    "onao": "Onao",
+    "orkh": "Orkh",
+    "ory2": "Orya",
+    "ory3": "Orya",
+    "orya": "Orya",
+    "osge": "Osge",
+    "osma": "Osma",
+    "ougr": "Ougr",
+    "palm": "Palm",
+    "pauc": "Pauc",
+    "pcun": "Pcun",
+    "perm": "Perm",
+    "phag": "Phag",
+    "phli": "Phli",
+    "phlp": "Phlp",
+    "phnx": "Phnx",
+    "plrd": "Plrd",
+    "prti": "Prti",
+    "rjng": "Rjng",
+    "rohg": "Rohg",
+    "runr": "Runr",
+    "samr": "Samr",
+    "sarb": "Sarb",
+    "saur": "Saur",
+    "seal": "Seal",
+    "sgnw": "Sgnw",
+    "shaw": "Shaw",
+    "shrd": "Shrd",
+    "sidd": "Sidd",
+    "sidt": "Sidt",
+    "sind": "Sind",
+    "sinh": "Sinh",
+    "sogd": "Sogd",
+    "sogo": "Sogo",
+    "sora": "Sora",
+    "soyo": "Soyo",
+    "sund": "Sund",
+    "sunu": "Sunu",
+    "sylo": "Sylo",
+    "syrc": "Syrc",
+    "tagb": "Tagb",
+    "takr": "Takr",
+    "tale": "Tale",
+    "talu": "Talu",
+    "taml": "Taml",
+    "tang": "Tang",
+    "tavt": "Tavt",
+    "tayo": "Tayo",
+    "tel2": "Telu",
+    "tel3": "Telu",
+    "telu": "Telu",
+    "tfng": "Tfng",
+    "tglg": "Tglg",
+    "thaa": "Thaa",
+    "thai": "Thai",
+    "tibt": "Tibt",
+    "tirh": "Tirh",
+    "tml2": "Taml",
+    "tml3": "Taml",
+    "tnsa": "Tnsa",
+    "todr": "Todr",
+    "tols": "Tols",
+    "toto": "Toto",
+    "tutg": "Tutg",
+    "ugar": "Ugar",
+    "vai ": "Vaii",
+    "vith": "Vith",
+    "wara": "Wara",
+    "wcho": "Wcho",
+    "xpeo": "Xpeo",
+    "xsux": "Xsux",
+    "yezi": "Yezi",
+    "yi  ": "Yiii",
+    "zanb": "Zanb",
+}
+"""{OpenType script tag: ISO 15924 script tag} as hb_ot_tag_to_script()"""
@@ -0,0 +1,291 @@
+"""hb_server.py
+
+local HTTP server for hb_render.HarfBuzzRenderer that keeps the fonts and
+the shaping backend warm between requests, on a TCP port or a Unix socket
+
+Requests are POSTed as JSON objects with the HarfBuzzRenderer attributes
+to use (font_file, face_index, features, script, ..., see RENDERER_KEYS)
+and:
+    /shape   'text' -> {"glyphs": [...]}
+             'texts' -> {"results": [[...], ...]}
+    /render  'text', 'font_size', 'output_format' ('svg' | 'png' | 'pdf'),
+             'use_symbols' -> the image bytes
+             'texts' -> {"output_format": ..., "images": [...]} with SVG
+             as text and PNG or PDF as base64
+Invalid requests get a 400 and other failures a 500 JSON {"error": ...}.
+GET /stats returns request counts, latency and throughput as JSON.
+
+Usage:
+    hb_render serve [--host 127.0.0.1] [--port 8765] [--socket path]
+
+"""
+
+import argparse
+import base64
+import collections
+import http.server
+import json
+import os
+import socketserver
+import threading
+import time
+import warnings
+
+from feaLab.hb_render import SHAPING_ATTRIBUTES, HarfBuzzRenderer
+
+__version__ = "0.1"
+
+CONTENT_TYPES = {
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "pdf": "application/pdf",
+}
+
+RENDER_KEYS = ("text", "texts", "font_size", "output_format", "use_symbols")
+
+RENDERER_KEYS = SHAPING_ATTRIBUTES + (
+    "backend",
+    "annotate",
+    "background",
+    "foreground",
+    "line_space",
+    "margin",
+)
+"""HarfBuzzRenderer attributes that a request can set, other keys than
+these and RENDER_KEYS get a 400"""
+
+
+class ServerStats:
+    """Request counters and latencies of a server
+
+    Attributes:
+        started (float): start time
+        requests (collections.Counter): number of requests per path
+        errors (collections.Counter): number of failed requests per path
+        latencies (collections.deque): seconds of the most recent requests
+    """
+
+    def __init__(self, maxlen=10000):
+        self.started = time.time()
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+        self.latencies = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, path, seconds, ok=True):
+        with self._lock:
+            self.requests[path] += 1
+            if not ok:
+                self.errors[path] += 1
+            self.latencies.append(seconds)
+
+    def report(self):
+        """Returns:
+        dict: counts, latency percentiles in ms and requests per second
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            total = sum(self.requests.values())
+            report = {
+                "uptime": time.time() - self.started,
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+            }
+        report["requests_per_second"] = total / max(report["uptime"], 1e-9)
+        if latencies:
+            report["latency_ms"] = {
+                "mean": 1000 * sum(latencies) / len(latencies),
+                "p50": 1000 * latencies[len(latencies) // 2],
+                "p95": 1000 * latencies[int(len(latencies) * 0.95)],
+                "max": 1000 * latencies[-1],
+            }
+        return report
+
+
+def _renderer(request):
+    hb = HarfBuzzRenderer()
+    for name, value in request.items():
+        if name in RENDERER_KEYS:
+            setattr(hb, name, value)
+        elif name not in RENDER_KEYS:
+            raise ValueError("Unknown request key %s" % (name))
+    if not hb.font_file or not os.path.exists(hb.font_file):
+        raise ValueError("Cannot open %s" % (hb.font_file))
+    return hb
+
+
+def shapeRequest(request):
+    """Handle a /shape request
+
+    Args:
+        request (dict): renderer attributes plus 'text' or 'texts'
+
+    Returns:
+        dict: {'glyphs': [...]} or {'results': [[...], ...]}
+    """
+    hb = _renderer(request)
+    if "texts" in request:
+        return {"results": list(hb.shapeMany(request["texts"]))}
+    return {"glyphs": hb.toJson(request.get("text", ""))}
+
+
+def _render(hb, text, output_format, font_size, use_symbols):
+    """Returns:
+    bytes: the image of one text
+    """
+    if output_format == "svg" and use_symbols:
+        data = hb.renderSVG(text, font_size=font_size, use_symbols=True)
+    elif output_format == "svg":
+        data = hb.toSVG(text, font_size=font_size)
+    else:
+        data = hb._toImage(text, output_format=output_format, font_size=font_size)
+    if not data:
+        raise ValueError("Cannot render %s" % (output_format))
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return data
+
+
+def renderRequest(request):
+    """Handle a /render request
+
+    Args:
+        request (dict): renderer attributes plus 'text' or 'texts',
+            'font_size', 'output_format' and 'use_symbols'
+
+    Returns:
+        tuple: (content type, image bytes), or for 'texts', (content type,
+            JSON bytes) of {'output_format', 'images'} with the images as
+            SVG text or as base64
+    """
+    hb = _renderer(request)
+    output_format = request.get("output_format", "svg")
+    font_size = request.get("font_size")
+    use_symbols = request.get("use_symbols")
+    if "texts" in request:
+        images = []
+        for text in request["texts"]:
+            data = _render(hb, text, output_format, font_size, use_symbols)
+            if output_format == "svg":
+                images.append(data.decode("utf-8"))
+            else:
+                images.append(base64.b64encode(data).decode("ascii"))
+        result = {"output_format": output_format, "images": images}
+        return ("application/json", json.dumps(result).encode("utf-8"))
+    data = _render(hb, request.get("text", ""), output_format, font_size, use_symbols)
+    return (CONTENT_TYPES.get(output_format, "application/octet-stream"), data)
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handles the /shape, /render and /stats requests"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sendJson(self, status, obj):
+        self._send(status, "application/json", json.dumps(obj).encode("utf-8"))
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._sendJson(200, self.server.stats.report())
+        else:
+            self._sendJson(404, {"error": "Unknown path %s" % (self.path)})
+
+    def do_POST(self):
+        start = time.time()
+        ok = False
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                if self.path == "/shape":
+                    self._sendJson(200, shapeRequest(request))
+                elif self.path == "/render":
+                    self._send(200, *renderRequest(request))
+                else:
+                    self._sendJson(404, {"error": "Unknown path %s" % (self.path)})
+                    return
+            ok = True
+        except (ValueError, TypeError, AttributeError, KeyError, OSError) as e:
+            # e.g. bad JSON, an unknown backend or attribute, a missing font
+            self._sendJson(400, {"error": "%s: %s" % (type(e).__name__, e)})
+        except Exception as e:
+            self._sendJson(500, {"error": "%s: %s" % (type(e).__name__, e)})
+        finally:
+            self.server.stats.record(self.path, time.time() - start, ok)
+
+
+class UnixRequestHandler(RequestHandler):
+    disable_nagle_algorithm = False
+
+    def address_string(self):
+        return "unix"
+
+    def setup(self):
+        self.client_address = ("unix", 0)
+        RequestHandler.setup(self)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address):
+        http.server.HTTPServer.__init__(self, address, RequestHandler)
+        self.stats = ServerStats()
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        socketserver.UnixStreamServer.__init__(self, path, UnixRequestHandler)
+        self.stats = ServerStats()
+
+
+def serve(host="127.0.0.1", port=8765, socket_path=None):
+    """Run the server until interrupted
+
+    Args:
+        host (str, optional): host to listen on
+        port (int, optional): TCP port to listen on
+        socket_path (str, optional): Unix socket path, used instead of host and port
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path)
+        print("hb_render serving on %s" % (socket_path))
+    else:
+        server = ThreadingHTTPServer((host, port))
+        print("hb_render serving on http://%s:%d" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="hb_render serve", description="Serve shaping and rendering requests"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", default=None, help="Unix socket path")
+    options = parser.parse_args(args)
+    serve(host=options.host, port=options.port, socket_path=options.socket)
+    return 0
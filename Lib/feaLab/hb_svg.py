@@ -0,0 +1,351 @@
+"""hb_svg.py
+
+hb_svg.SVGRenderer class
+
+draws shaped glyph runs (as returned by hb_render.HarfBuzzRenderer.toJson()
+or as hb_glyphrun.GlyphRun) into SVG in-process, using the glyph outlines
+read with fontTools, without the `hb-view` tool
+
+"""
+
+import atexit
+import hashlib
+import os.path
+import re
+
+from fontTools.pens.svgPathPen import SVGPathPen
+from fontTools.ttLib import TTFont
+
+__version__ = "0.1"
+
+_GID_RE = re.compile(r"^gid(\d+)$")
+
+
+def _num(value, digits=2):
+    """Format a number for SVG with at most the given number of decimals"""
+    value = round(value, digits)
+    if value == int(value):
+        return str(int(value))
+    return ("%.*f" % (digits, value)).rstrip("0")
+
+
+def _color(value):
+    """Split '#rrggbb' or '#rrggbbaa' into an SVG color and an opacity string"""
+    if len(value) == 9:
+        return value[:7], _num(int(value[7:9], 16) / 255.0)
+    return value, None
+
+
+def _margins(margin):
+    """Expand a margin (int, or list of one to four numbers, CSS order)
+    to [top, right, bottom, left]"""
+    if isinstance(margin, (int, float)):
+        return [margin] * 4
+    margin = list(margin)
+    if len(margin) == 1:
+        return margin * 4
+    if len(margin) == 2:
+        return margin * 2
+    if len(margin) == 3:
+        return margin + margin[1:2]
+    return margin[:4]
+
+
+class FontOutlines:
+    """Glyph outlines of one font face as SVG path data, converted once
+    per glyph and cached.
+
+    The font file stays open to read the outlines until close().
+
+    Attributes:
+        upem (int): units per em
+        ascender (int): hhea ascender
+        descender (int): hhea descender (negative)
+        glyph_order (list): glyph names by glyph id
+        id (str): short hash of the font file path, face index, modification
+            time and size, which identifies the outlines in SVG ids
+    """
+
+    def __init__(self, font_file, face_index=0):
+        """Initialize the FontOutlines() object
+
+        Args:
+            font_file (str): path to the font file
+            face_index (int, optional): the face index in a TTC file
+        """
+        path = os.path.realpath(font_file)
+        stat = os.stat(path)
+        key = "%s|%d|%d|%d" % (path, face_index, stat.st_mtime_ns, stat.st_size)
+        self.id = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+        self.font = TTFont(font_file, fontNumber=face_index, lazy=True)
+        self.upem = self.font["head"].unitsPerEm
+        self.ascender = self.font["hhea"].ascent
+        self.descender = self.font["hhea"].descent
+        self.glyph_order = self.font.getGlyphOrder()
+        self._glyph_set = self.font.getGlyphSet()
+        self._glyph_ids = None
+        self._paths = {}
+
+    def close(self):
+        """Close the font file. The outlines that were not converted yet
+        cannot be read after this."""
+        self.font.close()
+
+    def glyphName(self, glyph):
+        """Args:
+            glyph (str or int): glyph name, 'gidN' or glyph id
+
+        Returns:
+            str: the glyph name in the font, or None if not found
+        """
+        if isinstance(glyph, int):
+            return self.glyph_order[glyph] if glyph < len(self.glyph_order) else None
+        if glyph in self._glyph_set:
+            return glyph
+        m = _GID_RE.match(glyph)
+        if m:
+            return self.glyphName(int(m.group(1)))
+        return None
+
+    def glyphId(self, glyph):
+        """Args:
+            glyph (str or int): glyph name, 'gidN' or glyph id
+
+        Returns:
+            int: the glyph id in the font, or None if not found
+        """
+        name = self.glyphName(glyph)
+        if name is None:
+            return None
+        if self._glyph_ids is None:
+            self._glyph_ids = {n: i for i, n in enumerate(self.glyph_order)}
+        return self._glyph_ids.get(name)
+
+    def glyphPath(self, glyph):
+        """Get the outline of a glyph as SVG path data in font units (y-up)
+
+        Args:
+            glyph (str or int): glyph name, 'gidN' or glyph id
+
+        Returns:
+            str: SVG path data, empty for glyphs without outlines
+        """
+        path = self._paths.get(glyph)
+        if path is None:
+            name = self.glyphName(glyph)
+            path = ""
+            if name is not None:
+                pen = SVGPathPen(self._glyph_set)
+                self._glyph_set[name].draw(pen)
+                path = pen.getCommands()
+            self._paths[glyph] = path
+        return path
+
+
+_outlines = {}
+
+
+def getOutlines(font_file, face_index=0):
+    """Return the shared FontOutlines of a font face, reloaded if the
+    font file changes, then the replaced FontOutlines is closed
+
+    Args:
+        font_file (str): path to the font file
+        face_index (int, optional): the face index in a TTC file
+
+    Returns:
+        FontOutlines:
+    """
+    path = os.path.realpath(font_file)
+    stat = os.stat(path)
+    key = (path, face_index)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _outlines.get(key)
+    if cached is None or cached[0] != stamp:
+        if cached is not None:
+            cached[1].close()
+        cached = (stamp, FontOutlines(path, face_index))
+        _outlines[key] = cached
+    return cached[1]
+
+
+@atexit.register
+def clearOutlines():
+    """Close the FontOutlines shared by getOutlines() and clear them"""
+    for stamp, outlines in _outlines.values():
+        outlines.close()
+    _outlines.clear()
+
+
+class SVGRenderer:
+    """Class to draw shaped glyph runs into SVG with fontTools pens.
+
+    Attributes:
+        outlines (FontOutlines):
+            the glyph outlines, shared between SVGRenderer objects, looked
+            up again with getOutlines() by each layout()
+        font_size (int):
+            the font size in px, 0 means 'upem'
+        margin (list or int):
+            margin around the output, one number or list of one to four
+            numbers e.g. [16, 16, 16, 16]
+        foreground (str):
+            glyph color '#rrggbb' | '#rrggbbaa', default: '#000000'
+        background (str):
+            background color '#rrggbb' | '#rrggbbaa', default: '#ffffff'
+        line_space (int):
+            space between lines in font units, default: 0
+        use_symbols (bool):
+            define each distinct glyph once in <defs> and place it with <use>,
+            default: False
+
+    Example:
+        svg = SVGRenderer('font.otf', font_size=72).render([hb.toJson('Hello')])
+    """
+
+    def __init__(
+        self,
+        font_file,
+        face_index=0,
+        font_size=0,
+        margin=16,
+        foreground="#000000",
+        background="#ffffff",
+        line_space=0,
+        use_symbols=False,
+    ):
+        """Initialize the SVGRenderer() object
+
+        Args:
+            font_file (str): path to the font file
+            face_index (int, optional): the face index in a TTC file
+            font_size (int, optional): the font size in px, 0 means 'upem'
+            margin (list or int, optional): margin around the output
+            foreground (str, optional): glyph color
+            background (str, optional): background color
+            line_space (int, optional): space between lines in font units
+            use_symbols (bool, optional): use <defs> and <use> for the glyphs
+        """
+        self.font_file = font_file
+        self.face_index = face_index
+        self.outlines = getOutlines(font_file, face_index)
+        self.font_size = font_size
+        self.margin = margin
+        self.foreground = foreground
+        self.background = background
+        self.line_space = line_space
+        self.use_symbols = use_symbols
+
+    def _glyphs(self, run):
+        """Normalize a run to a list of (glyph, dx, dy, ax, ay) tuples"""
+        if hasattr(run, "toJson"):
+            run = run.toJson()
+        return [(g["g"], g["dx"], g["dy"], g["ax"], g["ay"]) for g in run]
+
+    def layout(self, runs):
+        """Place the glyphs of the runs, one run per line
+
+        Args:
+            runs (list): glyph runs shaped at 'upem' size (font_size 0),
+                as lists of `hb-shape` JSON records or as GlyphRun objects
+
+        Returns:
+            tuple: (width, height, scale, placements) where placements is
+                a list of (glyph, x, y) with the glyph origin in SVG
+                coordinates, and scale converts font units to px
+        """
+        # the shared outlines are replaced and closed if the font changes
+        outlines = self.outlines = getOutlines(self.font_file, self.face_index)
+        scale = float(self.font_size) / outlines.upem if self.font_size else 1.0
+        top, right, bottom, left = _margins(self.margin)
+        line_height = (outlines.ascender - outlines.descender) * scale
+        placements = []
+        width = 0
+        y = top
+        # an empty run, e.g. a blank line, advances by the line height too
+        for i, run in enumerate(runs):
+            if i:
+                y += self.line_space * scale
+            baseline = y + outlines.ascender * scale
+            x = 0
+            for glyph, dx, dy, ax, ay in self._glyphs(run):
+                placements.append(
+                    (glyph, left + (x + dx) * scale, baseline - dy * scale)
+                )
+                x += ax
+                baseline -= ay * scale
+            width = max(width, x * scale)
+            y += line_height
+        return (left + width + right, y + bottom, scale, placements)
+
+    def render(self, runs):
+        """Draw the runs, one run per line. If self.use_symbols is True,
+        each distinct glyph of all runs is defined once in <defs> and
+        placed with <use>.
+
+        Args:
+            runs (list): glyph runs shaped at 'upem' size (font_size 0),
+                as lists of `hb-shape` JSON records or as GlyphRun objects
+
+        Returns:
+            str: SVG document
+        """
+        width, height, scale, placements = self.layout(runs)
+        lines = [
+            '<svg xmlns="http://www.w3.org/2000/svg"%s width="%s" height="%s" '
+            'viewBox="0 0 %s %s">'
+            % (
+                ' xmlns:xlink="http://www.w3.org/1999/xlink"'
+                if self.use_symbols
+                else "",
+                _num(width),
+                _num(height),
+                _num(width),
+                _num(height),
+            )
+        ]
+        s = _num(scale, 6)
+        if self.use_symbols:
+            # the ids name the font, scale and glyph, so that SVGs inlined
+            # in one page only share the symbols that are the same
+            prefix = "g%s-%s-" % (self.outlines.id, s)
+            ids = {}
+            lines.append("<defs>")
+            for glyph, x, y in placements:
+                if glyph not in ids:
+                    path = self.outlines.glyphPath(glyph)
+                    ids[glyph] = None
+                    if path:
+                        ids[glyph] = "%s%d" % (prefix, self.outlines.glyphId(glyph))
+                        lines.append(
+                            '<path id="%s" transform="scale(%s -%s)" d="%s"/>'
+                            % (ids[glyph], s, s, path)
+                        )
+            lines.append("</defs>")
+        color, opacity = _color(self.background)
+        lines.append(
+            '<rect width="100%%" height="100%%" fill="%s"%s/>'
+            % (color, ' fill-opacity="%s"' % (opacity) if opacity else "")
+        )
+        color, opacity = _color(self.foreground)
+        lines.append(
+            '<g fill="%s"%s>'
+            % (color, ' fill-opacity="%s"' % (opacity) if opacity else "")
+        )
+        for glyph, x, y in placements:
+            if self.use_symbols:
+                if ids[glyph]:
+                    lines.append(
+                        '<use xlink:href="#%s" x="%s" y="%s"/>'
+                        % (ids[glyph], _num(x), _num(y))
+                    )
+                continue
+            path = self.outlines.glyphPath(glyph)
+            if path:
+                lines.append(
+                    '<path transform="matrix(%s 0 0 -%s %s %s)" d="%s"/>'
+                    % (s, s, _num(x), _num(y), path)
+                )
+        lines.append("</g>")
+        lines.append("</svg>")
+        return "\n".join(lines) + "\n"
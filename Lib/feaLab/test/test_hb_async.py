@@ -0,0 +1,61 @@
+"""Tests of feaLab.hb_async.AsyncHarfBuzzRenderer batching with the
+'hb-shape' backend, with the subprocess replaced by a fake `hb-shape`"""
+
+import asyncio
+import json
+import os.path
+
+from feaLab.hb_async import AsyncHarfBuzzRenderer
+from feaLab.hb_instrument import Instrumentation
+from feaLab.hb_render import HbShapeBackend
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+
+def renderer():
+    hb = AsyncHarfBuzzRenderer(FONT_FILE)
+    hb.backend = HbShapeBackend()
+    hb.runs = []
+
+    async def run(args, stdin):
+        # one glyph per character, one output line per input line
+        hb.runs.append(args)
+        lines = []
+        for line in stdin.decode("utf-8").split("\n"):
+            if "--output-format=text" in args:
+                lines.append("[%s]" % ("|".join("%d=0+100" % (ord(c)) for c in line)))
+            else:
+                lines.append(json.dumps([{"g": c, "ax": 100} for c in line]))
+        return ("\n".join(lines) + "\n").encode("utf-8"), b""
+
+    hb._run = run
+    return hb
+
+
+def test_ashapeMany_empty_texts():
+    hb = renderer()
+    results = asyncio.run(hb.ashapeMany(["ab", "", "c", ""]))
+    assert [len(glyphs) for glyphs in results] == [2, 0, 1, 0]
+    assert results[1] == results[3] == []
+    assert len(hb.runs) == 1
+    assert asyncio.run(hb.ashapeMany(["", ""])) == [[], []]
+    assert asyncio.run(hb.atoJson("")) == []
+    assert len(hb.runs) == 1
+
+
+def test_ashapeMany_glyph_indexes_and_instrument():
+    hb = renderer()
+    hb.use_glyph_indexes = True
+    hb.instrument = Instrumentation()
+    results = asyncio.run(hb.ashapeMany(["ab", "", "c"]))
+    assert [[glyph["g"] for glyph in glyphs] for glyphs in results] == [
+        [97, 98],
+        [],
+        [99],
+    ]
+    assert "--no-glyph-names" in hb.runs[0]
+    assert hb.instrument.counters["texts"] == 3
+    assert hb.instrument.counters["glyphs"] == 3
+    assert hb.instrument.counters["bytes.in"] == len("ab\nc")
+    assert hb.instrument.spans["hb-shape"][0] == 1
+    assert hb.instrument.spans["shapeMany"][0] == 1
@@ -0,0 +1,45 @@
+"""Tests of feaLab.hb_batch"""
+
+import json
+import os.path
+
+from feaLab import hb_batch
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+
+def makeJob(tmp_path):
+    output_file = str(tmp_path / "a.svg")
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("<svg/>")
+    return {"font_file": FONT_FILE, "text": "a", "output_file": output_file}
+
+
+def test_failed_entry_is_not_up_to_date(tmp_path):
+    job = makeJob(tmp_path)
+    entry = {"output_file": job["output_file"], "key": hb_batch.jobKey(job)}
+    assert hb_batch.isUpToDate(job)
+    assert hb_batch.isUpToDate(job, dict(entry, status="rendered"))
+    assert hb_batch.isUpToDate(job, dict(entry, status="skipped"))
+    assert not hb_batch.isUpToDate(job, dict(entry, status="failed"))
+    assert not hb_batch.isUpToDate(job, {"output_file": job["output_file"]})
+
+
+def test_invalid_jobs_fail_alone(tmp_path):
+    job = makeJob(tmp_path)
+    manifest_file = str(tmp_path / "manifest.json")
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        entry = {
+            "output_file": job["output_file"],
+            "key": hb_batch.jobKey(job),
+            "status": "rendered",
+        }
+        json.dump({"jobs": [entry, None]}, f)
+    jobs = [{"font_file": FONT_FILE, "text": "a"}, job, "a.svg"]
+    manifest = hb_batch.renderBatch(jobs, workers=1, manifest_file=manifest_file)
+    statuses = [entry["status"] for entry in manifest["jobs"]]
+    assert statuses == ["failed", "skipped", "failed"]
+    assert manifest["jobs"][0]["warnings"] == ["Job has no output_file"]
+    assert manifest["jobs"][0]["output_file"] is None
+    with open(manifest_file, encoding="utf-8") as f:
+        assert json.load(f) == manifest
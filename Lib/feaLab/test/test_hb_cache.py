@@ -0,0 +1,70 @@
+"""Tests of feaLab.hb_cache"""
+
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+from feaLab import hb_cache
+from feaLab.hb_cache import ShapingCache, fontHash
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+GLYPHS = [{"g": "o", "cl": 0, "dx": 0, "dy": 0, "ax": 500, "ay": 0}]
+
+
+def rows(path):
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT COUNT(*) FROM shapes").fetchone()[0]
+    finally:
+        db.close()
+
+
+def test_font_hash_none():
+    assert fontHash(None) is None
+
+
+def test_font_hash_replaced_file(tmp_path):
+    path = str(tmp_path / "font.otf")
+    shutil.copy(FONT_FILE, path)
+    before = fontHash(path)
+    stat = os.stat(path)
+    with open(path, "r+b") as f:
+        f.write(b"\0\1\0\0")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert fontHash(path) != before
+
+
+def test_font_hashes_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(hb_cache, "FONT_HASHES_MAXSIZE", 2)
+    for i in range(4):
+        path = tmp_path / ("font%d.bin" % (i))
+        path.write_bytes(b"%d" % (i))
+        fontHash(str(path))
+    assert len(hb_cache._font_hashes) <= 2
+
+
+def test_context_manager_commits(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    with ShapingCache(path=path) as cache:
+        cache.set("key", GLYPHS)
+    assert cache._db is None
+    assert rows(path) == 1
+
+
+def test_pending_writes_flushed_at_exit(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    script = textwrap.dedent(
+        """
+        import sys
+        from feaLab.hb_cache import ShapingCache
+        cache = ShapingCache(path=sys.argv[1])
+        cache.set("key", [{"g": 1, "cl": 0, "dx": 0, "dy": 0, "ax": 5, "ay": 0}])
+        """
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.dirname(FONT_FILE)))
+    subprocess.run([sys.executable, "-c", script, path], check=True, env=env)
+    assert rows(path) == 1
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from feaLab.hb_compile import IncrementalCompiler
+from feaLab.hb_render import getBackend
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+requires_uharfbuzz = pytest.mark.skipif(
+    not getBackend("uharfbuzz").isAvailable(), reason="uharfbuzz not installed"
+)
+
+FEA = """\
+languagesystem DFLT dflt; languagesystem latn dflt;
+@f = [f]; lookup fi { sub @f i by f_i; } fi; feature liga { lookup fi; } liga;
+feature kern { pos A V %d; } kern;
+"""
+
+
+def glyphs(hb, text):
+    return [(g["g"], g["ax"]) for g in hb.toJson(text)]
+
+
+@requires_uharfbuzz
+def test_compile_edits():
+    with IncrementalCompiler(FONT_FILE) as compiler:
+        hb = compiler.renderer()
+        assert compiler.compile(FEA % (-100))["parsed"] == 4
+        assert glyphs(hb, "fi")[0][0] == "f_i"
+        kerned = glyphs(hb, "AV")
+        assert compiler.compile(FEA % (-100))["parsed"] == 0
+        stats = compiler.compile(FEA % (-200))
+        assert stats["tables"] == ["GPOS"]
+        assert glyphs(hb, "AV")[0][1] == kerned[0][1] - 100
+        assert glyphs(hb, "fi")[0][0] == "f_i"
+
+
+@requires_uharfbuzz
+def test_compile_error_keeps_font():
+    with IncrementalCompiler(FONT_FILE) as compiler:
+        hb = compiler.renderer()
+        compiler.compile(FEA % (-100))
+        with pytest.warns(UserWarning, match="Cannot parse"):
+            assert compiler.compile(FEA.replace("@f i", "@missing i") % (0)) is None
+        assert glyphs(hb, "fi")[0][0] == "f_i"
+
+
+@requires_uharfbuzz
+def test_build_error_restores_tables(monkeypatch):
+    from fontTools.feaLib.builder import Builder
+    from fontTools.feaLib.error import FeatureLibError
+
+    with IncrementalCompiler(FONT_FILE) as compiler:
+        hb = compiler.renderer()
+        compiler.compile(FEA % (-100))
+        kerned = glyphs(hb, "AV")
+        gpos = compiler.font["GPOS"]
+        build = Builder.build
+
+        def fail(self, *args, **kwargs):
+            # fails after the tables were written
+            build(self, *args, **kwargs)
+            raise FeatureLibError("boom", None)
+
+        monkeypatch.setattr(Builder, "build", fail)
+        with pytest.warns(UserWarning, match="Cannot build"):
+            assert compiler.compile(FEA % (-200)) is None
+        assert compiler.font["GPOS"] is gpos
+        assert glyphs(hb, "AV") == kerned
+        monkeypatch.setattr(Builder, "build", build)
+        assert compiler.compile(FEA % (-200))["tables"] == ["GPOS"]
+        assert glyphs(hb, "AV")[0][1] == kerned[0][1] - 100
+
+
+def test_close():
+    compiler = IncrementalCompiler(FONT_FILE)
+    compiler.close()
+    assert compiler.font.reader is None
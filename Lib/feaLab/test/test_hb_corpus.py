@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from feaLab.hb_corpus import shapeCorpus
+from feaLab.hb_pool import ShapingPool
+from feaLab.hb_render import HarfBuzzRenderer, UharfbuzzBackend, getBackend
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+requires_uharfbuzz = pytest.mark.skipif(
+    not getBackend("uharfbuzz").isAvailable(), reason="uharfbuzz not installed"
+)
+
+
+def renderer():
+    hb = HarfBuzzRenderer(FONT_FILE)
+    hb.backend = "uharfbuzz"
+    return hb
+
+
+def failOn(bad_text, exit=False):
+    shape = UharfbuzzBackend.shape
+
+    def failingShape(self, renderer, text):
+        if text == bad_text:
+            if exit:
+                os._exit(1)
+            raise RuntimeError("cannot shape")
+        return shape(self, renderer, text)
+
+    return failingShape
+
+
+@requires_uharfbuzz
+@pytest.mark.parametrize("workers", [0, 2])
+def test_shapeCorpus_blank_lines(tmp_path, workers):
+    input_file = tmp_path / "corpus.txt"
+    input_file.write_text("Hello\n\nWorld\n\n", encoding="utf-8")
+    output_file = tmp_path / "out.jsonl"
+    stats = shapeCorpus(
+        renderer(), str(input_file), str(output_file), workers=workers, chunk_size=2
+    )
+    assert stats["texts"] == 4
+    assert stats["failed"] == 0
+    with open(output_file, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["text"] for record in records] == ["Hello", "", "World", ""]
+    assert records[1]["glyphs"] == []
+    assert len(records[2]["glyphs"]) == 5
+
+
+@requires_uharfbuzz
+def test_shapeCorpus_keeps_rest_of_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(UharfbuzzBackend, "shape", failOn("bad"))
+    input_file = tmp_path / "corpus.txt"
+    input_file.write_text("Hello\nbad\nWorld\n", encoding="utf-8")
+    output_file = tmp_path / "out.jsonl"
+    with pytest.warns(UserWarning, match="Cannot shape text 1 'bad'"):
+        stats = shapeCorpus(renderer(), str(input_file), str(output_file))
+    assert stats["failed"] == 1
+    with open(output_file, encoding="utf-8") as f:
+        glyphs = [json.loads(line)["glyphs"] for line in f]
+    assert glyphs[1] is None
+    assert glyphs[0] and glyphs[2]
+
+
+@requires_uharfbuzz
+@pytest.mark.parametrize("exit", [False, True])
+def test_ShapingPool_keeps_rest_of_chunk(monkeypatch, exit):
+    # the workers are forked with the patched backend
+    monkeypatch.setattr(UharfbuzzBackend, "shape", failOn("bad", exit))
+    texts = ["Hello", "bad", "World", "", "abc"]
+    with ShapingPool(renderer(), workers=2, chunk_size=3, max_retries=0) as pool:
+        if pool._context.get_start_method() != "fork":
+            pytest.skip("needs the fork start method")
+        with pytest.warns(UserWarning, match="text 1 'bad'"):
+            results = list(pool.shapeMany(texts))
+    assert len(results) == len(texts)
+    assert results[1] is None
+    assert results[3] == []
+    assert all(results[i] for i in (0, 2, 4))
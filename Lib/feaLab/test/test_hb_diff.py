@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from feaLab.hb_diff import compareCorpus
+from feaLab.hb_render import HarfBuzzRenderer, getBackend
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+requires_uharfbuzz = pytest.mark.skipif(
+    not getBackend("uharfbuzz").isAvailable(), reason="uharfbuzz not installed"
+)
+
+
+def renderer(features=()):
+    hb = HarfBuzzRenderer(FONT_FILE)
+    hb.backend = "uharfbuzz"
+    hb.features = list(features)
+    return hb
+
+
+@requires_uharfbuzz
+def test_compareCorpus_svgs_keep_font_units(tmp_path):
+    texts = ["AV", "To", "AVAV", "Ta"]
+    hb_a = renderer()
+    hb_b = renderer(["-kern"])
+    output_file = str(tmp_path / "diffs.jsonl")
+    report = compareCorpus(
+        hb_a, hb_b, texts, output_file=output_file, svg_dir=str(tmp_path)
+    )
+    assert report["differing"] == len(texts)
+    assert len(report["svgs"]["positioning"]) == len(texts)
+    assert hb_a.font_size == hb_b.font_size == 0
+    with open(output_file, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    for record in records:
+        assert record["a"] == renderer().toJson(record["text"])
+        assert record["b"] == renderer(["-kern"]).toJson(record["text"])
@@ -0,0 +1,26 @@
+"""Tests of feaLab.hb_glyphrun"""
+
+import pytest
+
+from feaLab.hb_glyphrun import GlyphNameTable, GlyphRun
+
+GLYPHS = [
+    {"g": "o", "cl": 0, "dx": 0, "dy": 0, "ax": 500, "ay": 0},
+    {"g": "f", "cl": 1, "dx": 0, "dy": 0, "ax": 300, "ay": 0},
+]
+
+
+def test_equal_runs():
+    names = GlyphNameTable()
+    assert GlyphRun.fromJson(GLYPHS, names) == GlyphRun.fromJson(GLYPHS, names)
+
+
+def test_unhashable():
+    with pytest.raises(TypeError):
+        hash(GlyphRun.fromJson(GLYPHS))
+
+
+def test_fromText_empty():
+    run = GlyphRun.fromText("[]\n")
+    assert len(run) == 0
+    assert run.toJson() == []
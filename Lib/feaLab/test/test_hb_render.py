@@ -0,0 +1,87 @@
+"""Tests of feaLab.hb_render.HarfBuzzRenderer shaping"""
+
+import os.path
+
+import pytest
+
+from feaLab.hb_render import HarfBuzzRenderer, getBackend
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+requires_uharfbuzz = pytest.mark.skipif(
+    not getBackend("uharfbuzz").isAvailable(), reason="uharfbuzz not installed"
+)
+
+
+def renderer(backend="uharfbuzz"):
+    hb = HarfBuzzRenderer(FONT_FILE)
+    hb.backend = backend
+    return hb
+
+
+@requires_uharfbuzz
+def test_uharfbuzz_empty_text():
+    hb = renderer()
+    assert hb.toJson("") == []
+
+
+@requires_uharfbuzz
+def test_uharfbuzz_empty_text_with_context():
+    hb = renderer()
+    hb.text_before = "of"
+    hb.text_after = "fi"
+    hb.normalize_glyphs = True
+    assert hb.toJson("") == []
+
+
+@requires_uharfbuzz
+def test_uharfbuzz_text():
+    glyphs = renderer().toJson("office")
+    assert [glyph["cl"] for glyph in glyphs] == sorted(g["cl"] for g in glyphs)
+    assert all(glyph["ax"] > 0 for glyph in glyphs)
+
+
+@requires_uharfbuzz
+def test_uharfbuzz_shapeRun_empty_text():
+    hb = renderer()
+    run = hb._getBackend().shapeRun(hb, "")
+    assert len(run) == 0
+    assert run.toJson() == []
+    assert run.names is hb.glyphNames()
+
+
+@requires_uharfbuzz
+def test_uharfbuzz_shapeRun_text():
+    hb = renderer()
+    run = hb._getBackend().shapeRun(hb, "office")
+    assert run.toJson() == hb.toJson("office")
+
+
+def test_hb_shape_shapeRun_empty_text():
+    # does not run hb-shape
+    hb = renderer("hb-shape")
+    run = getBackend("hb-shape").shapeRun(hb, "")
+    assert len(run) == 0
+    assert run.names is hb.glyphNames()
+
+
+def svgHeight(svg):
+    return float(svg.split('height="', 1)[1].split('"', 1)[0])
+
+
+@requires_uharfbuzz
+def test_render_svg_blank_line():
+    hb = renderer()
+    hb.margin = 0
+    hb.line_space = 100
+    one = svgHeight(hb.renderSVG("of", font_size=500))
+    three = svgHeight(hb.renderSVG("of\n\nfi", font_size=500))
+    line_space = 100 * 500 / 1000
+    assert three == pytest.approx(3 * one + 2 * line_space)
+
+
+def test_shapers_cache_file_is_opt_in():
+    from feaLab import hb_render
+
+    if "FEALAB_SHAPERS_CACHE" not in os.environ:
+        assert hb_render.SHAPERS_CACHE_FILE is None
@@ -0,0 +1,48 @@
+"""Tests of feaLab.hb_scripts3"""
+
+import builtins
+import io
+import os
+
+from feaLab import hb_scripts3
+
+
+def test_fea_file_read_once(tmp_path, monkeypatch):
+    main = tmp_path / "main.fea"
+    included = tmp_path / "kern.fea"
+    main.write_text(
+        "languagesystem DFLT dflt;\ninclude(kern.fea);\nfeature liga {\n} liga;\n",
+        encoding="utf-8",
+    )
+    included.write_text(
+        "languagesystem cyrl dflt;\r\nfeature kern {\r\n} kern;\r\n", encoding="utf-8"
+    )
+    opened = []
+
+    def countingOpen(path, *args, **kwargs):
+        opened.append(os.path.basename(path))
+        return builtins.open(path, *args, **kwargs)
+
+    monkeypatch.setattr(hb_scripts3, "open", countingOpen, raising=False)
+    monkeypatch.setattr(hb_scripts3, "_includeScans", {})
+    expected = "\n".join(
+        [
+            "languagesystem DFLT dflt;",
+            "languagesystem latn dflt;",
+            "languagesystem cyrl dflt;",
+            "feature kern {",
+            "} kern;",
+            "feature liga {",
+            "} liga;",
+        ]
+    )
+    for _ in range(2):
+        output = io.StringIO()
+        hb_scripts3.updateLanguageSystemsInFeaFile(str(main), output)
+        assert output.getvalue() == expected
+        assert sorted(opened) == ["kern.fea", "main.fea"]
+    included.write_text("feature kern {\n} kern;\n", encoding="utf-8")
+    output = io.StringIO()
+    hb_scripts3.updateLanguageSystemsInFeaFile(str(main), output)
+    assert "cyrl" not in output.getvalue()
+    assert sorted(opened) == ["kern.fea", "kern.fea", "main.fea"]
@@ -0,0 +1,90 @@
+"""Tests of feaLab.hb_server"""
+
+import http.client
+import json
+import os.path
+import threading
+
+import pytest
+
+from feaLab import hb_server
+from feaLab.hb_render import getBackend
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+requires_uharfbuzz = pytest.mark.skipif(
+    not getBackend("uharfbuzz").isAvailable(), reason="uharfbuzz not installed"
+)
+
+
+@pytest.fixture
+def server():
+    server = hb_server.ThreadingHTTPServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, path, request):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        connection.request("POST", path, json.dumps(request))
+        response = connection.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+    finally:
+        connection.close()
+
+
+def test_unknown_backend_is_400(server):
+    status, content_type, data = post(
+        server, "/shape", {"font_file": FONT_FILE, "backend": "bogus", "text": "a"}
+    )
+    assert status == 400
+    assert "KeyError" in json.loads(data)["error"]
+
+
+def test_unexpected_error_is_500(server, monkeypatch):
+    def fail(request):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(hb_server, "shapeRequest", fail)
+    status, content_type, data = post(server, "/shape", {"text": "a"})
+    assert status == 500
+    assert json.loads(data) == {"error": "RuntimeError: boom"}
+
+
+@requires_uharfbuzz
+def test_shape_empty_text(server):
+    status, content_type, data = post(
+        server, "/shape", {"font_file": FONT_FILE, "backend": "uharfbuzz", "text": ""}
+    )
+    assert status == 200
+    assert json.loads(data) == {"glyphs": []}
+
+
+@requires_uharfbuzz
+def test_render_texts():
+    content_type, data = hb_server.renderRequest(
+        {
+            "font_file": FONT_FILE,
+            "backend": "uharfbuzz",
+            "texts": ["of", "fi"],
+            "use_symbols": True,
+        }
+    )
+    result = json.loads(data)
+    assert content_type == "application/json"
+    assert result["output_format"] == "svg"
+    assert len(result["images"]) == 2
+    assert all(image.startswith("<svg") for image in result["images"])
+
+
+@pytest.mark.parametrize("key", ["cache", "instrument", "_hb_shape", "toJson"])
+def test_unknown_key_is_400(server, key):
+    status, content_type, data = post(
+        server, "/shape", {"font_file": FONT_FILE, key: "x", "text": "a"}
+    )
+    assert status == 400
+    assert json.loads(data) == {"error": "ValueError: Unknown request key %s" % (key)}
@@ -0,0 +1,53 @@
+"""Tests of feaLab.hb_svg"""
+
+import os
+import re
+import shutil
+
+from feaLab import hb_svg
+
+FONT_FILE = os.path.join(os.path.dirname(__file__), "EBGarąmońd12-Regular.otf")
+
+RUN = [
+    {"g": name, "dx": 0, "dy": 0, "ax": 500, "ay": 0} for name in ("A", "V", "A")
+]
+
+
+def symbolIds(svg):
+    return re.findall(r'<path id="([^"]+)"', svg)
+
+
+def test_replaced_outlines_are_closed(tmp_path):
+    font_file = str(tmp_path / "font.otf")
+    shutil.copyfile(FONT_FILE, font_file)
+    outlines = hb_svg.getOutlines(font_file)
+    assert hb_svg.getOutlines(font_file) is outlines
+    stat = os.stat(font_file)
+    os.utime(font_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    renderer = hb_svg.SVGRenderer(FONT_FILE)
+    assert hb_svg.getOutlines(font_file) is not outlines
+    assert outlines.font.reader is None
+    hb_svg.clearOutlines()
+    assert renderer.outlines.font.reader is None
+    # the renderer looks its outlines up again
+    assert symbolIds(hb_svg.SVGRenderer(FONT_FILE, use_symbols=True).render([RUN]))
+    assert renderer.render([RUN]).count("<path ") == 3
+
+
+def test_symbol_ids_differ_between_documents(tmp_path):
+    font_file = str(tmp_path / "font.otf")
+    shutil.copyfile(FONT_FILE, font_file)
+    documents = [
+        hb_svg.SVGRenderer(FONT_FILE, font_size=size, use_symbols=True).render([RUN])
+        for size in (24, 48)
+    ]
+    documents.append(
+        hb_svg.SVGRenderer(font_file, font_size=24, use_symbols=True).render([RUN])
+    )
+    ids = [symbolIds(svg) for svg in documents]
+    assert all(len(documentIds) == 2 for documentIds in ids)
+    assert len({i for documentIds in ids for i in documentIds}) == 6
+    # the same font and size give the same symbols
+    again = hb_svg.SVGRenderer(FONT_FILE, font_size=24, use_symbols=True).render([RUN])
+    assert symbolIds(again) == ids[0]
+    assert 'xlink:href="#%s"' % (ids[0][0]) in documents[0]
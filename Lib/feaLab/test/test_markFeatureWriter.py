@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+from feaLab.writers.kernFeatureWriter import KernFeatureWriter
+from feaLab.writers.markFeatureNoWriter import MarkFeatureWriter as NoWriter
+from feaLab.writers.markFeatureWriter import MarkFeatureWriter
+
+
+def glyph(name, unicode, anchors):
+    return SimpleNamespace(
+        name=name,
+        unicode=unicode,
+        anchors=[SimpleNamespace(name=a, x=x, y=y) for a, x, y in anchors],
+    )
+
+
+FONT = [
+    glyph("a", 0x61, [("top", 250, 500)]),
+    glyph("e", 0x65, [("top", 250, 500)]),
+    glyph("acutecomb", 0x301, [("_top", 0, 500), ("top", 0, 700)]),
+]
+
+
+def test_write_defaults_as_NoWriter():
+    writer = MarkFeatureWriter(FONT, [("top", "_top")], [("top", "_top")])
+    assert writer.write() == NoWriter(FONT).write() == ""
+
+
+def test_write_ends_with_line_break():
+    writer = MarkFeatureWriter(FONT, [("top", "_top")], [("top", "_top")])
+    fea = writer.write(doMark=True, doMkmk=True)
+    assert fea.endswith("} mkmk;\n")
+    assert "feature mark {" in fea
+    assert "pos base [a e] <anchor 250 500> mark @MC_top;" in fea
+    kern = KernFeatureWriter(SimpleNamespace(kerning={("a", "e"): -10})).write()
+    assert kern.endswith("} kern;\n")
+
+
+def test_incremental_kern_as_full_rebuild():
+    import random
+
+    from feaLab.writers.fragmentCache import FragmentCache
+
+    rnd = random.Random(0)
+    glyphs = ["g%d" % (i) for i in range(30)]
+    font = SimpleNamespace(
+        kerning={},
+        groups={"public.kern1.L": glyphs[:4], "public.kern2.R": glyphs[4:8]},
+        glyphOrder=glyphs,
+    )
+    names = glyphs + list(font.groups)
+    cache = FragmentCache()
+    for step in range(200):
+        pair = (rnd.choice(names), rnd.choice(names))
+        if rnd.random() < 0.2:
+            font.kerning.pop(pair, None)
+        else:
+            font.kerning[pair] = rnd.choice([0, -10, -20, 15])
+        changed = [pair] if step % 2 else None
+        fea = KernFeatureWriter(font, cache=cache, changed=changed).write()
+        assert fea == KernFeatureWriter(font).write()
+    assert cache.hits > cache.misses
+
+
+def test_incremental_mark_as_full_rebuild():
+    import random
+
+    from feaLab.writers.fragmentCache import FragmentCache
+
+    class Font(list):
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                return {g.name: g for g in self}[key]
+            return list.__getitem__(self, key)
+
+    rnd = random.Random(0)
+    anchorNames = ["top", "_top", "bottom", "_bottom", "top_1", "top_2"]
+
+    def anchors():
+        return [
+            SimpleNamespace(name=name, x=rnd.choice((0, 100)), y=rnd.choice((0, 500)))
+            for name in rnd.sample(anchorNames, rnd.randint(0, 3))
+        ]
+
+    font = Font(
+        glyph("g%d%s" % (i, rnd.choice(("", "-deva"))), None, []) for i in range(30)
+    )
+    anchorLists = (
+        [("top", "_top"), ("bottom", "_bottom")],
+        [("top", "_top")],
+        [(("top_1", "top_2"), "_top")],
+    )
+    features = dict(doMark=True, doMkmk=True, doAbvm=True, doBlwm=True)
+    cache = FragmentCache()
+    for step in range(200):
+        g = rnd.choice(font)
+        if rnd.random() < 0.5:
+            g.anchors = anchors()
+        elif g.anchors:
+            g.anchors[0].x += 10
+        changed = [g.name] if step % 2 else None
+        writer = MarkFeatureWriter(font, *anchorLists, cache=cache, changed=changed)
+        fea = writer.write(**features)
+        assert fea == MarkFeatureWriter(font, *anchorLists).write(**features)
+    assert cache.hits > cache.misses
@@ -0,0 +1,82 @@
+"""fragmentCache.py
+
+writers.fragmentCache.FragmentCache class
+
+keeps the state of the feature writers between builds in memory, so that
+an edit regenerates only the FEA fragments whose inputs changed
+
+"""
+
+
+class FragmentCache:
+    """Cache of the indexed inputs and the generated FEA fragments of the
+    feature writers, used by the writers when passed as their `cache`
+    argument
+
+    Each writer keeps its state under its own name: the inputs it was last
+    written from, indexed so that a change can be applied to them without
+    reading all inputs again (kerning rows and columns with a signature per
+    glyph, anchors by name), and the fragments built from them. The next
+    write() with the same cache finds the changed inputs, or is told them
+    with the `changed` argument of the writer, updates the state and
+    rebuilds only the fragments that depend on them. The output is the
+    same as that of a full rebuild. If the glyph order, the kerning groups
+    or the settings of the writer change, the state is rebuilt.
+
+    The state is kept in memory, e.g. in a font editor or in a watch loop
+    that rebuilds the features after each edit.
+
+    Attributes:
+        hits (int):
+            number of writes that were updated from the state
+        misses (int):
+            number of writes that built the state from scratch
+
+    Example:
+        cache = FragmentCache()
+        fea = KernFeatureWriter(font, cache=cache).write()
+        font.kerning[('A', 'V')] = -80
+        fea = KernFeatureWriter(font, cache=cache).write()
+    """
+
+    def __init__(self):
+        """Initialize the FragmentCache() object"""
+        self.hits = 0
+        self.misses = 0
+        self._states = {}
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, name, settings):
+        """Get the state of a writer
+
+        Args:
+            name (str): the writer, e.g. 'kern'
+            settings: the settings and inputs that the state cannot be
+                updated for, compared with ==
+
+        Returns:
+            None: if there is no state for the same settings, a miss
+            object: the state, a hit
+        """
+        entry = self._states.get(name)
+        if entry is None or entry[0] != settings:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, name, settings, state):
+        """Store the state of a writer, see get()"""
+        self._states[name] = (settings, state)
+
+    def clear(self):
+        """Remove the states of all writers"""
+        self._states.clear()
+
+    def stats(self):
+        """Returns:
+        dict: the hit and miss counters and the number of writer states
+        """
+        return {"hits": self.hits, "misses": self.misses, "states": len(self)}
@@ -0,0 +1,441 @@
+import re
+
+
+class KernFeatureWriter:
+    """Generates the kern feature as one pair positioning lookup from the
+    kerning and kerning groups of the font.
+
+    Kerning between groups becomes class pair positioning. Pairs between
+    single glyphs that are not part of any kerning group are compressed
+    into classes: glyphs with identical kerning are merged, which is
+    lossless. Pairs that involve a glyph and a group are exceptions: they
+    are written as glyph pairs before the class pairs, in the order
+    glyph-glyph, glyph-group, group-glyph, so that they take precedence
+    as in the UFO kerning model. The class pairs are split into subtables
+    that stay below subtableSize bytes, and the lookup uses extension
+    subtables if it would not fit in 64 KB.
+
+    With a cache, the kerning is kept sorted by kind, and the compressible
+    pairs by row and column with a signature each. The next write with the
+    cache applies only the changed pairs to it and signs the changed rows
+    and columns again; the classes, which only depend on which signatures
+    are equal, and the FEA code are then rebuilt from the signatures.
+
+    Args:
+        font: object with `kerning` ({(first, second): value}, where first
+            and second are glyph or group names) and optionally `groups`
+            ({group name: [glyph names]}) and `glyphOrder`, e.g. a defcon Font
+        subtableSize (int, optional): max. estimated size of a class pair
+            subtable in bytes
+        cache (writers.fragmentCache.FragmentCache, optional): keep the
+            sorted kerning for the next write with the same cache
+        changed (iterable, optional): with cache, the (first, second) pairs
+            that were set or deleted since the last write with the cache,
+            otherwise they are found by comparing all pairs
+
+    Attributes:
+        rebuilt (int): number of kerning rows and columns signed by the
+            last write()
+    """
+
+    subtableSize = 0x2000
+
+    def __init__(self, font, subtableSize=None, cache=None, changed=None):
+        self.font = font
+        if subtableSize:
+            self.subtableSize = subtableSize
+        self.cache = cache
+        self.changed = changed
+        self.rebuilt = 0
+        self._glyphOrder = list(getattr(font, "glyphOrder", None) or [])
+        self._glyphIndex = {name: i for i, name in enumerate(self._glyphOrder)}
+
+    def _sortKey(self, name):
+        return (self._glyphIndex.get(name, len(self._glyphIndex)), name)
+
+    def _className(self, name, side, names):
+        """FEA class name for a kerning group or a generated class"""
+        base = re.sub(r"^public\.kern[12]\.", "", name)
+        base = re.sub(r"[^A-Za-z0-9_.\-]", "_", base)
+        base = "kern%d.%s" % (side, base)
+        className = base[:62]
+        i = 1
+        while className in names:
+            suffix = "_%d" % (i)
+            className = base[: 62 - len(suffix)] + suffix
+            i += 1
+        names.add(className)
+        return className
+
+    def _signature(self, pool, values):
+        """The kerning row or column as a set, the one in pool if equal"""
+        signature = frozenset(values.items())
+        return pool.setdefault(signature, signature)
+
+    def _classify(self, kerning, groups):
+        """Sort the kerning pairs by kind, and index the pairs between single
+        glyphs that can be merged into classes by row and column
+
+        Returns:
+            dict: the state of the writer
+        """
+        previous = dict(kerning)
+        known = set(self._glyphIndex) | set(groups)
+        if self._glyphIndex:
+            kerning = {
+                pair: value
+                for pair, value in kerning.items()
+                if pair[0] in known and pair[1] in known
+            }
+
+        glyphGlyph = {}
+        glyphGroup = {}
+        groupGlyph = {}
+        groupGroup = {}
+        for (first, second), value in kerning.items():
+            if first in groups:
+                target = groupGroup if second in groups else groupGlyph
+            else:
+                target = glyphGroup if second in groups else glyphGlyph
+            target[(first, second)] = int(round(value))
+
+        # number of pairs per group or glyph on each side, they decide which
+        # glyph pairs are exceptions
+        counts = {"left": {}, "right": {}, "first": {}, "second": {}}
+        for pairs, sides in (
+            (groupGroup, ("left", "right")),
+            (groupGlyph, ("left", "second")),
+            (glyphGroup, ("first", "right")),
+        ):
+            for pair in pairs:
+                for side, name in zip(sides, pair):
+                    counts[side][name] = counts[side].get(name, 0) + 1
+
+        # glyph pairs are merged into classes unless a glyph takes part in
+        # group kerning on the same side, then they stay exceptions
+        grouped1 = {g for name in counts["left"] for g in groups[name]}
+        grouped1 |= set(counts["first"])
+        grouped2 = {g for name in counts["right"] for g in groups[name]}
+        grouped2 |= set(counts["second"])
+        exceptions = {}
+        rows = {}
+        columns = {}
+        for (first, second), value in glyphGlyph.items():
+            if first in grouped1 or second in grouped2:
+                exceptions[(first, second)] = value
+            elif value:
+                rows.setdefault(first, {})[second] = value
+                columns.setdefault(second, {})[first] = value
+        self.rebuilt = len(rows) + len(columns)
+        # equal signatures are the same object, so that comparing them in
+        # _compress() does not compare their items
+        pool = {}
+        return {
+            "kerning": previous,
+            "known": known,
+            "glyphGroup": glyphGroup,
+            "groupGlyph": groupGlyph,
+            "groupGroup": groupGroup,
+            "counts": counts,
+            "grouped1": grouped1,
+            "grouped2": grouped2,
+            "exceptions": exceptions,
+            "rows": rows,
+            "columns": columns,
+            "pool": pool,
+            "rowSignatures": {
+                first: self._signature(pool, row) for first, row in rows.items()
+            },
+            "columnSignatures": {
+                second: self._signature(pool, column)
+                for second, column in columns.items()
+            },
+        }
+
+    def _update(self, state, kerning, groups):
+        """Apply the changed kerning pairs to the state
+
+        Returns:
+            bool: False if the change moves glyph pairs between exceptions
+                and classes, then the state must be built again
+        """
+        previous = state["kerning"]
+        if self.changed is None:
+            changed = {pair for pair, value in kerning.items() ^ previous.items()}
+        else:
+            changed = set(self.changed)
+        known = state["known"]
+        counts = state["counts"]
+        rows = state["rows"]
+        columns = state["columns"]
+        pool = state["pool"]
+        changedRows = set()
+        changedColumns = set()
+        for pair in changed:
+            first, second = pair
+            value = kerning.get(pair)
+            if value is None:
+                previous.pop(pair, None)
+            else:
+                previous[pair] = value
+                if self._glyphIndex and not (first in known and second in known):
+                    value = None
+                else:
+                    value = int(round(value))
+            if first in groups or second in groups:
+                if first not in groups:
+                    kind, sides = "glyphGroup", ("first", "right")
+                elif second in groups:
+                    kind, sides = "groupGroup", ("left", "right")
+                else:
+                    kind, sides = "groupGlyph", ("left", "second")
+                pairs = state[kind]
+                before = pair in pairs
+                if value is None:
+                    pairs.pop(pair, None)
+                else:
+                    pairs[pair] = value
+                if before != (value is not None):
+                    for side, name in zip(sides, pair):
+                        count = counts[side].get(name, 0) + (-1 if before else 1)
+                        if count in (0, 1):
+                            # a group or glyph starts or stops taking part
+                            return False
+                        counts[side][name] = count
+                continue
+            if first in state["grouped1"] or second in state["grouped2"]:
+                if value is None:
+                    state["exceptions"].pop(pair, None)
+                else:
+                    state["exceptions"][pair] = value
+                continue
+            if value:
+                rows.setdefault(first, {})[second] = value
+                columns.setdefault(second, {})[first] = value
+            elif first in rows and second in rows[first]:
+                del rows[first][second]
+                del columns[second][first]
+            else:
+                continue
+            changedRows.add(first)
+            changedColumns.add(second)
+        for names, index, signatures in (
+            (changedRows, rows, state["rowSignatures"]),
+            (changedColumns, columns, state["columnSignatures"]),
+        ):
+            for name in names:
+                if index[name]:
+                    signatures[name] = self._signature(pool, index[name])
+                else:
+                    del index[name]
+                    signatures.pop(name, None)
+        if len(pool) > 2 * (len(rows) + len(columns)):
+            live = list(state["rowSignatures"].values())
+            live += state["columnSignatures"].values()
+            state["pool"] = {signature: signature for signature in live}
+        self.rebuilt = len(changedRows) + len(changedColumns)
+        return True
+
+    def _compress(self, state):
+        """Merge glyphs with identical kerning into classes, losslessly.
+        Glyphs with the same row signature have the same kerning with each
+        right class, so the classes follow from the signatures.
+
+        Args:
+            state (dict): the state with the rows and columns, see _classify()
+
+        Returns:
+            tuple: (left classes, right classes, class pairs), where the
+                classes are lists of glyph lists and the class pairs are
+                (left class index, right class index, value) tuples
+        """
+        columnSignatures = state["columnSignatures"]
+        rightClasses = []
+        rightClassOf = {}
+        signatures = {}
+        for second in sorted(columnSignatures, key=self._sortKey):
+            i = signatures.get(columnSignatures[second])
+            if i is None:
+                i = signatures[columnSignatures[second]] = len(rightClasses)
+                rightClasses.append([])
+            rightClasses[i].append(second)
+            rightClassOf[second] = i
+        rowSignatures = state["rowSignatures"]
+        leftClasses = []
+        leftRows = []
+        signatures = {}
+        for first in sorted(rowSignatures, key=self._sortKey):
+            i = signatures.get(rowSignatures[first])
+            if i is None:
+                i = signatures[rowSignatures[first]] = len(leftClasses)
+                leftClasses.append([])
+                row = {
+                    rightClassOf[second]: value
+                    for second, value in state["rows"][first].items()
+                }
+                leftRows.append(tuple(sorted(row.items())))
+            leftClasses[i].append(first)
+        classPairs = [
+            (i, j, value) for i, row in enumerate(leftRows) for j, value in row
+        ]
+        return leftClasses, rightClasses, classPairs
+
+    def _subtables(self, classPairs, leftClasses, rightClasses):
+        """Split class pairs into subtables of at most self.subtableSize
+        estimated bytes. All pairs of a left class go to the same subtable.
+
+        Returns:
+            list: (pairs, estimated size) per subtable, where pairs is a
+                list of (left class, right class, value)
+        """
+        rows = {}
+        for left, right, value in classPairs:
+            rows.setdefault(left, []).append((right, value))
+        order = sorted(rows, key=lambda left: tuple(sorted(r for r, v in rows[left])))
+        subtables = []
+        current = []
+        currentSize = 0
+        lefts = rights = glyphs1 = glyphs2 = 0
+        usedRights = set()
+        for left in order:
+            for attempt in range(2):
+                newRights = {r for r, v in rows[left]} - usedRights
+                newGlyphs2 = sum(len(rightClasses[r]) for r in newRights)
+                # header, coverage and class defs, class matrix
+                size = (
+                    16
+                    + 4 * (glyphs1 + len(leftClasses[left]))
+                    + 2 * (glyphs2 + newGlyphs2)
+                    + 2 * (lefts + 2) * (rights + len(newRights) + 1)
+                )
+                if not current or size <= self.subtableSize:
+                    break
+                subtables.append((current, currentSize))
+                current = []
+                lefts = rights = glyphs1 = glyphs2 = 0
+                usedRights = set()
+            current.extend((left, right, value) for right, value in rows[left])
+            currentSize = size
+            lefts += 1
+            rights += len(newRights)
+            glyphs1 += len(leftClasses[left])
+            glyphs2 += newGlyphs2
+            usedRights |= newRights
+        if current:
+            subtables.append((current, currentSize))
+        return subtables
+
+    def write(self, linesep="\n"):
+        """Returns:
+        str: FEA code with the kerning class definitions, the kern_pairs
+            lookup and the kern feature, or an empty string if the font
+            has no kerning
+        """
+        kerning = getattr(self.font, "kerning", None) or {}
+        groups = getattr(self.font, "groups", None) or {}
+        groups = {name: list(glyphs) for name, glyphs in groups.items()}
+        if self._glyphIndex:
+            groups = {
+                name: [g for g in glyphs if g in self._glyphIndex]
+                for name, glyphs in groups.items()
+            }
+            groups = {name: glyphs for name, glyphs in groups.items() if glyphs}
+        if self.cache is None:
+            return self._write(self._classify(kerning, groups), groups, linesep)
+        settings = (self._glyphOrder, self.subtableSize, groups)
+        state = self.cache.get("kern", settings)
+        if state is None or not self._update(state, kerning, groups):
+            state = self._classify(kerning, groups)
+            self.cache.set("kern", settings, state)
+        return self._write(state, groups, linesep)
+
+    def _write(self, state, groups, linesep):
+        exceptions = state["exceptions"]
+        glyphGroup = state["glyphGroup"]
+        groupGlyph = state["groupGlyph"]
+        leftGroups = set(state["counts"]["left"])
+        rightGroups = set(state["counts"]["right"])
+        groupGroup = {
+            pair: value for pair, value in state["groupGroup"].items() if value
+        }
+        if not (exceptions or state["rows"] or glyphGroup or groupGlyph or groupGroup):
+            return ""
+
+        names = set()
+        classLines = []
+
+        def addClass(glyphs, side, name):
+            glyphs = sorted(glyphs, key=self._sortKey)
+            className = self._className(name, side, names)
+            classLines.append("@%s = [%s];" % (className, " ".join(glyphs)))
+            return className
+
+        groupClasses = {}
+        for name in sorted(leftGroups, key=self._sortKey):
+            groupClasses[(1, name)] = addClass(groups[name], 1, name)
+        for name in sorted(rightGroups, key=self._sortKey):
+            groupClasses[(2, name)] = addClass(groups[name], 2, name)
+
+        leftClasses, rightClasses, classPairs = self._compress(state)
+        leftNames = [addClass(glyphs, 1, glyphs[0]) for glyphs in leftClasses]
+        rightNames = [addClass(glyphs, 2, glyphs[0]) for glyphs in rightClasses]
+        for (first, second), value in groupGroup.items():
+            for name, side, classes, classNames in (
+                (first, 1, leftClasses, leftNames),
+                (second, 2, rightClasses, rightNames),
+            ):
+                if groupClasses.get((side, name)) not in classNames:
+                    classes.append(groups[name])
+                    classNames.append(groupClasses[(side, name)])
+        leftIndex = {name: i for i, name in enumerate(leftNames)}
+        rightIndex = {name: i for i, name in enumerate(rightNames)}
+        classPairs.extend(
+            (
+                leftIndex[groupClasses[(1, first)]],
+                rightIndex[groupClasses[(2, second)]],
+                value,
+            )
+            for (first, second), value in groupGroup.items()
+        )
+
+        def pairKey(item):
+            (first, second), value = item
+            return (self._sortKey(first), self._sortKey(second))
+
+        lookupLines = []
+        for (first, second), value in sorted(exceptions.items(), key=pairKey):
+            lookupLines.append("    pos %s %s %d;" % (first, second, value))
+        for (first, second), value in sorted(glyphGroup.items(), key=pairKey):
+            lookupLines.append(
+                "    enum pos %s @%s %d;" % (first, groupClasses[(2, second)], value)
+            )
+        for (first, second), value in sorted(groupGlyph.items(), key=pairKey):
+            lookupLines.append(
+                "    enum pos @%s %s %d;" % (groupClasses[(1, first)], second, value)
+            )
+        size = 6 * (
+            len(exceptions)
+            + sum(len(groups[second]) for first, second in glyphGroup)
+            + sum(len(groups[first]) for first, second in groupGlyph)
+        )
+        subtables = self._subtables(classPairs, leftClasses, rightClasses)
+        for i, (pairs, subtableSize) in enumerate(subtables):
+            if i:
+                lookupLines.append("    subtable;")
+            for left, right, value in pairs:
+                lookupLines.append(
+                    "    pos @%s @%s %d;" % (leftNames[left], rightNames[right], value)
+                )
+            size += subtableSize
+
+        lines = classLines + [""]
+        lines.append(
+            "lookup kern_pairs%s {" % (" useExtension" if size > 0xFFFF else "")
+        )
+        lines.extend(lookupLines)
+        lines.append("} kern_pairs;")
+        lines.append("")
+        lines.append("feature kern {")
+        lines.append("    lookup kern_pairs;")
+        lines.append("} kern;")
+        return linesep.join(lines) + linesep
@@ -0,0 +1,510 @@
+import bisect
+
+INDIC_SCRIPTS = (
+    "Beng",
+    "Deva",
+    "Gujr",
+    "Guru",
+    "Knda",
+    "Mlym",
+    "Orya",
+    "Sinh",
+    "Taml",
+    "Telu",
+)
+"""ISO 15924 tags of the scripts whose marks go to the abvm and blwm features"""
+
+ABOVE_ANCHOR_PREFIXES = ("top", "above")
+BELOW_ANCHOR_PREFIXES = ("bottom", "below")
+
+
+class MarkFeatureWriter:
+    """Generates the mark, mkmk, abvm and blwm features from the anchors of
+    the glyphs of the font.
+
+    The anchors of all glyphs are indexed once by anchor name. The marks of
+    each accent anchor form one mark class, with one markClass statement
+    per anchor position, and bases with the same anchor position share one
+    pos statement, so the FEA code and the GPOS table stay small.
+
+    Bases of the INDIC_SCRIPTS (by Unicode value, or by a glyph
+    name suffix like '-deva' for unencoded glyphs) go to abvm for anchors
+    named like ABOVE_ANCHOR_PREFIXES and to blwm for anchors named like
+    BELOW_ANCHOR_PREFIXES, all others to mark.
+
+    Args:
+        font: iterable of glyphs with `name`, `anchors` (with `name`, `x`,
+            `y`) and `unicodes` or `unicode`, optionally with `glyphOrder`,
+            e.g. a defcon Font
+        anchorList (list): (base anchor, accent anchor) pairs for mark,
+            e.g. [('top', '_top'), ('bottom', '_bottom')]
+        mkmkAnchorList (list): (base anchor, accent anchor) pairs for mkmk,
+            where the bases are marks, e.g. [('top', '_top')]
+        ligaAnchorList (list): ((component anchors, ...), accent anchor)
+            pairs for mark to ligature, e.g. [(('top_1', 'top_2'), '_top')]
+        cache (writers.fragmentCache.FragmentCache, optional): keep the
+            anchor index and the FEA code of each mark class and lookup for
+            the next write with the same cache, which then only indexes the
+            glyphs that changed again and rebuilds the mark classes and
+            lookups of the anchors that changed
+        changed (iterable, optional): with cache, the names of the glyphs
+            whose anchors or unicodes changed, or that were added or
+            removed, since the last write with the cache. They are read as
+            font[name]. Otherwise the changed glyphs are found by comparing
+            the anchors and unicodes of all glyphs
+
+    Attributes:
+        rebuilt (int): number of mark classes and lookups built by the last
+            write()
+    """
+
+    _STATE = (
+        "_accentNames",
+        "_anchors",
+        "_marks",
+        "_indic",
+        "_glyphs",
+        "_order",
+        "_ligatures",
+        "_bases",
+        "_groups",
+        "_fragments",
+    )
+    """Attributes kept in the cache between writes"""
+
+    def __init__(
+        self,
+        font,
+        anchorList=(),
+        mkmkAnchorList=(),
+        ligaAnchorList=(),
+        cache=None,
+        changed=None,
+    ):
+        self.font = font
+        self.anchorList = anchorList
+        self.mkmkAnchorList = mkmkAnchorList
+        self.ligaAnchorList = ligaAnchorList
+        self.cache = cache
+        self.changed = changed
+        self.rebuilt = 0
+        self._anchors = None
+        self._fragments = None
+
+    def _glyphInfo(self, glyph):
+        """The anchors and unicodes of a glyph, as compared between writes
+
+        Returns:
+            tuple: ((anchor name, x, y), ...), (unicodes, ...)
+        """
+        anchors = tuple(
+            [
+                (anchor.name, int(round(anchor.x)), int(round(anchor.y)))
+                for anchor in glyph.anchors
+                if anchor.name is not None
+            ]
+        )
+        unicodes = getattr(glyph, "unicodes", None)
+        if unicodes is None:
+            unicode = getattr(glyph, "unicode", None)
+            unicodes = [unicode] if unicode is not None else []
+        return anchors, tuple(unicodes)
+
+    def _indicGlyphs(self, glyphs):
+        """Returns:
+        set: the names of the glyphs of the INDIC_SCRIPTS in glyphs, a
+            {name: _glyphInfo()} dict
+        """
+        from feaLab.hb_scripts3 import charScript, isoScript
+
+        indic = set()
+        for name, (anchors, unicodes) in glyphs.items():
+            if unicodes:
+                if charScript(unicodes[0]) in INDIC_SCRIPTS:
+                    indic.add(name)
+            else:
+                suffix = name.replace("-", ".").rsplit(".", 1)
+                if len(suffix) == 2 and isoScript(suffix[1]) in INDIC_SCRIPTS:
+                    indic.add(name)
+        return indic
+
+    def _addGlyphs(self, glyphs):
+        """Add the anchors of the glyphs, a {name: _glyphInfo()} dict, to
+        the index"""
+        index = self._anchors
+        accentNames = self._accentNames
+        for name, info in glyphs.items():
+            self._glyphs[name] = info
+            for anchorName, x, y in info[0]:
+                index.setdefault(anchorName, {})[name] = (x, y)
+                if anchorName in accentNames:
+                    self._marks.add(name)
+        self._indic |= self._indicGlyphs(glyphs)
+
+    def _removeGlyph(self, name):
+        """Remove the anchors of a glyph from the index"""
+        anchors, unicodes = self._glyphs.pop(name)
+        for anchorName, x, y in anchors:
+            self._anchors[anchorName].pop(name, None)
+        self._marks.discard(name)
+        self._indic.discard(name)
+
+    def _indexAnchors(self):
+        """Index the anchors of all glyphs by anchor name, in one pass"""
+        self._accentNames = {accent for base, accent in self.anchorList}
+        self._accentNames |= {accent for base, accent in self.mkmkAnchorList}
+        self._accentNames |= {accent for bases, accent in self.ligaAnchorList}
+        self._anchors = {}
+        self._marks = set()
+        self._indic = set()
+        self._glyphs = {}
+        self._bases = {}
+        self._groups = {}
+        glyphs = {glyph.name: self._glyphInfo(glyph) for glyph in self.font}
+        self._addGlyphs(glyphs)
+        glyphOrder = getattr(self.font, "glyphOrder", None) or glyphs
+        self._order = {name: i for i, name in enumerate(glyphOrder)}
+
+    def _updateAnchors(self, state):
+        """Index the changed glyphs again and drop the fragments that use
+        their anchors
+
+        Returns:
+            bool: False if glyphs were added or removed, then the anchors
+                must be indexed again
+        """
+        for key, value in state.items():
+            setattr(self, key, value)
+        if self.changed is None:
+            glyphs = {glyph.name: glyph for glyph in self.font}
+            if glyphs.keys() != self._glyphs.keys():
+                return False
+            if not getattr(self.font, "glyphOrder", None):
+                if list(glyphs) != list(self._order):
+                    return False
+            changed = {}
+            for name, glyph in glyphs.items():
+                info = self._glyphInfo(glyph)
+                if info != self._glyphs.get(name):
+                    changed[name] = info
+        else:
+            changed = {}
+            for name in set(self.changed):
+                try:
+                    changed[name] = self._glyphInfo(self.font[name])
+                except KeyError:
+                    return False
+        if not set(changed) <= set(self._glyphs):
+            return False
+        marks = set(self._marks)
+        indic = set(self._indic)
+        moved = {}
+        for name, info in changed.items():
+            old = {anchorName: (x, y) for anchorName, x, y in self._glyphs[name][0]}
+            new = {anchorName: (x, y) for anchorName, x, y in info[0]}
+            for anchorName in set(old) | set(new):
+                if old.get(anchorName) != new.get(anchorName):
+                    moved.setdefault(anchorName, []).append(
+                        (name, old.get(anchorName), new.get(anchorName))
+                    )
+            self._removeGlyph(name)
+        self._addGlyphs(changed)
+        if marks != self._marks or indic != self._indic:
+            # the glyphs changed between bases and marks
+            self._groups.clear()
+            self._fragments.clear()
+            return True
+        # move the glyphs between the position groups of their anchors
+        for (anchorName, bases), groups in self._groups.items():
+            glyphs = self._bases[bases] if bases else None
+            for name, old, new in moved.get(anchorName, ()):
+                if glyphs is not None and name not in glyphs:
+                    continue
+                rank = self._rank(name)
+                if old is not None:
+                    ranks = groups[old]
+                    del ranks[bisect.bisect_left(ranks, rank)]
+                    if not ranks:
+                        del groups[old]
+                if new is not None:
+                    bisect.insort(groups.setdefault(new, []), rank)
+        for key, (anchorNames, lines) in list(self._fragments.items()):
+            if not anchorNames.isdisjoint(moved):
+                del self._fragments[key]
+        return True
+
+    def _fragment(self, key, anchorNames, build):
+        """build(), or the cached result if the anchors named anchorNames
+        did not change since it was built"""
+        if self._fragments is not None and key in self._fragments:
+            return self._fragments[key][1]
+        self.rebuilt += 1
+        lines = build()
+        if self._fragments is not None:
+            self._fragments[key] = (set(anchorNames), lines)
+        return lines
+
+    def _rank(self, name):
+        return (self._order.get(name, 0), name)
+
+    def _sorted(self, names):
+        return sorted(names, key=self._rank)
+
+    def _positions(self, anchorName, bases=None):
+        """Group the glyphs with the anchor by anchor position, in glyph
+        order. The groups are kept, see _updateAnchors()
+
+        Args:
+            anchorName (str): name of the anchor
+            bases (str, optional): only the glyphs of self._bases[bases]
+
+        Returns:
+            list: (position, [names]) tuples
+        """
+        groups = self._groups.get((anchorName, bases))
+        if groups is None:
+            glyphs = self._bases[bases] if bases else None
+            groups = self._groups[(anchorName, bases)] = {}
+            for name, position in self._anchors.get(anchorName, {}).items():
+                if glyphs is None or name in glyphs:
+                    groups.setdefault(position, []).append(self._rank(name))
+            for ranks in groups.values():
+                ranks.sort()
+        return [
+            (position, [name for order, name in ranks])
+            for position, ranks in sorted(groups.items(), key=lambda group: group[1][0])
+        ]
+
+    def _className(self, accentAnchorName):
+        return "MC_" + accentAnchorName.lstrip("_")
+
+    def _markClasses(self, accentAnchorNames):
+        """markClass statements, one per accent anchor and anchor position"""
+        lines = []
+        for accent in accentAnchorNames:
+            lines += self._fragment(
+                ("markClass", accent), [accent], lambda: self._markClass(accent)
+            )
+        return lines
+
+    def _markClass(self, accentAnchorName):
+        return [
+            "markClass [%s] <anchor %d %d> @%s;"
+            % (
+                " ".join(glyphs),
+                position[0],
+                position[1],
+                self._className(accentAnchorName),
+            )
+            for position, glyphs in self._positions(accentAnchorName)
+        ]
+
+    def _baseLookup(self, lookupName, anchorPair, bases, kind):
+        """Lookup with one pos statement per base anchor position
+
+        Args:
+            lookupName (str): name of the lookup
+            anchorPair (tuple): (base anchor, accent anchor)
+            bases (str): the glyphs that can be bases, a key of self._bases
+            kind (str): 'base' or 'mark'
+        """
+        return self._fragment(
+            (lookupName, bases),
+            anchorPair,
+            lambda: self._formatBaseLookup(lookupName, anchorPair, bases, kind),
+        )
+
+    def _formatBaseLookup(self, lookupName, anchorPair, bases, kind):
+        anchorName, accentName = anchorPair
+        if not self._anchors.get(accentName):
+            return []
+        groups = self._positions(anchorName, bases)
+        if not groups:
+            return []
+        lines = ["lookup %s {" % (lookupName)]
+        if kind == "mark":
+            # only the marks of the class can come between base and mark
+            lines.append(
+                "    lookupflag UseMarkFilteringSet [%s];"
+                % (" ".join(self._sorted(self._anchors[accentName])))
+            )
+        for position, names in groups:
+            lines.append(
+                "    pos %s %s <anchor %d %d> mark @%s;"
+                % (
+                    kind,
+                    names[0] if len(names) == 1 else "[%s]" % (" ".join(names)),
+                    position[0],
+                    position[1],
+                    self._className(accentName),
+                )
+            )
+        lines.append("} %s;" % (lookupName))
+        return lines
+
+    def _ligatureLookup(self, lookupName, anchorPair, ligatures):
+        """Mark to ligature lookup, one pos statement per ligature"""
+        componentNames, accentName = anchorPair
+        return self._fragment(
+            lookupName,
+            list(componentNames) + [accentName],
+            lambda: self._formatLigatureLookup(
+                lookupName, componentNames, accentName, ligatures
+            ),
+        )
+
+    def _formatLigatureLookup(self, lookupName, componentNames, accentName, ligatures):
+        if not self._anchors.get(accentName):
+            return []
+        names = set()
+        for anchorName in componentNames:
+            names |= set(self._anchors.get(anchorName, {})) & ligatures
+        if not names:
+            return []
+        glyphs = [
+            (name, [self._anchors.get(a, {}).get(name) for a in componentNames])
+            for name in self._sorted(names)
+        ]
+        lines = ["lookup %s {" % (lookupName)]
+        for name, positions in glyphs:
+            components = []
+            for position in positions:
+                if position is None:
+                    components.append("<anchor NULL>")
+                else:
+                    components.append(
+                        "<anchor %d %d> mark @%s"
+                        % (position[0], position[1], self._className(accentName))
+                    )
+            lines.append(
+                "    pos ligature %s %s;" % (name, " ligComponent ".join(components))
+            )
+        lines.append("} %s;" % (lookupName))
+        return lines
+
+    def _feature(self, tag, lookups):
+        lines = []
+        names = []
+        for lookupLines in lookups:
+            if lookupLines:
+                lines.extend(lookupLines)
+                names.append(lookupLines[0].split()[1])
+        if not names:
+            return []
+        lines.append("")
+        lines.append("feature %s {" % (tag))
+        lines.extend("    lookup %s;" % (name) for name in names)
+        lines.append("} %s;" % (tag))
+        lines.append("")
+        return lines
+
+    def write(self, doMark=False, doMkmk=False, doAbvm=False, doBlwm=False):
+        """Write the requested features, none by default as in
+        markFeatureNoWriter.MarkFeatureWriter
+
+        Args:
+            doMark (bool, optional): write the mark feature
+            doMkmk (bool, optional): write the mkmk feature
+            doAbvm (bool, optional): write the abvm feature
+            doBlwm (bool, optional): write the blwm feature
+
+        Returns:
+            str: FEA code with the mark classes and the requested features,
+                or an empty string if there are no anchors to attach
+        """
+        self.rebuilt = 0
+        if self.cache is not None:
+            settings = (
+                list(self.anchorList),
+                list(self.mkmkAnchorList),
+                list(self.ligaAnchorList),
+                list(getattr(self.font, "glyphOrder", None) or []),
+            )
+            state = self.cache.get("mark", settings)
+            if state is None or not self._updateAnchors(state):
+                self._indexAnchors()
+                self._ligatures = set()
+                self._fragments = {}
+                state = {key: getattr(self, key) for key in self._STATE}
+                self.cache.set("mark", settings, state)
+        elif self._anchors is None:
+            self._indexAnchors()
+        allGlyphs = set(self._order)
+        bases = allGlyphs - self._marks
+        indicBases = bases & self._indic
+        otherBases = bases - self._indic
+        ligatures = set()
+        for componentNames, accent in self.ligaAnchorList:
+            for anchorName in componentNames:
+                ligatures |= set(self._anchors.get(anchorName, {}))
+        ligatures -= self._marks
+        bases -= ligatures
+        otherBases -= ligatures
+        indicBases -= ligatures
+        if self._fragments is not None and ligatures != self._ligatures:
+            # the glyphs changed between bases and ligatures
+            self._groups.clear()
+            self._fragments.clear()
+            self._ligatures.clear()
+            self._ligatures.update(ligatures)
+        self._bases.update(
+            bases=bases, otherBases=otherBases, indicBases=indicBases, marks=self._marks
+        )
+
+        def position(anchorName):
+            name = anchorName.lower()
+            if name.startswith(ABOVE_ANCHOR_PREFIXES):
+                return "above"
+            if name.startswith(BELOW_ANCHOR_PREFIXES):
+                return "below"
+            return None
+
+        lookups = {"mark": [], "abvm": [], "blwm": []}
+        indicFeatures = {"above": "abvm" if doAbvm else None}
+        indicFeatures["below"] = "blwm" if doBlwm else None
+        for i, anchorPair in enumerate(self.anchorList):
+            tag = indicFeatures.get(position(anchorPair[0]))
+            if tag is None:
+                lookups["mark"].append(
+                    self._baseLookup("mark_%d" % (i + 1), anchorPair, "bases", "base")
+                )
+                continue
+            lookups["mark"].append(
+                self._baseLookup(
+                    "mark_%d" % (i + 1), anchorPair, "otherBases", "base"
+                )
+            )
+            lookups[tag].append(
+                self._baseLookup(
+                    "%s_%d" % (tag, i + 1), anchorPair, "indicBases", "base"
+                )
+            )
+        for i, anchorPair in enumerate(self.ligaAnchorList):
+            lookups["mark"].append(
+                self._ligatureLookup("mark_liga_%d" % (i + 1), anchorPair, ligatures)
+            )
+        lookups["mkmk"] = [
+            self._baseLookup("mkmk_%d" % (i + 1), anchorPair, "marks", "mark")
+            for i, anchorPair in enumerate(self.mkmkAnchorList)
+        ]
+
+        lines = []
+        for tag, enabled in (
+            ("mark", doMark),
+            ("mkmk", doMkmk),
+            ("abvm", doAbvm),
+            ("blwm", doBlwm),
+        ):
+            if enabled:
+                lines += self._feature(tag, lookups[tag])
+        if not lines:
+            return ""
+        accents = []
+        pairs = list(self.anchorList) if doMark or doAbvm or doBlwm else []
+        pairs += list(self.ligaAnchorList) if doMark else []
+        pairs += list(self.mkmkAnchorList) if doMkmk else []
+        for base, accent in pairs:
+            if accent not in accents:
+                accents.append(accent)
+        # without the blank line after the last feature
+        return "\n".join(self._markClasses(accents) + [""] + lines[:-1]) + "\n"
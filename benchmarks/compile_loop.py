@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Benchmark of the edit, compile, shape loop with feaLab.hb_compile
+
+Builds FEA code for the bundled EB Garamond test font (smcp, liga, mark
+and its kerning, written by KernFeatureWriter), and measures the time from
+an edit to the shaped result:
+1. full: fontTools.feaLib compile of all the FEA code into a fresh copy
+   of the font, save, and shape with a new HarfBuzz font
+2. incremental: IncrementalCompiler.compile() and shape with the
+   in-memory font
+
+for a sequence of edits. The tables of both are compared, so the
+benchmark fails if the incremental compile differs from the full one.
+
+Usage:
+    python benchmarks/compile_loop.py
+"""
+import io
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import uharfbuzz
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "Lib")
+)
+from feaLab.hb_compile import LAYOUT_TABLES, IncrementalCompiler  # noqa: E402
+from feaLab.writers.kernFeatureWriter import KernFeatureWriter  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from kern_writer import FONT_FILE, flatKerning  # noqa: E402
+
+TEXT = "fiAVTo á Office"
+KERN_EDIT = "    pos A V -300;\n    pos "
+
+
+def baseFea(font):
+    glyphOrder = font.getGlyphOrder()
+    glyphs = set(glyphOrder)
+    lowercase = [g for g in glyphOrder if g + ".sc" in glyphs]
+    kerning = SimpleNamespace(
+        kerning=flatKerning(font), groups={}, glyphOrder=glyphOrder
+    )
+    return "\n".join(
+        [
+            "languagesystem DFLT dflt;",
+            "languagesystem latn dflt;",
+            "@lc = [%s];" % (" ".join(lowercase)),
+            "@sc = [%s];" % (" ".join(g + ".sc" for g in lowercase)),
+            "markClass [acute grave] <anchor 0 500> @top;",
+            "lookup smcp_sub { sub @lc by @sc; } smcp_sub;",
+            "feature smcp { lookup smcp_sub; } smcp;",
+            "feature liga { sub f i by f_i; sub f l by f_l; } liga;",
+            "feature mark { pos base [a e o] <anchor 250 450> mark @top; } mark;",
+            KernFeatureWriter(kerning).write(),
+        ]
+    )
+
+
+def shape(hbFont):
+    buf = uharfbuzz.Buffer()
+    buf.add_str(TEXT)
+    buf.guess_segment_properties()
+    uharfbuzz.shape(hbFont, buf, {})
+    return [
+        (info.codepoint, pos.x_advance)
+        for info, pos in zip(buf.glyph_infos, buf.glyph_positions)
+    ]
+
+
+def fullLoop(fea):
+    start = time.time()
+    font = TTFont(FONT_FILE)
+    addOpenTypeFeaturesFromString(font, fea, tables=list(LAYOUT_TABLES))
+    data = io.BytesIO()
+    font.save(data)
+    hbFont = uharfbuzz.Font(uharfbuzz.Face(data.getvalue()))
+    glyphs = shape(hbFont)
+    seconds = time.time() - start
+    font = TTFont(io.BytesIO(data.getvalue()))
+    tables = {
+        tag: font[tag].compile(font) if tag in font else None
+        for tag in LAYOUT_TABLES
+    }
+    return glyphs, tables, seconds
+
+
+def incrementalLoop(compiler, fea):
+    start = time.time()
+    stats = compiler.compile(fea)
+    glyphs = shape(compiler.getHbFont())
+    seconds = time.time() - start
+    tables = {tag: compiler._tableData.get(tag) for tag in LAYOUT_TABLES}
+    return glyphs, tables, seconds, stats
+
+
+def main():
+    font = TTFont(FONT_FILE)
+    fea = baseFea(font)
+    edits = [
+        ("initial", lambda fea: fea),
+        ("unchanged", lambda fea: fea),
+        ("kern value", lambda fea: fea.replace("    pos ", KERN_EDIT, 1)),
+        ("liga rule", lambda fea: fea.replace(" sub f l by f_l;", "", 1)),
+        ("mark anchor", lambda fea: fea.replace("anchor 250 ", "anchor 260 ")),
+        ("glyph class", lambda fea: fea.replace("@lc = [", "@lc = [ ", 1)),
+    ]
+    ok = True
+    with IncrementalCompiler(FONT_FILE) as compiler:
+        for name, edit in edits:
+            fea = edit(fea)
+            glyphs, tables, fullTime = fullLoop(fea)
+            result, resultTables, seconds, stats = incrementalLoop(compiler, fea)
+            same = result == glyphs and resultTables == tables
+            ok = ok and same
+            print(
+                "%-12s full %.3fs, incremental %.3fs, %d of %d blocks parsed, "
+                "rebuilt %s, %s"
+                % (
+                    name,
+                    fullTime,
+                    seconds,
+                    stats["parsed"],
+                    stats["blocks"],
+                    ",".join(stats["tables"]) or "-",
+                    "identical" if same else "MISMATCH",
+                )
+            )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+"""Benchmark of feaLab.hb_fontstore.FontStore
+
+Builds a synthetic large font (40,000 glyphs with outlines, a cmap of CJK
+codepoints, and large GSUB and GPOS tables) and a TTC with two faces of
+it, then measures:
+1. the cost of UharfbuzzBackend.getFont() per call, with the realpath and
+   stat of every call as before the store, and with the store
+2. the first shape in a forked worker, with and without preload() in the
+   parent, for both faces of the TTC
+3. the private memory of each ShapingPool worker with 1, 2 and 4 workers,
+   with and without preload() before the fork
+
+The results of the workers are compared with in-process shaping.
+
+Usage:
+    python benchmarks/font_store.py
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTCollection, TTFont
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "Lib")
+)
+from feaLab.hb_fontstore import getFontStore  # noqa: E402
+from feaLab.hb_pool import ShapingPool  # noqa: E402
+from feaLab.hb_render import HarfBuzzRenderer, getBackend  # noqa: E402
+
+GLYPHS = 40000
+FIRST_CODEPOINT = 0x4E00
+
+
+def glyphOutline(rnd):
+    pen = TTGlyphPen(None)
+    points = 40
+    pen.moveTo((rnd.randrange(0, 900), rnd.randrange(0, 900)))
+    for i in range(points - 1):
+        pen.lineTo((rnd.randrange(0, 900), rnd.randrange(0, 900)))
+    pen.closePath()
+    return pen.glyph()
+
+
+def buildFont(path):
+    rnd = random.Random(0)
+    names = [".notdef"] + ["g%05d" % (i) for i in range(1, GLYPHS)]
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(names)
+    builder.setupCharacterMap(
+        {FIRST_CODEPOINT + i: name for i, name in enumerate(names[1:30001])}
+    )
+    builder.setupGlyf({name: glyphOutline(rnd) for name in names})
+    builder.setupHorizontalMetrics({name: (1000, 0) for name in names})
+    builder.setupHorizontalHeader(ascent=880, descent=-120)
+    builder.setupNameTable({"familyName": "Store Test", "styleName": "Regular"})
+    builder.setupOS2()
+    builder.setupPost()
+    fea = ["languagesystem DFLT dflt;", "languagesystem hani dflt;"]
+    fea.append("@SRC = [%s];" % (" ".join(names[1:10000])))
+    fea.append("@DST = [%s];" % (" ".join(names[30001:40000])))
+    fea.append("feature locl { sub @SRC by @DST; } locl;")
+    fea.append("feature liga {")
+    for i in range(10000):
+        a, b, c = rnd.sample(names[10001:30001], 3)
+        fea.append("    sub %s %s by %s;" % (a, b, c))
+    fea.append("} liga;")
+    for i in range(100):
+        left = names[1 + i * 300 : 301 + i * 300]
+        fea.append("@L%d = [%s];" % (i, " ".join(left)))
+        fea.append("@R%d = [%s];" % (i, " ".join(left[1:] + [names[301 + i * 300]])))
+    fea.append("feature kern {")
+    for i in range(100):
+        for j in range(100):
+            fea.append("    pos @L%d @R%d %d;" % (i, j, rnd.randrange(-100, 0)))
+    fea.append("} kern;")
+    addOpenTypeFeaturesFromString(builder.font, "\n".join(fea))
+    builder.font.save(path)
+
+
+def buildCollection(path, ttc_path):
+    fonts = [TTFont(path), TTFont(path)]
+    fonts[1]["name"].setName("Store Test Bold", 4, 3, 1, 0x409)
+    collection = TTCollection()
+    collection.fonts = fonts
+    collection.save(ttc_path, shareTables=True)
+
+
+def corpus(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        "".join(chr(FIRST_CODEPOINT + rnd.randrange(30000)) for i in range(20))
+        for j in range(count)
+    ]
+
+
+def oldGetFont(hb, faces, font_file, face_index=0):
+    """UharfbuzzBackend.getFont() before the FontStore"""
+    path = os.path.realpath(font_file)
+    stat = os.stat(path)
+    key = (path, face_index)
+    stamp = (stat.st_mtime, stat.st_size)
+    cached = faces.get(key)
+    if cached is None or cached[0] != stamp:
+        face = hb.Face(hb.Blob.from_file_path(path), face_index)
+        cached = faces[key] = (stamp, face, hb.Font(face))
+    return cached[2]
+
+
+def getFontCost(font_file):
+    backend = getBackend("uharfbuzz")
+    faces = {}
+    results = []
+    for name, func in (
+        ("realpath+stat", lambda: oldGetFont(backend.hb, faces, font_file)),
+        ("store", lambda: backend.getFont(font_file)),
+    ):
+        func()
+        start = time.perf_counter()
+        for i in range(100000):
+            func()
+        results.append("%s %.2fus" % (name, (time.perf_counter() - start) * 10))
+    print("getFont per call: %s" % (", ".join(results)))
+
+
+def _firstShape(conn, font_file, face_index, text):
+    hb = HarfBuzzRenderer(font_file, face_index)
+    start = time.perf_counter()
+    glyphs = hb.toJson(text)
+    conn.send((time.perf_counter() - start, glyphs))
+    conn.close()
+
+
+def firstShape(font_file, face_index, preload):
+    """Time the first toJson() in a forked process"""
+    store = getFontStore()
+    store.invalidate()
+    if preload:
+        store.preload(font_file, [face_index])
+    context = multiprocessing.get_context("fork")
+    parent, child = context.Pipe()
+    text = corpus(1, seed=1)[0]
+    process = context.Process(
+        target=_firstShape, args=(child, font_file, face_index, text)
+    )
+    process.start()
+    seconds, glyphs = parent.recv()
+    process.join()
+    store.invalidate()
+    return seconds, glyphs == HarfBuzzRenderer(font_file, face_index).toJson(text)
+
+
+def privateMemory(pid):
+    """Private (unshared) memory of a process in bytes, from smaps_rollup"""
+    total = 0
+    with open("/proc/%d/smaps_rollup" % (pid)) as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def poolMemory(font_file, workers, preload):
+    store = getFontStore()
+    store.invalidate()
+    hb = HarfBuzzRenderer(font_file)
+    hb.backend = "uharfbuzz"
+    texts = corpus(200 * workers)
+    pool = ShapingPool(hb, workers=workers, chunk_size=50)
+    if not preload:
+        pool._preload = lambda: None
+    with pool:
+        results = list(pool.shapeMany(texts))
+        memory = [privateMemory(w.process.pid) for w in pool._workers]
+    store.invalidate()
+    return memory, results == [hb.toJson(text) for text in texts]
+
+
+def main():
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("needs Linux /proc/<pid>/smaps_rollup")
+        return 1
+    warnings.simplefilter("ignore")
+    ok = True
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "large.ttf")
+        ttc_path = os.path.join(folder, "large.ttc")
+        start = time.time()
+        buildFont(path)
+        buildCollection(path, ttc_path)
+        print(
+            "built %s (%.1f MB) and %s (%.1f MB) in %.1fs"
+            % (
+                os.path.basename(path),
+                os.path.getsize(path) / 1e6,
+                os.path.basename(ttc_path),
+                os.path.getsize(ttc_path) / 1e6,
+                time.time() - start,
+            )
+        )
+        getFontCost(path)
+        for font_file, face_index in ((path, 0), (ttc_path, 0), (ttc_path, 1)):
+            cold, same1 = firstShape(font_file, face_index, False)
+            warm, same2 = firstShape(font_file, face_index, True)
+            ok = ok and same1 and same2
+            print(
+                "first shape in worker, %s face %d: %.1fms, after preload %.2fms, %s"
+                % (
+                    os.path.basename(font_file),
+                    face_index,
+                    cold * 1000,
+                    warm * 1000,
+                    "identical" if same1 and same2 else "MISMATCH",
+                )
+            )
+        for preload in (False, True):
+            for workers in (1, 2, 4):
+                memory, same = poolMemory(path, workers, preload)
+                ok = ok and same
+                print(
+                    "%d workers%s: private memory %.1f MB per worker, %.1f MB total"
+                    ", %s"
+                    % (
+                        workers,
+                        " after preload" if preload else "",
+                        sum(memory) / len(memory) / 1e6,
+                        sum(memory) / 1e6,
+                        "identical" if same else "MISMATCH",
+                    )
+                )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
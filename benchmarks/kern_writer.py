@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""Benchmark of feaLab.writers.kernFeatureWriter.KernFeatureWriter
+
+Writes the kern feature for:
+1. the kerning of the bundled EB Garamond test font, read from its GPOS
+   and flattened to glyph pairs
+2. 250k synthetic glyph pairs with class structure, to be compressed
+3. synthetic group kerning with glyph, glyph-group and group-glyph
+   exceptions
+
+and compiles each with feaLib. The kerning read back from the compiled
+GPOS is compared with the input, so the benchmark fails if the writer
+loses or changes a pair.
+
+The group kerning and the synthetic glyph pairs are then rebuilt with a
+FragmentCache after editing one pair, with and without passing the changed
+pair to the writer, and compared with a full rebuild.
+
+Usage:
+    python benchmarks/kern_writer.py
+"""
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "Lib")
+)
+from feaLab.writers.fragmentCache import FragmentCache  # noqa: E402
+from feaLab.writers.kernFeatureWriter import KernFeatureWriter  # noqa: E402
+
+FONT_FILE = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    "..",
+    "Lib",
+    "feaLab",
+    "test",
+    "EBGarąmońd12-Regular.otf",
+)
+
+
+def kernLookups(font):
+    gpos = font["GPOS"].table
+    indices = []
+    for record in gpos.FeatureList.FeatureRecord:
+        if record.FeatureTag == "kern":
+            indices.extend(record.Feature.LookupListIndex)
+    lookups = [gpos.LookupList.Lookup[i] for i in sorted(set(indices))]
+    return [
+        lookup
+        for lookup in lookups
+        if lookup.LookupType == 2
+        or (lookup.LookupType == 9 and lookup.SubTable[0].ExtensionLookupType == 2)
+    ]
+
+
+def flatKerning(font):
+    """Read the pair kerning of a font as {(first, second): x advance},
+    with the subtable precedence of OpenType layout engines"""
+    glyphOrder = font.getGlyphOrder()
+    pairs = {}
+    for lookup in kernLookups(font):
+        closed = set()
+        for subtable in lookup.SubTable:
+            if lookup.LookupType == 9:
+                subtable = subtable.ExtSubTable
+            if subtable.Format == 1:
+                for first, pairSet in zip(subtable.Coverage.glyphs, subtable.PairSet):
+                    if first in closed:
+                        continue
+                    for record in pairSet.PairValueRecord:
+                        value = getattr(record.Value1, "XAdvance", 0) or 0
+                        pairs.setdefault((first, record.SecondGlyph), value)
+                continue
+            classDef1 = subtable.ClassDef1.classDefs
+            classDef2 = subtable.ClassDef2.classDefs
+            byClass2 = {}
+            for glyph in glyphOrder:
+                byClass2.setdefault(classDef2.get(glyph, 0), []).append(glyph)
+            for first in subtable.Coverage.glyphs:
+                if first in closed:
+                    continue
+                records = subtable.Class1Record[classDef1.get(first, 0)].Class2Record
+                for k, record in enumerate(records):
+                    value = getattr(record.Value1, "XAdvance", 0) or 0
+                    if value:
+                        for second in byClass2.get(k, ()):
+                            pairs.setdefault((first, second), value)
+                closed.add(first)
+    return {pair: value for pair, value in pairs.items() if value}
+
+
+def expectedKerning(kerning, groups):
+    """Flatten UFO kerning: glyph-glyph, then glyph-group, group-glyph
+    and group-group pairs"""
+    pairs = {}
+    rank = {}
+    for (first, second), value in kerning.items():
+        firsts = groups.get(first, [first])
+        seconds = groups.get(second, [second])
+        level = (first in groups) * 2 + (second in groups)
+        for a in firsts:
+            for b in seconds:
+                if rank.get((a, b), 4) > level:
+                    rank[(a, b)] = level
+                    pairs[(a, b)] = value
+    return {pair: value for pair, value in pairs.items() if value}
+
+
+def run(name, kerning, groups=None):
+    font = TTFont(FONT_FILE)
+    ufo = SimpleNamespace(
+        kerning=kerning, groups=groups or {}, glyphOrder=font.getGlyphOrder()
+    )
+    start = time.time()
+    fea = KernFeatureWriter(ufo).write()
+    writeTime = time.time() - start
+    del font["GPOS"]
+    start = time.time()
+    addOpenTypeFeaturesFromString(font, fea, tables=["GPOS"])
+    compileTime = time.time() - start
+    start = time.time()
+    data = font["GPOS"].compile(font)
+    serializeTime = time.time() - start
+    lookup = kernLookups(font)[0]
+    result = flatKerning(font)
+    expected = expectedKerning(kerning, ufo.groups)
+    ok = result == expected
+    print(
+        "%-12s %7d pairs: write %.2fs, feaLib %.2fs, compile %.2fs, "
+        "%d subtables, GPOS %d bytes, %s"
+        % (
+            name,
+            len(expected),
+            writeTime,
+            compileTime,
+            serializeTime,
+            len(lookup.SubTable),
+            len(data),
+            "lossless" if ok else "MISMATCH",
+        )
+    )
+    return ok
+
+
+def incremental(name, ufo, edit):
+    """Write with a FragmentCache, then edit the font twice and rewrite it
+    with the cache after each edit: first finding the changed pairs by
+    comparing all pairs, then with the changed pairs passed to the writer.
+    Each incremental write is compared with a full rebuild."""
+    cache = FragmentCache()
+    KernFeatureWriter(ufo, cache=cache).write()
+    ok = True
+    for hint in (False, True):
+        changed = edit(ufo)
+        start = time.time()
+        full = KernFeatureWriter(ufo).write()
+        fullTime = time.time() - start
+        writer = KernFeatureWriter(ufo, cache=cache, changed=changed if hint else None)
+        start = time.time()
+        fea = writer.write()
+        incrementalTime = time.time() - start
+        ok = ok and fea == full
+        print(
+            "%-20s full %.3fs, incremental %.3fs (%s), %d rows/columns "
+            "signed, %s"
+            % (
+                name,
+                fullTime,
+                incrementalTime,
+                "changed pairs given" if hint else "changed pairs found",
+                writer.rebuilt,
+                "identical" if fea == full else "MISMATCH",
+            )
+        )
+    return ok
+
+
+def main():
+    font = TTFont(FONT_FILE)
+    glyphOrder = font.getGlyphOrder()
+    random.seed(0)
+    ok = run("ebgaramond", flatKerning(font))
+
+    lefts = glyphOrder[1:501]
+    rights = glyphOrder[501:1001]
+    shapes1 = {g: random.randrange(40) for g in lefts}
+    shapes2 = {g: random.randrange(40) for g in rights}
+    values = {(i, j): random.randrange(-120, 60, 5) for i in range(40) for j in range(40)}
+    synthetic = {
+        (a, b): values[(shapes1[a], shapes2[b])]
+        for a in lefts
+        for b in rights
+        if values[(shapes1[a], shapes2[b])]
+    }
+    ok = run("synthetic", synthetic) and ok
+
+    groups = {}
+    for g, shape in shapes1.items():
+        groups.setdefault("public.kern1.L%d" % (shape), []).append(g)
+    for g, shape in shapes2.items():
+        groups.setdefault("public.kern2.R%d" % (shape), []).append(g)
+    kerning = {
+        ("public.kern1.L%d" % (i), "public.kern2.R%d" % (j)): value
+        for (i, j), value in values.items()
+    }
+    for a, b in random.sample(list(synthetic), 2000):
+        kerning[(a, b)] = random.choice([0, -200, 20])
+    for a in random.sample(lefts, 100):
+        kerning[(a, "public.kern2.R%d" % (random.randrange(40)))] = -33
+    for b in random.sample(rights, 100):
+        kerning[("public.kern1.L%d" % (random.randrange(40)), b)] = -44
+    ok = run("groups", kerning, groups) and ok
+
+    ufo = SimpleNamespace(kerning=dict(kerning), groups=groups, glyphOrder=glyphOrder)
+    ok = incremental("unchanged", ufo, lambda ufo: []) and ok
+
+    def editGroupPair(ufo):
+        pair = ("public.kern1.L0", "public.kern2.R0")
+        ufo.kerning[pair] -= 10
+        return [pair]
+
+    ok = incremental("group pair edit", ufo, editGroupPair) and ok
+    ufo.kerning = dict(synthetic)
+
+    def editGlyphPair(ufo):
+        pair = (lefts[0], rights[0])
+        ufo.kerning[pair] = ufo.kerning.get(pair, 0) + 7
+        return [pair]
+
+    ok = incremental("glyph pair edit", ufo, editGlyphPair) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+"""Benchmark of feaLab.writers.markFeatureWriter.MarkFeatureWriter
+
+Writes the mark, mkmk, abvm and blwm features for synthetic fonts with
+thousands of Latin and Devanagari bases, hundreds of marks and some
+ligatures, at 1x, 2x and 4x size, and compiles each with feaLib. The mark
+attachments read back from the compiled GPOS are compared with the
+anchors, so the benchmark fails if the writer loses or changes one.
+
+A font with 8000 bases is then rebuilt with a FragmentCache after moving
+one anchor, with and without passing the changed glyph to the writer, and
+compared with a full rebuild.
+
+Usage:
+    python benchmarks/mark_writer.py
+"""
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.fontBuilder import FontBuilder
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "Lib")
+)
+from feaLab.writers.fragmentCache import FragmentCache  # noqa: E402
+from feaLab.writers.markFeatureWriter import MarkFeatureWriter  # noqa: E402
+
+ANCHOR_LIST = [("top", "_top"), ("bottom", "_bottom")]
+MKMK_ANCHOR_LIST = [("top", "_top"), ("bottom", "_bottom")]
+LIGA_ANCHOR_LIST = [(("top_1", "top_2"), "_top")]
+FEATURES = {"doMark": True, "doMkmk": True, "doAbvm": True, "doBlwm": True}
+
+
+def glyph(name, anchors, unicodes=()):
+    return SimpleNamespace(
+        name=name,
+        anchors=[SimpleNamespace(name=n, x=x, y=y) for n, x, y in anchors],
+        unicodes=list(unicodes),
+    )
+
+
+class SyntheticFont(list):
+    """List of glyphs with a glyphOrder and glyphs by name, like a defcon
+    Font"""
+
+    @property
+    def glyphOrder(self):
+        return [g.name for g in self]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for g in self:
+                if g.name == key:
+                    return g
+            raise KeyError(key)
+        return list.__getitem__(self, key)
+
+
+def syntheticFont(bases, marks):
+    """Latin bases, unencoded '-deva' bases, marks and ligatures with
+    anchors on a coarse grid, so that many glyphs share a position"""
+    widths = range(300, 1200, 50)
+    glyphs = SyntheticFont([glyph(".notdef", [])])
+    for i in range(bases):
+        width = random.choice(widths)
+        anchors = [
+            ("top", width // 2, random.choice((500, 700))),
+            ("bottom", width // 2, 0),
+        ]
+        if i % 2:
+            glyphs.append(glyph("ka%05d-deva" % (i), anchors))
+        else:
+            glyphs.append(glyph("b%05d" % (i), anchors))
+    for i in range(marks):
+        if i % 2:
+            anchors = [("_top", 0, 500), ("top", 0, random.choice((700, 750)))]
+        else:
+            anchors = [("_bottom", 0, 0), ("bottom", 0, random.choice((-200, -250)))]
+        glyphs.append(glyph("m%04d" % (i), anchors, [0x0300 + i % 0x70]))
+    for i in range(bases // 20):
+        anchors = [("top_1", 250, 700)]
+        if i % 3:
+            anchors.append(("top_2", 750, 700))
+        glyphs.append(glyph("lig%04d" % (i), anchors))
+    return glyphs
+
+
+def expectedAttachments(ufo):
+    """{(feature, base, component, mark): (base x, y, mark x, y)}"""
+    anchors = {}
+    for g in ufo:
+        for anchor in g.anchors:
+            anchors.setdefault(anchor.name, {})[g.name] = (anchor.x, anchor.y)
+    marks = set(anchors["_top"]) | set(anchors["_bottom"])
+    ligas = set(anchors["top_1"])
+    result = {}
+    for anchorName, accentName in ANCHOR_LIST:
+        for base, (bx, by) in anchors[anchorName].items():
+            if base in marks:
+                continue
+            tag = "mark"
+            if base.endswith("-deva"):
+                tag = "abvm" if anchorName == "top" else "blwm"
+            for mark, (mx, my) in anchors[accentName].items():
+                result[(tag, base, 0, mark)] = (bx, by, mx, my)
+    for anchorName, accentName in MKMK_ANCHOR_LIST:
+        for base, (bx, by) in anchors[anchorName].items():
+            if base not in marks:
+                continue
+            for mark, (mx, my) in anchors[accentName].items():
+                result[("mkmk", base, 0, mark)] = (bx, by, mx, my)
+    for componentNames, accentName in LIGA_ANCHOR_LIST:
+        for liga in ligas:
+            for k, anchorName in enumerate(componentNames):
+                if liga not in anchors[anchorName]:
+                    continue
+                bx, by = anchors[anchorName][liga]
+                for mark, (mx, my) in anchors[accentName].items():
+                    result[("mark", liga, k, mark)] = (bx, by, mx, my)
+    return result
+
+
+def compiledAttachments(font):
+    """Read the mark attachments of the compiled GPOS, first match wins"""
+    gpos = font["GPOS"].table
+    result = {}
+    for record in gpos.FeatureList.FeatureRecord:
+        tag = record.FeatureTag
+        for index in record.Feature.LookupListIndex:
+            lookup = gpos.LookupList.Lookup[index]
+            for subtable in lookup.SubTable:
+                if lookup.LookupType == 9:
+                    subtable = subtable.ExtSubTable
+                marks = [
+                    (
+                        mark,
+                        r.Class,
+                        (r.MarkAnchor.XCoordinate, r.MarkAnchor.YCoordinate),
+                    )
+                    for mark, r in zip(
+                        subtable.Mark1Coverage.glyphs
+                        if subtable.LookupType == 6
+                        else subtable.MarkCoverage.glyphs,
+                        (
+                            subtable.Mark1Array
+                            if subtable.LookupType == 6
+                            else subtable.MarkArray
+                        ).MarkRecord,
+                    )
+                ]
+                if subtable.LookupType == 5:
+                    for liga, attach in zip(
+                        subtable.LigatureCoverage.glyphs,
+                        subtable.LigatureArray.LigatureAttach,
+                    ):
+                        for k, component in enumerate(attach.ComponentRecord):
+                            for mark, cls, (mx, my) in marks:
+                                anchor = component.LigatureAnchor[cls]
+                                if anchor is not None:
+                                    position = (anchor.XCoordinate, anchor.YCoordinate)
+                                    result.setdefault(
+                                        (tag, liga, k, mark), position + (mx, my)
+                                    )
+                    continue
+                if subtable.LookupType == 6:
+                    coverage = subtable.Mark2Coverage.glyphs
+                    records = [r.Mark2Anchor for r in subtable.Mark2Array.Mark2Record]
+                else:
+                    coverage = subtable.BaseCoverage.glyphs
+                    records = [r.BaseAnchor for r in subtable.BaseArray.BaseRecord]
+                for base, baseAnchors in zip(coverage, records):
+                    for mark, cls, (mx, my) in marks:
+                        anchor = baseAnchors[cls]
+                        if anchor is not None:
+                            result.setdefault(
+                                (tag, base, 0, mark),
+                                (anchor.XCoordinate, anchor.YCoordinate, mx, my),
+                            )
+    return result
+
+
+def run(name, bases, marks):
+    ufo = syntheticFont(bases, marks)
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(ufo.glyphOrder)
+    font = builder.font
+    start = time.time()
+    writer = MarkFeatureWriter(ufo, ANCHOR_LIST, MKMK_ANCHOR_LIST, LIGA_ANCHOR_LIST)
+    fea = writer.write(**FEATURES)
+    writeTime = time.time() - start
+    start = time.time()
+    addOpenTypeFeaturesFromString(font, fea, tables=["GPOS"])
+    compileTime = time.time() - start
+    start = time.time()
+    data = font["GPOS"].compile(font)
+    serializeTime = time.time() - start
+    ok = compiledAttachments(font) == expectedAttachments(ufo)
+    print(
+        "%-4s %6d bases %4d marks: write %.2fs, feaLib %.2fs, compile %.2fs, "
+        "FEA %d lines, GPOS %d bytes, %s"
+        % (
+            name,
+            bases,
+            marks,
+            writeTime,
+            compileTime,
+            serializeTime,
+            fea.count("\n"),
+            len(data),
+            "lossless" if ok else "MISMATCH",
+        )
+    )
+    return ok
+
+
+def incremental(name, ufo, edit):
+    """Write with a FragmentCache, then edit the font twice and rewrite it
+    with the cache after each edit: first finding the changed glyphs by
+    comparing all glyphs, then with the changed glyphs passed to the
+    writer. Each incremental write is compared with a full rebuild."""
+    anchorLists = (ANCHOR_LIST, MKMK_ANCHOR_LIST, LIGA_ANCHOR_LIST)
+    cache = FragmentCache()
+    MarkFeatureWriter(ufo, *anchorLists, cache=cache).write(**FEATURES)
+    ok = True
+    for hint in (False, True):
+        changed = edit(ufo)
+        start = time.time()
+        full = MarkFeatureWriter(ufo, *anchorLists).write(**FEATURES)
+        fullTime = time.time() - start
+        writer = MarkFeatureWriter(
+            ufo, *anchorLists, cache=cache, changed=changed if hint else None
+        )
+        start = time.time()
+        fea = writer.write(**FEATURES)
+        incrementalTime = time.time() - start
+        ok = ok and fea == full
+        print(
+            "%-20s full %.3fs, incremental %.3fs (%s), %d classes/lookups "
+            "built, %s"
+            % (
+                name,
+                fullTime,
+                incrementalTime,
+                "changed glyphs given" if hint else "changed glyphs found",
+                writer.rebuilt,
+                "identical" if fea == full else "MISMATCH",
+            )
+        )
+    return ok
+
+
+def main():
+    random.seed(0)
+    ok = True
+    for scale in (1, 2, 4):
+        ok = run("%dx" % (scale), 2000 * scale, 100 * scale) and ok
+
+    ufo = syntheticFont(8000, 400)
+    ok = incremental("unchanged", ufo, lambda ufo: []) and ok
+
+    def moveAnchor(ufo):
+        ufo[1].anchors[0].x += 10
+        return [ufo[1].name]
+
+    ok = incremental("one anchor moved", ufo, moveAnchor) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,574 @@
+#!/usr/bin/env python
+"""Benchmark suite of feaLab, with results in JSON and a baseline comparison
+
+Measures, with the bundled EB Garamond test font and synthetic inputs:
+1. HarfBuzzRenderer.toJson() latency and throughput, short and long texts,
+   and the cost of HarfBuzzRenderer.instrument
+2. shaping many texts per call with toJson() vs. in batches with shapeMany(),
+   toGlyphRun() of a long text, and the decoding of the `hb-shape` JSON
+   vs. text output format with glyph ids
+3. toSVG(), renderSVG() and toPNG() render time and output size
+4. charScript(), charScripts() and updateLanguageSystemsInFea() over the
+   cmap of the font and over a synthetic cmap of all assigned codepoints
+5. KernFeatureWriter and MarkFeatureWriter generation time
+
+Each benchmark runs `--repeat` samples. The median time per call is the
+`seconds` metric, and with a unit (chars, texts, codepoints, pairs,
+glyphs) also gives `per_second`. Benchmarks that need a missing tool,
+e.g. `hb-view`, are recorded as skipped.
+
+The results are written as JSON with `--output`. With `--baseline`, they
+are compared with earlier results, and the exit code is 1 if a time or
+an output size grew by more than `--tolerance`. Baselines should be made
+on the same machine, the environment of both is printed if it differs.
+
+Usage:
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --baseline baseline.json --output results.json
+    python benchmarks/suite.py --filter tojson --repeat 10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from fontTools.ttLib import TTFont
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "Lib")
+)
+from feaLab import hb_scripts3  # noqa: E402
+from feaLab.hb_glyphrun import GlyphRun  # noqa: E402
+from feaLab.hb_instrument import Instrumentation  # noqa: E402
+from feaLab.hb_render import HarfBuzzRenderer, getBackend, getTool  # noqa: E402
+from feaLab.writers.kernFeatureWriter import KernFeatureWriter  # noqa: E402
+from feaLab.writers.markFeatureWriter import MarkFeatureWriter  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from kern_writer import FONT_FILE, flatKerning  # noqa: E402
+import mark_writer  # noqa: E402
+
+FORMAT_VERSION = 1
+SHORT_TEXT = "Office staff"
+WORDS = (
+    "The quick brown fox jumps over the lazy dog, "
+    "affluent officials fly off to Zürich and Kraków."
+).split()
+
+BENCHMARKS = []
+
+
+class Skip(Exception):
+    """Raised by a benchmark that cannot run in this environment"""
+
+
+def benchmark(name):
+    """Register a benchmark function, called with the number of samples
+    and returning a dict of metrics"""
+
+    def register(func):
+        BENCHMARKS.append((name, func))
+        return func
+
+    return register
+
+
+def measure(func, repeat, number=1, units=None, unit=None):
+    """Time func(), `number` calls per sample, `repeat` samples
+
+    Args:
+        func (callable): the code to time
+        repeat (int): number of samples
+        number (int, optional): calls per sample
+        units (int, optional): amount of work per call, e.g. characters
+        unit (str, optional): name of the units
+
+    Returns:
+        tuple: (metrics dict, last result of func())
+    """
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            result = func()
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    metrics = {
+        "seconds": statistics.median(times),
+        "min_seconds": times[0],
+        "max_seconds": times[-1],
+        "samples": repeat,
+        "number": number,
+    }
+    if units:
+        metrics["unit"] = unit
+        metrics["units"] = units
+        metrics["per_second"] = units / metrics["seconds"]
+    return metrics, result
+
+
+def renderer(backend="uharfbuzz"):
+    if not getBackend(backend).isAvailable():
+        raise Skip("backend %s not available" % (backend))
+    hb = HarfBuzzRenderer(FONT_FILE)
+    hb.backend = backend
+    return hb
+
+
+def words(count, seed=0):
+    rnd = random.Random(seed)
+    return [rnd.choice(WORDS) for i in range(count)]
+
+
+def longText():
+    """About 10,000 characters in one paragraph"""
+    return " ".join(words(1500))
+
+
+def syntheticCmap():
+    """All assigned codepoints outside of the surrogates and private use"""
+    return [
+        code
+        for code in range(0x110000)
+        if hb_scripts3.charScript(code) != "Zzzz"
+        and not (0xD800 <= code < 0xE000 or 0xE000 <= code < 0xF900)
+    ]
+
+
+def shapeBenchmarks(backend):
+    @benchmark("tojson.short.%s" % (backend))
+    def toJsonShort(repeat):
+        hb = renderer(backend)
+        number = 200 if backend == "uharfbuzz" else 5
+        return measure(
+            lambda: hb.toJson(SHORT_TEXT), repeat, number, len(SHORT_TEXT), "chars"
+        )[0]
+
+    @benchmark("tojson.long.%s" % (backend))
+    def toJsonLong(repeat):
+        hb = renderer(backend)
+        text = longText()
+        return measure(lambda: hb.toJson(text), repeat, 1, len(text), "chars")[0]
+
+    @benchmark("toglyphrun.long.%s" % (backend))
+    def toGlyphRunLong(repeat):
+        hb = renderer(backend)
+        text = longText()
+        return measure(lambda: hb.toGlyphRun(text), repeat, 1, len(text), "chars")[0]
+
+    @benchmark("shape.percall.%s" % (backend))
+    def shapePerCall(repeat):
+        hb = renderer(backend)
+        texts = words(2000 if backend == "uharfbuzz" else 50)
+        return measure(
+            lambda: [hb.toJson(text) for text in texts], repeat, 1, len(texts), "texts"
+        )[0]
+
+    @benchmark("shape.batch.%s" % (backend))
+    def shapeBatch(repeat):
+        hb = renderer(backend)
+        texts = words(2000 if backend == "uharfbuzz" else 50)
+        return measure(
+            lambda: list(hb.shapeMany(texts)), repeat, 1, len(texts), "texts"
+        )[0]
+
+
+shapeBenchmarks("uharfbuzz")
+
+
+@benchmark("tojson.short.uharfbuzz.instrumented")
+def toJsonShortInstrumented(repeat):
+    hb = renderer()
+    hb.instrument = Instrumentation()
+    return measure(
+        lambda: hb.toJson(SHORT_TEXT), repeat, 200, len(SHORT_TEXT), "chars"
+    )[0]
+
+
+shapeBenchmarks("hb-shape")
+
+
+def hbShapeOutput(output_format):
+    """`hb-shape` output of longText() with glyph ids, written by the
+    serializer of HarfBuzz that `hb-shape` uses"""
+    hb = renderer()
+    backend = getBackend("uharfbuzz")
+    font = backend.getFont(hb.font_file)
+    buf = backend._shape(hb, font, longText())
+    data = buf.serialize(
+        font,
+        format=getattr(backend.hb.BufferSerializeFormat, output_format.upper()),
+        flags=backend.hb.BufferSerializeFlags.NO_GLYPH_NAMES,
+    )
+    return data, len(buf.glyph_infos)
+
+
+@benchmark("decode.json.long")
+def decodeJsonLong(repeat):
+    data, glyphs = hbShapeOutput("json")
+    metrics = measure(lambda: json.loads(data), repeat, 1, glyphs, "glyphs")[0]
+    metrics["bytes"] = len(data)
+    return metrics
+
+
+@benchmark("decode.text.long")
+def decodeTextLong(repeat):
+    data, glyphs = hbShapeOutput("text")
+    metrics = measure(lambda: GlyphRun.fromText(data), repeat, 1, glyphs, "glyphs")[0]
+    metrics["bytes"] = len(data)
+    return metrics
+
+
+@benchmark("decode.text.long.records")
+def decodeTextLongRecords(repeat):
+    data, glyphs = hbShapeOutput("text")
+    return measure(
+        lambda: GlyphRun.fromText(data).toJson(), repeat, 1, glyphs, "glyphs"
+    )[0]
+
+
+def renderMetrics(metrics, data):
+    if not data:
+        raise Skip("no output")
+    metrics["bytes"] = len(data)
+    return metrics
+
+
+@benchmark("render.tosvg")
+def renderToSVG(repeat):
+    hb = renderer()
+    metrics, svg = measure(lambda: hb.toSVG(SHORT_TEXT, font_size=72), repeat)
+    metrics["tool"] = "hb-view" if getTool("hb-view") else "renderSVG"
+    return renderMetrics(metrics, svg)
+
+
+@benchmark("render.svg.paragraph")
+def renderSVGParagraph(repeat):
+    hb = renderer()
+    text = "\n".join(" ".join(words(12, seed=i)) for i in range(40))
+    return renderMetrics(
+        *measure(
+            lambda: hb.renderSVG(text, font_size=24), repeat, 1, len(text), "chars"
+        )
+    )
+
+
+@benchmark("render.svg.paragraph.symbols")
+def renderSVGParagraphSymbols(repeat):
+    hb = renderer()
+    text = "\n".join(" ".join(words(12, seed=i)) for i in range(40))
+    return renderMetrics(
+        *measure(
+            lambda: hb.renderSVG(text, font_size=24, use_symbols=True),
+            repeat,
+            1,
+            len(text),
+            "chars",
+        )
+    )
+
+
+@benchmark("render.topng")
+def renderToPNG(repeat):
+    if getTool("hb-view") is None:
+        raise Skip("hb-view not available")
+    hb = renderer()
+    return renderMetrics(*measure(lambda: hb.toPNG(SHORT_TEXT, font_size=72), repeat))
+
+
+@benchmark("scripts.charscript.font")
+def charScriptFont(repeat):
+    unicodes = list(TTFont(FONT_FILE).getBestCmap())
+    hb_scripts3.charScript(unicodes[0])
+    return measure(
+        lambda: [hb_scripts3.charScript(code) for code in unicodes],
+        repeat,
+        10,
+        len(unicodes),
+        "codepoints",
+    )[0]
+
+
+@benchmark("scripts.charscript.synthetic")
+def charScriptSynthetic(repeat):
+    unicodes = syntheticCmap()
+    return measure(
+        lambda: [hb_scripts3.charScript(code) for code in unicodes],
+        repeat,
+        1,
+        len(unicodes),
+        "codepoints",
+    )[0]
+
+
+@benchmark("scripts.charscripts.synthetic")
+def charScriptsSynthetic(repeat):
+    unicodes = syntheticCmap()
+    return measure(
+        lambda: hb_scripts3.charScripts(unicodes),
+        repeat,
+        1,
+        len(unicodes),
+        "codepoints",
+    )[0]
+
+
+@benchmark("scripts.languagesystems.font")
+def languageSystemsFont(repeat):
+    font = TTFont(FONT_FILE)
+    fea = "languagesystem DFLT dflt;\nfeature liga { sub f i by f_i; } liga;\n"
+    unicodes = list(font.getBestCmap())
+    return measure(
+        lambda: hb_scripts3.updateLanguageSystemsInFea(fea, ftFont=font),
+        repeat,
+        10,
+        len(unicodes),
+        "codepoints",
+    )[0]
+
+
+@benchmark("scripts.languagesystems.synthetic")
+def languageSystemsSynthetic(repeat):
+    unicodes = syntheticCmap()
+    fea = "languagesystem DFLT dflt;\nfeature liga { sub f i by f_i; } liga;\n"
+    metrics, result = measure(
+        lambda: hb_scripts3.updateLanguageSystemsInFea(fea, unicodes=unicodes),
+        repeat,
+        1,
+        len(unicodes),
+        "codepoints",
+    )
+    metrics["bytes"] = len(result)
+    return metrics
+
+
+def writerMetrics(metrics, fea):
+    metrics["bytes"] = len(fea)
+    return metrics
+
+
+@benchmark("writers.kern.font")
+def kernWriterFont(repeat):
+    font = TTFont(FONT_FILE)
+    kerning = flatKerning(font)
+    ufo = SimpleNamespace(kerning=kerning, groups={}, glyphOrder=font.getGlyphOrder())
+    return writerMetrics(
+        *measure(
+            lambda: KernFeatureWriter(ufo).write(), repeat, 1, len(kerning), "pairs"
+        )
+    )
+
+
+@benchmark("writers.kern.synthetic")
+def kernWriterSynthetic(repeat):
+    """250k glyph pairs with a class structure, as in kern_writer.py"""
+    glyphOrder = TTFont(FONT_FILE).getGlyphOrder()
+    rnd = random.Random(0)
+    lefts = glyphOrder[1:501]
+    rights = glyphOrder[501:1001]
+    shapes1 = {g: rnd.randrange(40) for g in lefts}
+    shapes2 = {g: rnd.randrange(40) for g in rights}
+    values = {(i, j): rnd.randrange(-120, 60, 5) for i in range(40) for j in range(40)}
+    kerning = {
+        (a, b): values[(shapes1[a], shapes2[b])]
+        for a in lefts
+        for b in rights
+        if values[(shapes1[a], shapes2[b])]
+    }
+    ufo = SimpleNamespace(kerning=kerning, groups={}, glyphOrder=glyphOrder)
+    return writerMetrics(
+        *measure(
+            lambda: KernFeatureWriter(ufo).write(), repeat, 1, len(kerning), "pairs"
+        )
+    )
+
+
+@benchmark("writers.mark.synthetic")
+def markWriterSynthetic(repeat):
+    """8000 bases and 400 marks, as the 4x font of mark_writer.py"""
+    random.seed(0)
+    ufo = mark_writer.syntheticFont(8000, 400)
+    anchorLists = (
+        mark_writer.ANCHOR_LIST,
+        mark_writer.MKMK_ANCHOR_LIST,
+        mark_writer.LIGA_ANCHOR_LIST,
+    )
+    return writerMetrics(
+        *measure(
+            lambda: MarkFeatureWriter(ufo, *anchorLists).write(**mark_writer.FEATURES),
+            repeat,
+            1,
+            len(ufo),
+            "glyphs",
+        )
+    )
+
+
+def environment():
+    import fontTools
+
+    try:
+        import uharfbuzz
+
+        uharfbuzzVersion = uharfbuzz.__version__
+    except ImportError:
+        uharfbuzzVersion = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "fontTools": fontTools.version,
+        "uharfbuzz": uharfbuzzVersion,
+        "hb-shape": bool(getTool("hb-shape")),
+        "hb-view": bool(getTool("hb-view")),
+    }
+
+
+def run(repeat=5, names=None):
+    """Run the benchmarks whose name contains one of the names
+
+    Returns:
+        dict: {name: metrics}, with {'skipped': reason} or
+            {'error': message} for the benchmarks that did not run
+    """
+    results = {}
+    for name, func in BENCHMARKS:
+        if names and not any(part in name for part in names):
+            continue
+        try:
+            metrics = func(repeat)
+        except Skip as e:
+            metrics = {"skipped": str(e)}
+        except Exception as e:
+            metrics = {"error": "%s: %s" % (type(e).__name__, e)}
+        results[name] = metrics
+        print(formatResult(name, metrics))
+    return results
+
+
+def formatResult(name, metrics):
+    if "seconds" not in metrics:
+        return "%-36s %s" % (name, metrics.get("skipped") or metrics.get("error"))
+    line = "%-36s %12.6fs" % (name, metrics["seconds"])
+    if "per_second" in metrics:
+        line += " %14.1f %s/s" % (metrics["per_second"], metrics["unit"])
+    if "bytes" in metrics:
+        line += " %10d bytes" % (metrics["bytes"])
+    return line
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Print the change of each metric against the baseline
+
+    Returns:
+        list: names of the benchmarks that regressed by more than tolerance
+    """
+    regressions = []
+    print()
+    print(
+        "%-36s %12s %12s %8s %8s" % ("benchmark", "seconds", "baseline", "time", "size")
+    )
+    for name, metrics in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "seconds" not in base or "seconds" not in metrics:
+            continue
+        timeChange = metrics["seconds"] / base["seconds"] - 1
+        sizeChange = 0
+        if metrics.get("bytes") and base.get("bytes"):
+            sizeChange = metrics["bytes"] / base["bytes"] - 1
+        status = ""
+        if timeChange > tolerance or sizeChange > tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif timeChange < -tolerance:
+            status = "improved"
+        print(
+            "%-36s %12.6f %12.6f %+7.1f%% %+7.1f%% %s"
+            % (
+                name,
+                metrics["seconds"],
+                base["seconds"],
+                timeChange * 100,
+                sizeChange * 100,
+                status,
+            )
+        )
+    missing = [name for name in baseline.get("results", {}) if name not in results]
+    if missing:
+        print("not run: %s" % (", ".join(missing)))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results in this JSON file")
+    parser.add_argument("--repeat", type=int, default=5, help="samples per benchmark")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="relative slowdown or growth reported as regression (default: 0.25)",
+    )
+    parser.add_argument(
+        "--filter",
+        action="append",
+        help="only run the benchmarks whose name contains this, can be repeated",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="list the benchmarks and exit"
+    )
+    options = parser.parse_args(args)
+    if options.list:
+        for name, func in BENCHMARKS:
+            print(name)
+        return 0
+    baseline = None
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    env = environment()
+    results = run(repeat=options.repeat, names=options.filter)
+    data = {
+        "version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": env,
+        "repeat": options.repeat,
+        "results": results,
+    }
+    if options.output:
+        folder = os.path.dirname(os.path.realpath(options.output))
+        with tempfile.NamedTemporaryFile(
+            "w", dir=folder, suffix=".json", delete=False, encoding="utf-8"
+        ) as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(f.name, options.output)
+    if baseline is None:
+        return 0
+    if baseline.get("environment") != env:
+        print()
+        print("environment differs from the baseline:")
+        for key in sorted(set(env) | set(baseline.get("environment", {}))):
+            if env.get(key) != baseline.get("environment", {}).get(key):
+                print(
+                    "  %s: %s (baseline: %s)"
+                    % (key, env.get(key), baseline.get("environment", {}).get(key))
+                )
+    regressions = compare(results, baseline, options.tolerance)
+    if regressions:
+        print("%d regression(s): %s" % (len(regressions), ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
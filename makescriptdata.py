@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Generates Lib/feaLab/hb_scripts_data.py, the static ISO 15924 <-> OpenType
+script tag tables used by feaLab.hb_scripts3
+
+The ISO to OpenType tags come from fontTools.unicodedata.OTTags, the port of
+HarfBuzz's hb-ot-tag rules, and every OpenType tag is mapped back to ISO with
+HarfBuzz's hb_ot_tag_to_script() via uharfbuzz.
+
+Run: pip install --user uharfbuzz fonttools
+"""
+import os
+
+import fontTools
+import fontTools.unicodedata as ud
+import uharfbuzz
+from fontTools.unicodedata import OTTags
+
+TABLE_VERSION = 1
+
+isoToOt = {}
+for iso in sorted(ud.Scripts.NAMES):
+    if iso in ("Zinh", "Zyyy", "Zzzz"):
+        tags = ["DFLT"]
+    else:
+        tags = ud.ot_tags_from_script(iso)
+    isoToOt[iso] = tuple(tags)
+
+otToIso = {}
+for tags in isoToOt.values():
+    for tag in tags:
+        if tag != "DFLT":
+            otToIso[tag] = uharfbuzz.ot_tag_to_script(tag)
+# tags that HarfBuzz also accepts: aliases, 'math', and the Indic '3' tags
+extraTags = list(OTTags.SCRIPT_ALIASES) + list(OTTags.SCRIPT_EXCEPTIONS_REVERSED)
+for tags in OTTags.NEW_SCRIPT_TAGS.values():
+    extraTags += [tag[:3] + "3" for tag in tags if tag != "mym2"]
+for tag in extraTags:
+    otToIso[tag] = uharfbuzz.ot_tag_to_script(tag)
+
+for iso, tags in isoToOt.items():
+    for tag in tags:
+        if tag != "DFLT" and otToIso[tag] != iso and iso not in ("Hira", "Hrkt"):
+            raise ValueError("%s -> %s -> %s" % (iso, tag, otToIso[tag]))
+
+
+def formatDict(name, d):
+    items = []
+    for key, value in d.items():
+        if isinstance(value, tuple):
+            value = "(%s%s)" % (
+                ", ".join('"%s"' % (v) for v in value),
+                "," if len(value) == 1 else "",
+            )
+        else:
+            value = '"%s"' % (value)
+        items.append('    "%s": %s,' % (key, value))
+    return ["%s = {" % (name)] + items + ["}"]
+
+
+lines = [
+    '"""hb_scripts_data.py',
+    "",
+    "static ISO 15924 <-> OpenType script tag tables for hb_scripts3",
+    "",
+    "Generated by makescriptdata.py, do not edit.",
+    '"""',
+    "",
+    "TABLE_VERSION = %d" % (TABLE_VERSION),
+    'HARFBUZZ_VERSION = "%s"' % (uharfbuzz.version_string()),
+    'FONTTOOLS_VERSION = "%s"' % (fontTools.version),
+    "",
+    *formatDict("ISO_TO_OT", isoToOt),
+    '"""{ISO 15924 script tag: (OpenType script tags, ...)}, preferred first"""',
+    "",
+    *formatDict("OT_TO_ISO", dict(sorted(otToIso.items()))),
+    '"""{OpenType script tag: ISO 15924 script tag} as hb_ot_tag_to_script()"""',
+    "",
+]
+path = os.path.join(
+    os.path.realpath(os.path.dirname(__file__)), "Lib", "feaLab", "hb_scripts_data.py"
+)
+with open(path, "w", encoding="utf-8") as f:
+    f.write("\n".join(lines))
+print(path)
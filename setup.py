@@ -80,6 +80,9 @@ setup(
     install_requires=[
         "sh>=1.11",
     ],
+    extras_require={
+        "uharfbuzz": ["uharfbuzz"],
+    },
     # To provide executable scripts, use entry points in preference to the
     # "scripts" keyword. Entry points provide cross-platform support and allow
     # pip to create the appropriate form of executable for the target platform.